@@ -0,0 +1,157 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from blog.caches import category_cache
+from blog.models import Category, Comment, Location, Post
+from .models import ChangeLog
+
+User = get_user_model()
+
+
+def post_visible_from(post):
+    """С какого момента пост виден всем или None, если не виден."""
+    category = category_cache.get(post.category_id)
+    if post.is_published and category is not None and category.is_published:
+        return post.pub_date
+    return None
+
+
+def record_post(post, action=ChangeLog.UPSERT):
+    ChangeLog.objects.create(
+        kind=ChangeLog.POSTS, object_id=post.pk, action=action,
+        author_id=post.author_id, post_id=post.pk,
+        visible_from=post_visible_from(post))
+
+
+def record_comment(comment, action=ChangeLog.UPSERT):
+    ChangeLog.objects.create(
+        kind=ChangeLog.COMMENTS, object_id=comment.pk, action=action,
+        author_id=comment.author_id, post_id=comment.post_id)
+
+
+def record_all(kind, queryset):
+    """Пишет изменение каждой строки queryset одним INSERT ... SELECT.
+
+    queryset — посты или комментарии; строки в БД не выбираются.
+    """
+    if kind == ChangeLog.POSTS:
+        post_id = F('pk')
+        visible_from = Case(When(is_published=True,
+                                 category__is_published=True,
+                                 then=F('pub_date')))
+    else:
+        post_id = F('post_id')
+        visible_from = Value(None, output_field=DateTimeField())
+    # порядок аннотаций задаёт порядок столбцов в SELECT
+    columns = {
+        'kind': Value(kind),
+        'object_id': F('pk'),
+        'action': Value(ChangeLog.UPSERT),
+        'author_id': F('author_id'),
+        'post_id': post_id,
+        'visible_from': visible_from,
+        'created_at': Value(timezone.now(), output_field=DateTimeField()),
+    }
+    select = queryset.order_by().annotate(
+        **{f'changelog_{name}': value for name, value in columns.items()}
+    ).values_list(*(f'changelog_{name}' for name in columns))
+    sql, params = select.query.sql_with_params()
+    quote = connection.ops.quote_name
+    names = ', '.join(
+        quote(ChangeLog._meta.get_field(name).column) for name in columns)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(ChangeLog._meta.db_table)} ({names}) {sql}',
+            params)
+
+
+@receiver(post_save, sender=Post)
+def record_post_save(instance, **kwargs):
+    record_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def record_comment_save(instance, **kwargs):
+    record_comment(instance)
+
+
+@receiver(post_delete, sender=Post)
+def record_post_delete(instance, **kwargs):
+    # комментарии удаляются каскадом и пишут свои записи сами
+    record_post(instance, ChangeLog.DELETE)
+
+
+@receiver(post_delete, sender=Comment)
+def record_comment_delete(instance, **kwargs):
+    record_comment(instance, ChangeLog.DELETE)
+
+
+def _remember(instance, fields):
+    """Значения полей до сохранения или None для нового объекта."""
+    if instance.pk is None:
+        return None
+    return type(instance).objects.filter(pk=instance.pk).values_list(
+        *fields).first()
+
+
+@receiver(pre_save, sender=Category)
+def remember_category(instance, **kwargs):
+    instance._changelog_old = _remember(instance, ('is_published', 'slug'))
+
+
+@receiver(pre_save, sender=Location)
+def remember_location(instance, **kwargs):
+    instance._changelog_old = _remember(instance, ('is_published', 'name'))
+
+
+@receiver(post_save, sender=Category)
+def record_category_posts(instance, created, **kwargs):
+    # в API категория поста видна как slug, а публикация категории
+    # меняет видимость всех её постов
+    if not created and instance._changelog_old != (
+            instance.is_published, instance.slug):
+        record_all(ChangeLog.POSTS, instance.posts.all())
+
+
+@receiver(post_save, sender=Location)
+def record_location_posts(instance, created, **kwargs):
+    if not created and instance._changelog_old != (
+            instance.is_published, instance.name):
+        record_all(ChangeLog.POSTS, Post.objects.filter(location=instance))
+
+
+@receiver(pre_delete, sender=Category)
+def record_deleted_category_posts(instance, **kwargs):
+    record_all(ChangeLog.POSTS, instance.posts.all())
+
+
+@receiver(pre_delete, sender=Location)
+def record_deleted_location_posts(instance, **kwargs):
+    record_all(ChangeLog.POSTS, Post.objects.filter(location=instance))
+
+
+@receiver(pre_save, sender=User)
+def remember_username(instance, update_fields=None, **kwargs):
+    instance._changelog_username = None
+    if update_fields is None or 'username' in update_fields:
+        old = _remember(instance, ('username',))
+        instance._changelog_username = old and old[0]
+
+
+@receiver(post_save, sender=User)
+def record_author_changes(instance, created, **kwargs):
+    # имя автора отдаётся в постах и комментариях
+    old = getattr(instance, '_changelog_username', None)
+    if not created and old is not None and old != instance.username:
+        record_all(ChangeLog.POSTS, Post.objects.filter(author=instance))
+        record_all(ChangeLog.COMMENTS,
+                   Comment.objects.filter(author=instance))
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.16 on 2026-10-19 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelog',
+            name='author_id',
+            field=models.BigIntegerField(null=True, verbose_name='Автор объекта'),
+        ),
+        migrations.AddField(
+            model_name='changelog',
+            name='post_id',
+            field=models.BigIntegerField(null=True, verbose_name='Публикация'),
+        ),
+        migrations.AddField(
+            model_name='changelog',
+            name='visible_from',
+            field=models.DateTimeField(null=True, verbose_name='Виден всем с'),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['kind', 'object_id'], name='changelog_kind_object_idx'),
+        ),
+    ]
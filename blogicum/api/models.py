@@ -0,0 +1,49 @@
+from django.db import models
+
+
+class ChangeLog(models.Model):
+    """Журнал изменений постов и комментариев, только для добавления.
+
+    seq растёт монотонно (AUTOINCREMENT в SQLite не переиспользует
+    номера), поэтому синхронизация читает записи после своего seq.
+    author_id, post_id и visible_from позволяют не сообщать клиенту об
+    удалении объектов, которых он не мог видеть.
+    """
+
+    POSTS = 'posts'
+    COMMENTS = 'comments'
+    KIND_CHOICES = (
+        (POSTS, 'публикация'),
+        (COMMENTS, 'комментарий'),
+    )
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = (
+        (UPSERT, 'создание или изменение'),
+        (DELETE, 'удаление'),
+    )
+
+    seq = models.BigAutoField(primary_key=True)
+    kind = models.CharField('Тип объекта', max_length=16,
+                            choices=KIND_CHOICES)
+    object_id = models.BigIntegerField('Идентификатор объекта')
+    action = models.CharField('Действие', max_length=16,
+                              choices=ACTION_CHOICES)
+    author_id = models.BigIntegerField('Автор объекта', null=True)
+    # пост объекта: сам пост или пост комментария
+    post_id = models.BigIntegerField('Публикация', null=True)
+    # с какого момента пост виден всем после изменения, если виден
+    visible_from = models.DateTimeField('Виден всем с', null=True)
+    created_at = models.DateTimeField('Время изменения', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'изменение'
+        verbose_name_plural = 'Журнал изменений'
+        ordering = ('seq',)
+        indexes = (
+            models.Index(fields=('kind', 'object_id'),
+                         name='changelog_kind_object_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.seq}: {self.action} {self.kind} {self.object_id}'
@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db.models import Case, F, When
+
+
+def media_url(name):
+    return f'{settings.MEDIA_URL}{name}' if name else None
+
+
+@dataclass(frozen=True)
+class Field:
+    # имя поля для values_list() или выражение
+    path: object
+    convert: Optional[Callable] = None
+
+
+@dataclass(frozen=True)
+class Resource:
+    """Набор публичных полей модели и порядок выдачи для курсора.
+
+    Строки читаются через values_list(), модели не создаются.
+    """
+
+    fields: dict
+    default_fields: tuple
+    ordering: tuple
+
+    def parse_fields(self, value):
+        """Разбирает параметр ?fields=; None — неизвестное поле."""
+        if not value:
+            return self.default_fields
+        names = tuple(dict.fromkeys(
+            name.strip() for name in value.split(',') if name.strip()))
+        if not names or any(name not in self.fields for name in names):
+            return None
+        return names
+
+    def columns(self, names):
+        paths = [self.fields[name].path for name in names]
+        keys = [field.lstrip('-') for field in self.ordering]
+        return paths + keys
+
+    def serialize(self, rows, names):
+        converters = [(name, self.fields[name].convert) for name in names]
+        return [
+            {name: convert(value) if convert else value
+             for (name, convert), value in zip(converters, row)}
+            for row in rows
+        ]
+
+
+POST = Resource(
+    fields={
+        'id': Field('pk'),
+        'title': Field('title'),
+        'text': Field('text'),
+        'pub_date': Field('pub_date'),
+        'is_published': Field('is_published'),
+        'author': Field('author__username'),
+        'category': Field('category__slug'),
+        # название снятого с публикации места не раскрывается, как и на
+        # страницах блога и в /api/locations/
+        'location': Field(Case(When(location__is_published=True,
+                                    then=F('location__name')))),
+        'image': Field('image', media_url),
+    },
+    default_fields=('id', 'title', 'pub_date', 'author', 'category'),
+    ordering=('-pub_date', '-pk'),
+)
+
+CATEGORY = Resource(
+    fields={
+        'id': Field('pk'),
+        'title': Field('title'),
+        'description': Field('description'),
+        'slug': Field('slug'),
+    },
+    default_fields=('id', 'title', 'slug'),
+    ordering=('pk',),
+)
+
+LOCATION = Resource(
+    fields={
+        'id': Field('pk'),
+        'name': Field('name'),
+    },
+    default_fields=('id', 'name'),
+    ordering=('pk',),
+)
+
+COMMENT = Resource(
+    fields={
+        'id': Field('pk'),
+        'post': Field('post_id'),
+        'text': Field('text'),
+        'author': Field('author__username'),
+        'created_at': Field('created_at'),
+    },
+    default_fields=('id', 'text', 'author', 'created_at'),
+    ordering=('created_at', 'pk'),
+)
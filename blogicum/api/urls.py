@@ -0,0 +1,15 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.post_list, name='post_list'),
+    path('posts/<int:pk>/', views.post_detail, name='post_detail'),
+    path('posts/<int:pk>/comments/', views.comment_list,
+         name='comment_list'),
+    path('categories/', views.category_list, name='category_list'),
+    path('locations/', views.location_list, name='location_list'),
+    path('changes/', views.changes, name='changes'),
+]
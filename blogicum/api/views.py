@@ -0,0 +1,229 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_GET
+
+from blog.models import Category, Comment, Location, Post
+from core.pagination import InvalidCursor, after, decode_cursor, encode_cursor
+from . import resources
+from .models import ChangeLog
+
+
+def error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def json_response(request, data):
+    """JSON-ответ с ETag; при совпадении If-None-Match — 304."""
+    body = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+    etag = quote_etag(hashlib.md5(body.encode()).hexdigest())
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        return None
+    if limit < 1:
+        return None
+    return min(limit, settings.API_MAX_PAGE_SIZE)
+
+
+def list_response(request, resource, queryset):
+    names = resource.parse_fields(request.GET.get('fields'))
+    if names is None:
+        return error('Неизвестное поле в fields.')
+    limit = _limit(request)
+    if limit is None:
+        return error('limit должен быть положительным числом.')
+
+    queryset = queryset.order_by(*resource.ordering)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            values = decode_cursor(cursor, queryset.model, resource.ordering)
+        except InvalidCursor as exception:
+            return error(str(exception))
+        queryset = queryset.filter(after(resource.ordering, values))
+
+    rows = list(queryset.values_list(
+        *resource.columns(names))[:limit + 1])
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        query = request.GET.copy()
+        query['cursor'] = encode_cursor(
+            list(rows[-1][len(names):]))
+        next_url = request.build_absolute_uri(
+            f'{request.path}?{query.urlencode()}')
+    return json_response(request, {
+        'results': resource.serialize(rows, names),
+        'next': next_url,
+    })
+
+
+def detail_response(request, resource, queryset):
+    names = resource.parse_fields(request.GET.get('fields'))
+    if names is None:
+        return error('Неизвестное поле в fields.')
+    row = queryset.values_list(*resource.columns(names)).first()
+    if row is None:
+        return error('Не найдено.', status=404)
+    return json_response(request, resource.serialize([row], names)[0])
+
+
+def visible_posts(user):
+    """Те же правила видимости, что и в HTML-представлениях."""
+    return Post.objects.available_for_user(user)
+
+
+@require_GET
+def post_list(request):
+    posts = visible_posts(request.user)
+    if 'category' in request.GET:
+        posts = posts.filter(category__slug=request.GET['category'])
+    if 'author' in request.GET:
+        posts = posts.filter(author__username=request.GET['author'])
+    return list_response(request, resources.POST, posts)
+
+
+@require_GET
+def post_detail(request, pk):
+    return detail_response(
+        request, resources.POST, visible_posts(request.user).filter(pk=pk))
+
+
+@require_GET
+def comment_list(request, pk):
+    if not visible_posts(request.user).filter(pk=pk).exists():
+        return error('Публикация не найдена.', status=404)
+    return list_response(
+        request, resources.COMMENT, Comment.objects.filter(post_id=pk))
+
+
+@require_GET
+def category_list(request):
+    return list_response(
+        request, resources.CATEGORY,
+        Category.objects.filter(is_published=True))
+
+
+@require_GET
+def location_list(request):
+    return list_response(
+        request, resources.LOCATION,
+        Location.objects.filter(is_published=True))
+
+
+def _rows(resource, queryset):
+    names = tuple(resource.fields)
+    rows = list(queryset.values_list(*resource.columns(names)))
+    return resource.serialize(rows, names)
+
+
+@require_GET
+def changes(request):
+    """Посты и комментарии, изменённые после токена синхронизации.
+
+    Без ?since= отдаёт только текущий токен: клиент берёт его, затем
+    выгружает данные списками и дальше запрашивает изменения. Объекты,
+    ставшие невидимыми пользователю, возвращаются как удалённые.
+    """
+    now = timezone.now()
+    since = request.GET.get('since')
+    if not since:
+        last_seq = ChangeLog.objects.order_by('-seq').values_list(
+            'seq', flat=True).first() or 0
+        return json_response(request, {
+            'posts': [], 'comments': [],
+            'deleted': {'posts': [], 'comments': []},
+            'next': encode_cursor([last_seq, now]), 'has_more': False,
+        })
+    try:
+        seq, synced_at = decode_cursor(
+            since, ChangeLog, ('seq', 'created_at'))
+    except InvalidCursor:
+        return error('Неверный токен синхронизации.')
+
+    limit = settings.API_CHANGES_LIMIT
+    entries = list(
+        ChangeLog.objects.filter(seq__gt=seq)
+        .values_list('seq', 'kind', 'object_id', 'author_id', 'post_id',
+                     'visible_from')[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    ids = {ChangeLog.POSTS: set(), ChangeLog.COMMENTS: set()}
+    for _, kind, object_id, *_ in entries:
+        ids[kind].add(object_id)
+    if entries:
+        seq = entries[-1][0]
+    if not has_more:
+        # отложенные посты становятся видимыми без записи в журнале
+        ids[ChangeLog.POSTS].update(
+            Post.objects.filter(is_published=True,
+                                pub_date__gt=synced_at, pub_date__lte=now)
+            .values_list('pk', flat=True))
+        synced_at = now
+
+    visible = visible_posts(request.user)
+    posts = _rows(resources.POST,
+                  visible.filter(pk__in=ids[ChangeLog.POSTS]))
+    comments = _rows(resources.COMMENT, Comment.objects.filter(
+        pk__in=ids[ChangeLog.COMMENTS], post__in=visible.values('pk')))
+    deleted = _seen_deleted(
+        request.user, entries, ids,
+        {post['id'] for post in posts},
+        {comment['id'] for comment in comments}, now)
+    return json_response(request, {
+        'posts': posts,
+        'comments': comments,
+        'deleted': {kind: sorted(deleted[kind]) for kind in deleted},
+        'next': encode_cursor([seq, synced_at]),
+        'has_more': has_more,
+    })
+
+
+def _seen_deleted(user, entries, ids, post_ids, comment_ids, now):
+    """Скрытые и удалённые объекты, которые клиент мог видеть раньше.
+
+    Пост мог быть виден, если пользователь — его автор или пост хоть раз
+    был виден всем; комментарий — если мог быть виден его пост. Так в
+    ответ не попадают id чужих неопубликованных постов.
+    """
+    hidden = {
+        ChangeLog.POSTS: ids[ChangeLog.POSTS] - post_ids,
+        ChangeLog.COMMENTS: ids[ChangeLog.COMMENTS] - comment_ids,
+    }
+    seen = set(post_ids)
+    comment_posts = {}
+    for _, kind, object_id, author_id, post_id, visible_from in entries:
+        if kind == ChangeLog.COMMENTS:
+            comment_posts[object_id] = post_id
+        elif ((user.is_authenticated and author_id == user.pk)
+              or (visible_from is not None and visible_from <= now)):
+            seen.add(object_id)
+    # пост мог быть виден до текущего окна журнала или быть виден сейчас
+    unknown = (hidden[ChangeLog.POSTS]
+               | set(comment_posts.values())) - seen
+    if unknown:
+        seen.update(ChangeLog.objects.filter(
+            kind=ChangeLog.POSTS, object_id__in=unknown,
+            visible_from__lte=now).values_list('object_id', flat=True))
+        seen.update(visible_posts(user).filter(pk__in=unknown).values_list(
+            'pk', flat=True))
+    return {
+        ChangeLog.POSTS: hidden[ChangeLog.POSTS] & seen,
+        ChangeLog.COMMENTS: {
+            pk for pk in hidden[ChangeLog.COMMENTS]
+            if comment_posts.get(pk) in seen
+        },
+    }
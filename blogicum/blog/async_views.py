@@ -0,0 +1,117 @@
+"""Асинхронные варианты страниц чтения для развёртывания под ASGI.
+
+Запросы к БД и рендеринг шаблонов выполняются в ограниченном пуле
+потоков, независимые выборки идут параллельно, а цикл событий тем
+временем обслуживает другие соединения.
+"""
+import asyncio
+
+from django.contrib.auth import get_user_model
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+
+from core.pool import in_pool
+from .caches import category_cache
+from .constants import MAIN_PAGE_MAX_POSTS
+from .forms import CreateCommentForm
+from .models import Comment, Post
+from .streams import comment_stream_url
+from .views import get_visible_post_or_404, is_following
+
+User = get_user_model()
+
+
+def _resolve_user(request):
+    # ленивый request.user нельзя впервые читать из цикла событий
+    request.user.is_authenticated
+    return request.user
+
+
+async def _paginate(request, queryset):
+    """Страница постов и общее число постов, запрошенные параллельно."""
+    paginator = Paginator(queryset, MAIN_PAGE_MAX_POSTS)
+    page = request.GET.get('page') or 1
+    if page == 'last':
+        number = await in_pool(lambda: paginator.num_pages)()
+    else:
+        try:
+            number = int(page)
+        except ValueError:
+            raise Http404('Неверный номер страницы.')
+    bottom = (max(number, 1) - 1) * paginator.per_page
+    paginator.count, object_list = await asyncio.gather(
+        in_pool(queryset.count)(),
+        in_pool(lambda: list(queryset[bottom:bottom + paginator.per_page]))(),
+    )
+    try:
+        number = paginator.validate_number(number)
+    except InvalidPage as error:
+        raise Http404(str(error))
+    return Page(object_list, number, paginator)
+
+
+def _list_context(page, **extra):
+    return {
+        'paginator': page.paginator,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+        'object_list': page.object_list,
+        **extra,
+    }
+
+
+async def _render(request, template_name, context):
+    content = await in_pool(render_to_string)(template_name, context, request)
+    return HttpResponse(content)
+
+
+async def index(request):
+    page = await _paginate(request, Post.objects.published().for_cards())
+    return await _render(request, 'blog/index.html', _list_context(page))
+
+
+async def category_posts(request, category_slug):
+    queryset = (Post.objects.published()
+                .filter(category__slug=category_slug).for_cards())
+    category, page = await asyncio.gather(
+        in_pool(category_cache.get_by_slug)(category_slug),
+        _paginate(request, queryset),
+    )
+    if category is None or not category.is_published:
+        raise Http404('Категория не найдена.')
+    return await _render(request, 'blog/category.html',
+                         _list_context(page, category=category))
+
+
+async def profile(request, username=None):
+    user = await in_pool(_resolve_user)(request)
+    if username is None:
+        username = user.username
+    queryset = Post.objects.filter(author__username=username)
+    if not (user.is_authenticated and user.username == username):
+        queryset = queryset.published()
+    profile, page = await asyncio.gather(
+        in_pool(get_object_or_404)(User, username=username),
+        _paginate(request, queryset.for_cards()),
+    )
+    following = await in_pool(is_following)(user, profile)
+    return await _render(request, 'blog/profile.html', _list_context(
+        page, profile=profile, is_following=following))
+
+
+async def post_detail(request, pk):
+    user = await in_pool(_resolve_user)(request)
+    # комментарии скрытого поста не выбираются: сначала видимость
+    post = await in_pool(get_visible_post_or_404)(user, pk)
+    comments = await in_pool(lambda: list(
+        Comment.objects.filter(post_id=pk).select_related('author')))()
+    post.comment_count = len(comments)
+    return await _render(request, 'blog/detail.html', {
+        'object': post,
+        'post': post,
+        'form': CreateCommentForm(),
+        'comments': comments,
+        'comment_stream_url': comment_stream_url(post, comments, user),
+    })
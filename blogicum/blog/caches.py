@@ -0,0 +1,47 @@
+from core.cache import LocalCache
+from .models import Category, Location
+
+
+class ReferenceCache:
+    """Небольшая справочная таблица целиком в памяти процесса.
+
+    Строки индексируются по pk и, если задано поле, по slug.
+    Экземпляры общие для всех запросов, их нельзя изменять.
+    """
+
+    def __init__(self, model, slug_field=None):
+        self.model = model
+        self.slug_field = slug_field
+        self._cache = LocalCache(f'reference:{model._meta.label_lower}')
+
+    def _rows(self):
+        rows = self._cache.get('rows')
+        if rows is None:
+            objects = list(self.model.objects.all())
+            rows = {
+                'pk': {obj.pk: obj for obj in objects},
+                'slug': {
+                    getattr(obj, self.slug_field): obj for obj in objects
+                } if self.slug_field else {},
+            }
+            self._cache.set('rows', rows)
+        return rows
+
+    def get(self, pk):
+        return self._rows()['pk'].get(pk)
+
+    def get_by_slug(self, slug):
+        return self._rows()['slug'].get(slug)
+
+    def invalidate(self):
+        self._cache.invalidate()
+
+
+category_cache = ReferenceCache(Category, slug_field='slug')
+location_cache = ReferenceCache(Location)
+
+# поле внешнего ключа Post -> кэш, из которого берётся связанный объект
+POST_REFERENCE_CACHES = {
+    'category': category_cache,
+    'location': location_cache,
+}
@@ -0,0 +1,227 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.syndication.views import Feed
+from django.core.cache import caches
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from core.cache import SHARED_CACHE_ALIAS, bump_generation, get_generation
+from .caches import category_cache
+from .models import Post
+
+User = get_user_model()
+
+FEED_TYPES = {
+    'rss': Rss201rev2Feed,
+    'atom': Atom1Feed,
+}
+
+GLOBAL_SCOPE = 'all'
+_GLOBAL_GENERATION_KEY = 'feed-generation'
+_AUTHORS_GENERATION_KEY = 'feed-authors'
+
+
+class PostsFeed(Feed):
+    """Последние опубликованные посты всего блога."""
+
+    title = 'Блогикум'
+    description = 'Новые публикации'
+
+    def __init__(self, feed_type):
+        self.feed_type = feed_type
+
+    def scope_filter(self, obj):
+        return {}
+
+    def link(self, obj):
+        return reverse('blog:index')
+
+    def items(self, obj):
+        return (Post.objects.published().filter(**self.scope_filter(obj))
+                .select_related('author').with_cached_references()
+                [:settings.FEED_ITEMS])
+
+    def next_publication(self, obj):
+        """Дата ближайшего отложенного поста, который появится в ленте."""
+        return (Post.objects
+                .filter(is_published=True, pub_date__gt=timezone.now(),
+                        **self.scope_filter(obj))
+                .order_by('pub_date')
+                .values_list('pub_date', flat=True).first())
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('blog:post_detail', args=(item.pk,))
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return (item.category.title,) if item.category else ()
+
+
+class CategoryFeed(PostsFeed):
+
+    def get_object(self, request, category_slug):
+        category = category_cache.get_by_slug(category_slug)
+        if category is None or not category.is_published:
+            raise Http404('Категория не найдена.')
+        return category
+
+    def scope_filter(self, obj):
+        return {'category': obj}
+
+    def title(self, obj):
+        return f'Блогикум: {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('blog:category_posts', args=(obj.slug,))
+
+
+class AuthorFeed(PostsFeed):
+
+    def get_object(self, request, author_id):
+        return get_object_or_404(User, pk=author_id)
+
+    def scope_filter(self, obj):
+        return {'author': obj}
+
+    def title(self, obj):
+        return f'Блогикум: {obj.get_full_name() or obj.username}'
+
+    def description(self, obj):
+        return f'Публикации пользователя {obj.username}'
+
+    def link(self, obj):
+        return reverse('blog:profile', args=(obj.username,))
+
+
+def category_scope(slug):
+    return f'category:{slug}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def _scope_generation_key(scope):
+    return f'feed-generation:{scope}'
+
+
+def _entry_key(scope, feed_format, host):
+    return ':'.join((
+        'feed', scope, feed_format, host,
+        get_generation(_GLOBAL_GENERATION_KEY),
+        get_generation(_scope_generation_key(scope)),
+    ))
+
+
+def invalidate_feeds(*scopes):
+    """Сбрасывает ленты указанных областей; без аргументов — все ленты."""
+    if not scopes:
+        bump_generation(_GLOBAL_GENERATION_KEY)
+        return
+    bump_generation(*map(_scope_generation_key, scopes))
+
+
+def invalidate_author_names():
+    """Сбрасывает соответствие имён пользователей их идентификаторам."""
+    bump_generation(_AUTHORS_GENERATION_KEY)
+
+
+def _author_id(username):
+    """Идентификатор автора по имени.
+
+    Соответствие хранится до invalidate_author_names(), которая
+    вызывается при любом сохранении пользователя.
+    """
+    cache = caches[SHARED_CACHE_ALIAS]
+    key = f'feed-author:{get_generation(_AUTHORS_GENERATION_KEY)}:{username}'
+    author_id = cache.get(key)
+    if author_id is None:
+        author_id = User.objects.filter(username=username).values_list(
+            'pk', flat=True).first()
+        if author_id is None:
+            raise Http404('Пользователь не найден.')
+        cache.set(key, author_id, settings.FEED_CACHE_TIMEOUT)
+    return author_id
+
+
+def _render(request, feed, kwargs):
+    # то же, что Feed.__call__, но объект ленты запрашивается один раз
+    obj = feed.get_object(request, **kwargs)
+    feedgen = feed.get_feed(obj, request)
+    body = feedgen.writeString('utf-8')
+    timeout = settings.FEED_CACHE_TIMEOUT
+    next_publication = feed.next_publication(obj)
+    if next_publication is not None:
+        # отложенный пост должен появиться в ленте без правки данных
+        timeout = min(timeout, max(1, int(
+            (next_publication - timezone.now()).total_seconds()) + 1))
+    return {
+        'body': body,
+        'content_type': feedgen.content_type,
+        'etag': quote_etag(hashlib.md5(body.encode()).hexdigest()),
+        'last_modified': http_date(feedgen.latest_post_date().timestamp()),
+    }, timeout
+
+
+def serve_feed(request, feed_class, scope, feed_format, **kwargs):
+    """Отдаёт ленту из общего кэша, перестраивая её после изменений.
+
+    Тело хранится уже сериализованным, поэтому повторный запрос без
+    изменений обходится без обращения к БД, а с ETag — ответом 304.
+    """
+    feed_type = FEED_TYPES.get(feed_format)
+    if feed_type is None:
+        raise Http404('Неизвестный формат ленты.')
+    cache = caches[SHARED_CACHE_ALIAS]
+    key = _entry_key(scope, feed_format, request.get_host())
+    entry = cache.get(key)
+    if entry is None:
+        entry, timeout = _render(request, feed_class(feed_type), kwargs)
+        cache.set(key, entry, timeout)
+
+    response = HttpResponse(entry['body'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    if entry['last_modified']:
+        response['Last-Modified'] = entry['last_modified']
+    patch_cache_control(response, public=True,
+                        max_age=settings.FEED_MAX_AGE)
+    return get_conditional_response(
+        request, etag=entry['etag'],
+        last_modified=parse_http_date_safe(entry['last_modified'] or ''),
+        response=response)
+
+
+def posts_feed(request, feed_format):
+    return serve_feed(request, PostsFeed, GLOBAL_SCOPE, feed_format)
+
+
+def category_feed(request, category_slug, feed_format):
+    return serve_feed(request, CategoryFeed, category_scope(category_slug),
+                      feed_format, category_slug=category_slug)
+
+
+def author_feed(request, username, feed_format):
+    author_id = _author_id(username)
+    return serve_feed(request, AuthorFeed, author_scope(author_id),
+                      feed_format, author_id=author_id)
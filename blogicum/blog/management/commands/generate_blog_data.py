@@ -0,0 +1,41 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+
+from perf import datasets
+
+
+class Command(BaseCommand):
+    help = ('Создаёт синтетические данные блога в объёме продакшена '
+            'через perf.datasets.build(): пользователей, категории, '
+            'локации, посты и комментарии. Объекты создаются bulk_create '
+            'в обход сигналов: для них не пишутся исходящие события и '
+            'журнал изменений API и не заполняются ленты подписок; кэши '
+            'и ленты RSS сбрасываются после вставки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=30)
+        parser.add_argument('--locations', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments-per-post', type=int, default=3)
+        parser.add_argument('--unpublished', type=float, default=0.03,
+                            help='Доля снятых с публикации постов.')
+        parser.add_argument('--deferred', type=float, default=0.02,
+                            help='Доля отложенных публикаций.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int,
+                            default=multiprocessing.cpu_count())
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        datasets.build(**{
+            name: options[name] for name in (
+                'users', 'categories', 'locations', 'posts',
+                'comments_per_post', 'unpublished', 'deferred',
+                'batch_size', 'workers', 'seed')
+        })
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started:.1f} с'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from blog import timelines
+
+
+class Command(BaseCommand):
+    help = ('Обрезает ленты подписок до TIMELINE_MAX_ENTRIES самых '
+            'новых записей на пользователя.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-entries', type=int)
+
+    def handle(self, *args, **options):
+        deleted = timelines.prune(options['max_entries'])
+        self.stdout.write(f'Удалено записей лент: {deleted}')
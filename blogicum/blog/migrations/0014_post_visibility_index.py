@@ -0,0 +1,17 @@
+# Generated by Django 3.2.16 on 2026-10-19 09:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_follow_timeline'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['pub_date', 'is_published', 'category', 'author'], name='post_pub_date_visibility_idx'),
+        ),
+    ]
@@ -1,15 +1,16 @@
 from django.urls import reverse
+from django.utils import timezone
 from django.db import models
 from django.contrib.auth import get_user_model
 
-from core.models import BlogBaseModel
+from core.models import AtomicSaveMixin, BlogBaseModel
 from .querysets import PostQuerySet
 
 
 User = get_user_model()
 
 
-class Post(BlogBaseModel):
+class Post(AtomicSaveMixin, BlogBaseModel):
     title = models.CharField(max_length=256,
                              verbose_name='Заголовок')
     text = models.TextField(verbose_name='Текст')
@@ -39,14 +40,59 @@ class Post(BlogBaseModel):
 
     objects = PostQuerySet.as_manager()
 
+    # заполняется заранее в PostQuerySet.with_comment_count()
+    _comment_count = None
+    # значения полей при загрузке из БД, см. from_db()
+    _loaded_values = {}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # по прежним категории и автору сбрасываются их ленты без
+        # повторного чтения поста перед сохранением
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     @property
     def comment_count(self):
-        return Comment.objects.filter(post=self).count()
+        if self._comment_count is None:
+            self._comment_count = Comment.objects.filter(post=self).count()
+        return self._comment_count
+
+    @comment_count.setter
+    def comment_count(self, value):
+        self._comment_count = value
+
+    def is_visible_to(self, user):
+        if user.is_authenticated and self.author_id == user.pk:
+            return True
+        return (
+            self.is_published
+            and self.pub_date <= timezone.now()
+            and self.category is not None
+            and self.category.is_published
+        )
 
     class Meta:
         verbose_name = 'публикация'
         verbose_name_plural = 'Публикации'
         ordering = ('-pub_date',)
+        indexes = (
+            # частичный индекс: SQLite не использует составной индекс
+            # для условия по булевому полю без сравнения
+            models.Index(fields=('pub_date',),
+                         condition=models.Q(is_published=True),
+                         name='post_published_pub_date_idx'),
+            models.Index(fields=('author', 'pub_date'),
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=('category', 'pub_date'),
+                         name='post_category_pub_date_idx'),
+            # видимость для пользователя, см.
+            # PostQuerySet.available_for_user
+            models.Index(fields=('pub_date', 'is_published', 'category',
+                                 'author'),
+                         name='post_pub_date_visibility_idx'),
+        )
 
     def get_success_url(self):
         return reverse('blog:profile')
@@ -55,7 +101,7 @@ class Post(BlogBaseModel):
         return self.title
 
 
-class Category(BlogBaseModel):
+class Category(AtomicSaveMixin, BlogBaseModel):
     title = models.CharField(max_length=256,
                              verbose_name='Заголовок')
     description = models.TextField(verbose_name='Описание')
@@ -85,7 +131,7 @@ class Location(BlogBaseModel):
         return self.name
 
 
-class Comment(models.Model):
+class Comment(AtomicSaveMixin, models.Model):
     text = models.TextField('Текст комментария')
     post = models.ForeignKey(Post,
                              on_delete=models.CASCADE,
@@ -103,3 +149,79 @@ class Comment(models.Model):
         verbose_name = 'комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ('created_at',)
+        indexes = (
+            models.Index(fields=('post', 'created_at'),
+                         name='comment_post_created_at_idx'),
+        )
+
+
+class Follow(models.Model):
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='following',
+                             verbose_name='Подписчик')
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='followers',
+                               verbose_name='Автор')
+    created_at = models.DateTimeField(auto_now_add=True,
+                                      verbose_name='Время подписки')
+
+    class Meta:
+        verbose_name = 'подписка'
+        verbose_name_plural = 'Подписки'
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'author'),
+                                    name='unique_follow'),
+            models.CheckConstraint(check=~models.Q(user=models.F('author')),
+                                   name='follow_not_self'),
+        )
+
+    def __str__(self):
+        return f'{self.user} → {self.author}'
+
+
+class FollowerCount(models.Model):
+    """Число подписчиков автора; по нему выбирается способ доставки."""
+
+    author = models.OneToOneField(User,
+                                  on_delete=models.CASCADE,
+                                  primary_key=True,
+                                  related_name='follower_count',
+                                  verbose_name='Автор')
+    followers = models.PositiveIntegerField('Подписчиков', default=0)
+
+    class Meta:
+        verbose_name = 'число подписчиков'
+        verbose_name_plural = 'Числа подписчиков'
+
+
+class TimelineEntry(models.Model):
+    """Пост автора в ленте подписчика, разосланный при публикации."""
+
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='+',
+                             verbose_name='Читатель')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='timeline_entries',
+                             verbose_name='Публикация')
+    # копии полей поста: по ним идут сортировка и отписка без JOIN
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='+',
+                               verbose_name='Автор')
+    pub_date = models.DateTimeField('Дата и время публикации')
+
+    class Meta:
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'Записи лент'
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'post'),
+                                    name='unique_timeline_entry'),
+        )
+        indexes = (
+            models.Index(fields=('user', '-pub_date', '-post'),
+                         name='timeline_user_pub_date_idx'),
+        )
@@ -1,29 +1,106 @@
 from django.db import models
+from django.db.models import Count, Q
+from django.db.models.query import ModelIterable
 from django.utils import timezone
-from django.db.models import Q
+
+
+class CachedReferencesIterable(ModelIterable):
+    """Подставляет категорию и локацию поста из кэша процесса."""
+
+    def __iter__(self):
+        from .caches import POST_REFERENCE_CACHES
+
+        fields = [
+            (self.queryset.model._meta.get_field(name), cache)
+            for name, cache in POST_REFERENCE_CACHES.items()
+        ]
+        for obj in super().__iter__():
+            for field, cache in fields:
+                value_id = getattr(obj, field.attname)
+                if value_id is None or field.is_cached(obj):
+                    continue
+                value = cache.get(value_id)
+                if value is not None:
+                    field.set_cached_value(obj, value)
+            yield obj
+
+
+class CommentCountIterable(ModelIterable):
+    """Заполняет comment_count одним запросом на всю выборку.
+
+    В отличие от аннотации, не усложняет запрос постов, в том числе
+    COUNT для пагинации.
+    """
+
+    def __iter__(self):
+        posts = list(super().__iter__())
+        comment_model = self.queryset.model._meta.get_field(
+            'comments').related_model
+        counts = dict(
+            comment_model.objects
+            .filter(post__in=[post.pk for post in posts])
+            .order_by()
+            .values_list('post')
+            .annotate(total=Count('pk'))
+        ) if posts else {}
+        for post in posts:
+            post.comment_count = counts.get(post.pk, 0)
+        return iter(posts)
+
+
+class PostCardIterable(CommentCountIterable, CachedReferencesIterable):
+    pass
+
+
+def _published():
+    return Q(is_published=True,
+             pub_date__lte=timezone.now(),
+             category__is_published=True)
 
 
 class PostQuerySet(models.QuerySet):
 
     def published(self):
-        now = timezone.now()
-        return self.filter(is_published=True,
-                           pub_date__lte=now,
-                           category__is_published=True)
+        return self.filter(_published())
 
     def in_category(self, category):
         return category.posts.published()
 
+    def with_comment_count(self):
+        clone = self._chain()
+        clone._iterable_class = CommentCountIterable
+        return clone
+
+    def for_cards(self):
+        """Всё, что нужно шаблону карточки поста, без запросов на пост."""
+        clone = self.select_related('author')
+        clone._iterable_class = PostCardIterable
+        return clone
+
+    def with_cached_references(self):
+        clone = self._chain()
+        clone._iterable_class = CachedReferencesIterable
+        return clone
+
     def available_for_user(self, user, queryset=None):
         if queryset is None:
             queryset = self
 
-        now = timezone.now()
         if user.is_authenticated:
-            return queryset.filter(
-                Q(is_published=True,
-                  category__is_published=True,
-                  pub_date__lte=now)
-                | Q(author=user)
-            )
+            # индекс post_pub_date_visibility_idx отдаёт строки в порядке
+            # сортировки и содержит поля условия, поэтому без временного
+            # B-дерева, а с LIMIT просмотр останавливается на N строках
+            return queryset.filter(_published() | Q(author=user))
         return queryset.published()
+
+    def get_visible(self, user, **lookups):
+        """Получает пост по первичному ключу и проверяет видимость в Python.
+
+        Вызывает DoesNotExist, если пост недоступен пользователю.
+        """
+        post = self.get(**lookups)
+        if not post.is_visible_to(user):
+            raise self.model.DoesNotExist(
+                f'{self.model._meta.object_name} matching query does not '
+                'exist.')
+        return post
@@ -0,0 +1,128 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import outbox
+from core.models import OutboxEvent
+from .caches import category_cache, location_cache
+from .feeds import (
+    GLOBAL_SCOPE,
+    author_scope,
+    category_scope,
+    invalidate_author_names,
+    invalidate_feeds,
+)
+from .models import Category, Comment, Follow, Location, Post
+from .sitemaps import invalidate_sitemap
+from .streams import broker
+from .timelines import (
+    add_follower,
+    remove_follower,
+    schedule_fan_out,
+    update_pub_date,
+)
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(**kwargs):
+    # до фиксации другой процесс успел бы закэшировать старые строки
+    transaction.on_commit(category_cache.invalidate)
+    transaction.on_commit(invalidate_feeds)
+    transaction.on_commit(invalidate_sitemap)
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def invalidate_location_cache(**kwargs):
+    transaction.on_commit(location_cache.invalidate)
+
+
+def _feed_scopes(category_id, author_id):
+    scopes = {GLOBAL_SCOPE, author_scope(author_id)}
+    if category_id is None:
+        return scopes
+    category = category_cache.get(category_id)
+    if category is not None:
+        scopes.add(category_scope(category.slug))
+    return scopes
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(instance, **kwargs):
+    scopes = _feed_scopes(instance.category_id, instance.author_id)
+    # пост мог сменить категорию или автора: прежние ленты тоже устарели
+    loaded = instance._loaded_values
+    if 'category_id' in loaded and 'author_id' in loaded:
+        scopes |= _feed_scopes(loaded['category_id'], loaded['author_id'])
+    transaction.on_commit(lambda: invalidate_feeds(*scopes))
+    post_id = instance.pk
+    transaction.on_commit(lambda: invalidate_sitemap(post_id))
+
+
+@receiver(post_save, sender=Post)
+def deliver_to_timelines(instance, created, **kwargs):
+    if created:
+        schedule_fan_out(instance)
+    else:
+        update_pub_date(instance)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(instance, created, **kwargs):
+    if created:
+        add_follower(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def count_unfollow(instance, **kwargs):
+    remove_follower(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_author_feeds(instance, update_fields=None, **kwargs):
+    # вход пользователя обновляет только last_login, ленты не меняются
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    # имя автора выводится в его ленте и в общей
+    scopes = _feed_scopes(None, instance.pk)
+    transaction.on_commit(lambda: invalidate_feeds(*scopes))
+    transaction.on_commit(invalidate_author_names)
+
+
+def _outbox_action(signal):
+    return OutboxEvent.SAVE if signal is post_save else OutboxEvent.DELETE
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def record_post_event(instance, signal, **kwargs):
+    outbox.record('post', instance, _outbox_action(signal),
+                  author_id=instance.author_id,
+                  category_id=instance.category_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def record_comment_event(instance, signal, **kwargs):
+    outbox.record('comment', instance, _outbox_action(signal),
+                  post_id=instance.post_id, author_id=instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def publish_new_comment(instance, created, **kwargs):
+    # подписчики этого процесса получат комментарий, не дожидаясь опроса
+    if created:
+        transaction.on_commit(lambda: broker.publish(instance))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def record_category_event(instance, signal, **kwargs):
+    outbox.record('category', instance, _outbox_action(signal),
+                  slug=instance.slug)
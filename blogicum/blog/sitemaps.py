@@ -0,0 +1,169 @@
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Max
+from django.http import FileResponse, Http404, HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+
+from core.cache import SHARED_CACHE_ALIAS, bump_generation, get_generation
+from .models import Post
+
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+# строк за один запрос при обходе постов шарда
+BATCH_SIZE = 2000
+
+_GLOBAL_GENERATION_KEY = 'sitemap-generation'
+
+
+def shard_of(post_id):
+    return post_id // settings.SITEMAP_SHARD_SIZE
+
+
+def _shard_generation_key(generation, shard):
+    return f'sitemap-shard-generation:{generation}:{shard}'
+
+
+def _shard_count_key(generation):
+    return f'sitemap-shard-count:{generation}'
+
+
+def _shard_key(shard, host):
+    generation = get_generation(_GLOBAL_GENERATION_KEY)
+    shard_generation = get_generation(
+        _shard_generation_key(generation, shard))
+    return f'sitemap:{generation}:{shard_generation}:{host}:{shard}'
+
+
+def invalidate_sitemap(*post_ids):
+    """Сбрасывает шарды с указанными постами; без аргументов — все."""
+    if not post_ids:
+        bump_generation(_GLOBAL_GENERATION_KEY)
+        return
+    generation = get_generation(_GLOBAL_GENERATION_KEY)
+    shards = {shard_of(pk) for pk in post_ids}
+    bump_generation(*(
+        _shard_generation_key(generation, shard) for shard in shards))
+    # пост за последним шардом добавляет новый шард
+    cache = caches[SHARED_CACHE_ALIAS]
+    count = cache.get(_shard_count_key(generation))
+    if count is not None and max(shards) >= count:
+        cache.delete(_shard_count_key(generation))
+
+
+def iter_shard(shard):
+    """Опубликованные посты шарда по возрастанию id, без OFFSET."""
+    size = settings.SITEMAP_SHARD_SIZE
+    last_id = shard * size - 1
+    end = (shard + 1) * size
+    while True:
+        batch = list(
+            Post.objects.published()
+            .filter(pk__gt=last_id, pk__lt=end)
+            .order_by('pk')
+            .values_list('pk', 'pub_date')[:BATCH_SIZE])
+        yield from batch
+        if len(batch) < BATCH_SIZE:
+            return
+        last_id = batch[-1][0]
+
+
+def _next_publication(shard):
+    size = settings.SITEMAP_SHARD_SIZE
+    return (Post.objects
+            .filter(is_published=True, pub_date__gt=timezone.now(),
+                    pk__gte=shard * size, pk__lt=(shard + 1) * size)
+            .order_by('pub_date')
+            .values_list('pub_date', flat=True).first())
+
+
+def build_shard(request, shard, path):
+    """Пишет шард во временный файл и атомарно подменяет им path."""
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                   f'<urlset xmlns="{XMLNS}">\n')
+        for pk, pub_date in iter_shard(shard):
+            location = request.build_absolute_uri(
+                reverse('blog:post_detail', args=(pk,)))
+            file.write(f'<url><loc>{escape(location)}</loc>'
+                       f'<lastmod>{pub_date.date().isoformat()}</lastmod>'
+                       '</url>\n')
+        file.write('</urlset>\n')
+    os.replace(tmp_path, path)
+
+
+def _shard_path(request, shard):
+    """Файл актуальной версии шарда; при необходимости строит его.
+
+    В шарде абсолютные ссылки, поэтому у каждого хоста свои файлы.
+    """
+    cache = caches[SHARED_CACHE_ALIAS]
+    host = request.get_host()
+    key = _shard_key(shard, host)
+    name = cache.get(key)
+    directory = Path(settings.SITEMAP_DIR)
+    if name is not None and (directory / name).exists():
+        return directory / name
+
+    directory.mkdir(parents=True, exist_ok=True)
+    host_hash = hashlib.md5(host.encode()).hexdigest()[:12]
+    prefix = f'{shard}-{host_hash}-'
+    name = f'{prefix}{uuid.uuid4().hex}.xml'
+    build_shard(request, shard, directory / name)
+    timeout = settings.SITEMAP_CACHE_TIMEOUT
+    next_publication = _next_publication(shard)
+    if next_publication is not None:
+        timeout = min(timeout, max(1, int(
+            (next_publication - timezone.now()).total_seconds()) + 1))
+    cache.set(key, name, timeout)
+    for old in directory.glob(f'{prefix}*.xml'):
+        if old.name != name:
+            old.unlink(missing_ok=True)
+    return directory / name
+
+
+def shard_count():
+    """Число шардов; хранится в общем кэше до смены поколения."""
+    cache = caches[SHARED_CACHE_ALIAS]
+    key = _shard_count_key(get_generation(_GLOBAL_GENERATION_KEY))
+    count = cache.get(key)
+    if count is None:
+        max_id = Post.objects.aggregate(max_id=Max('pk'))['max_id']
+        count = 0 if max_id is None else shard_of(max_id) + 1
+        cache.set(key, count, settings.SITEMAP_CACHE_TIMEOUT)
+    return count
+
+
+def sitemap_index(request):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             f'<sitemapindex xmlns="{XMLNS}">']
+    for shard in range(shard_count()):
+        location = request.build_absolute_uri(
+            reverse('blog:sitemap_shard', args=(shard,)))
+        lines.append(f'<sitemap><loc>{escape(location)}</loc></sitemap>')
+    lines.append('</sitemapindex>\n')
+    response = HttpResponse('\n'.join(lines), content_type='application/xml')
+    patch_cache_control(response, public=True,
+                        max_age=settings.SITEMAP_MAX_AGE)
+    return response
+
+
+def sitemap_shard(request, shard):
+    if shard >= shard_count():
+        raise Http404('Нет такого шарда карты сайта.')
+    try:
+        file = open(_shard_path(request, shard), 'rb')
+    except FileNotFoundError:
+        # другой процесс только что заменил шард новой версией
+        file = open(_shard_path(request, shard), 'rb')
+    response = FileResponse(file, content_type='application/xml')
+    patch_cache_control(response, public=True,
+                        max_age=settings.SITEMAP_MAX_AGE)
+    return response
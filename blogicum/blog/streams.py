@@ -0,0 +1,335 @@
+"""Поток новых комментариев поста (Server-Sent Events) для ASGI.
+
+Соединения обслуживаются в blogicum.asgi, минуя Django: ожидающее
+соединение стоит одну корутину и очередь. Новые комментарии берутся
+из исходящих событий (core.models.OutboxEvent) одним опросом на
+процесс, фрагмент каждого комментария рендерится один раз для его
+автора и один раз для остальных подписчиков. add_comment будит опрос
+своего процесса сразу, а остальные процессы замечают комментарий
+не позже чем через COMMENT_STREAM_POLL_INTERVAL.
+"""
+import asyncio
+import logging
+import re
+from collections import defaultdict
+from importlib import import_module
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Max
+from django.http import HttpRequest
+from django.http.cookie import parse_cookie
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from core.auth import get_user
+from core.models import OutboxEvent
+from core.outbox import visible_position
+from core.pool import in_pool
+from .models import Comment, Post
+
+logger = logging.getLogger('blog.streams')
+
+STREAM_PATH = re.compile(r'^/posts/(?P<pk>\d+)/comments/stream/$')
+
+# сигнал проверки соединения и сигнал закрытия потока
+PING = object()
+CLOSE = None
+# событий исходящей очереди за один опрос
+BATCH_SIZE = 500
+
+
+def comment_stream_url(post, comments, user):
+    """Адрес потока для страницы поста или None.
+
+    None, если поток выключен или пост не виден пользователю.
+    """
+    if not settings.COMMENT_STREAM or not post.is_visible_to(user):
+        return None
+    after = max((comment.pk for comment in comments), default=0)
+    return f'{reverse("blog:post_detail", args=(post.pk,))}comments/stream/' \
+        f'?after={after}'
+
+
+def render_fragment(comment, user):
+    return render_to_string(
+        'includes/comment.html', {'comment': comment, 'user': user})
+
+
+def render_fragments(comment):
+    """Фрагменты комментария по id зрителя: для автора и для остальных.
+
+    Шаблон зависит от пользователя только тем, автор ли он комментария.
+    """
+    return {
+        comment.author_id: render_fragment(comment, comment.author),
+        None: render_fragment(comment, AnonymousUser()),
+    }
+
+
+def close(queue):
+    """Прерывает поток, даже если его очередь заполнена."""
+    while not queue.empty():
+        queue.get_nowait()
+    queue.put_nowait(CLOSE)
+
+
+class Broker:
+    """Раздаёт фрагменты новых комментариев подписчикам процесса."""
+
+    def __init__(self):
+        # post_id -> очереди подключённых к посту соединений
+        self.subscribers = defaultdict(set)
+        # фрагменты, уже отрендеренные в add_comment этого процесса
+        self.fragments = {}
+        self.loop = None
+        self.task = None
+        self.ready = None
+        self.wakeup = None
+        self.position = None
+        self.last_comment_id = None
+
+    async def subscribe(self, post_id):
+        """Подписывает на пост: новые комментарии придут в очередь."""
+        if self.task is None or self.task.done():
+            self.loop = asyncio.get_running_loop()
+            self.ready = asyncio.Event()
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.ensure_future(self.run())
+        queue = asyncio.Queue(maxsize=settings.COMMENT_STREAM_QUEUE_SIZE)
+        self.subscribers[post_id].add(queue)
+        await self.ready.wait()
+        return queue
+
+    def unsubscribe(self, post_id, queue):
+        queues = self.subscribers.get(post_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self.subscribers[post_id]
+
+    def publish(self, comment):
+        """Сообщает о новом комментарии; вызывается из любого потока."""
+        loop = self.loop
+        if loop is None or comment.post_id not in self.subscribers:
+            return
+        self.fragments[comment.pk] = render_fragments(comment)
+        loop.call_soon_threadsafe(self.wakeup.set)
+
+    def deliver(self, post_id, item):
+        for queue in list(self.subscribers.get(post_id, ())):
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                # клиент не успевает читать: поток закрывается, а при
+                # переподключении пропущенное отдаётся по Last-Event-ID
+                self.unsubscribe(post_id, queue)
+                close(queue)
+
+    def broadcast(self, item):
+        for post_id in list(self.subscribers):
+            self.deliver(post_id, item)
+
+    def _start(self):
+        self.position = (
+            OutboxEvent.objects.aggregate(last=Max('pk'))['last'] or 0)
+        self.last_comment_id = (
+            Comment.objects.aggregate(last=Max('pk'))['last'] or 0)
+
+    def _poll(self):
+        """Новые комментарии постов с подписчиками и их фрагменты."""
+        visible = visible_position(self.position, BATCH_SIZE)
+        if visible == self.position:
+            return []
+        if visible - self.position >= BATCH_SIZE:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+        events = list(
+            OutboxEvent.objects
+            .filter(pk__gt=self.position, pk__lte=visible, topic='comment',
+                    action=OutboxEvent.SAVE)
+            .order_by('pk')
+            .values_list('pk', 'object_id', 'payload'))
+        self.position = visible
+        if not events:
+            return []
+        # id комментариев растут, а события пишутся в порядке фиксации,
+        # поэтому меньший id означает правку старого комментария
+        # подписчики читаются после выборки событий: подписавшийся
+        # раньше фиксации комментария его не пропустит
+        comment_ids = [
+            object_id for _, object_id, payload in events
+            if object_id > self.last_comment_id
+            and payload.get('post_id') in self.subscribers
+        ]
+        self.last_comment_id = max(
+            self.last_comment_id, *(object_id for _, object_id, _ in events))
+        if not comment_ids:
+            return []
+        comments = (Comment.objects.filter(pk__in=comment_ids)
+                    .select_related('author').order_by('pk'))
+        rendered = {
+            comment: self.fragments.pop(comment.pk, None)
+            for comment in comments
+        }
+        for comment_id in list(self.fragments):
+            if comment_id <= self.last_comment_id:
+                self.fragments.pop(comment_id, None)
+        return [
+            (comment.post_id, comment.pk,
+             fragments or render_fragments(comment))
+            for comment, fragments in rendered.items()
+        ]
+
+    async def run(self):
+        await in_pool(self._start)()
+        self.ready.set()
+        loop = asyncio.get_running_loop()
+        heartbeat_at = loop.time() + settings.COMMENT_STREAM_HEARTBEAT
+        while self.subscribers:
+            try:
+                await asyncio.wait_for(
+                    self.wakeup.wait(),
+                    settings.COMMENT_STREAM_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                comments = await in_pool(self._poll)()
+            except Exception:
+                logger.exception('Не удалось получить новые комментарии')
+                continue
+            for post_id, comment_id, fragments in comments:
+                self.deliver(post_id, (comment_id, fragments))
+            if loop.time() >= heartbeat_at:
+                heartbeat_at = loop.time() + settings.COMMENT_STREAM_HEARTBEAT
+                self.broadcast(PING)
+
+
+broker = Broker()
+
+
+def _viewer(scope):
+    """Пользователь соединения по cookie сессии, как в Django."""
+    request = HttpRequest()
+    request.COOKIES = parse_cookie(_header(scope, b'cookie') or '')
+    engine = import_module(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    return get_user(request)
+
+
+def _visible_to(post_id, user):
+    try:
+        Post.objects.with_cached_references().get_visible(user, pk=post_id)
+    except Post.DoesNotExist:
+        return False
+    return True
+
+
+def _comments_after(post_id, after, user):
+    comments = (Comment.objects.filter(post_id=post_id, pk__gt=after)
+                .select_related('author').order_by('pk'))
+    return [(comment.pk, render_fragment(comment, user))
+            for comment in comments]
+
+
+def format_event(comment_id, fragment):
+    data = ''.join(f'data: {line}\n' for line in fragment.splitlines())
+    return f'id: {comment_id}\nevent: comment\n{data}\n'.encode()
+
+
+def _header(scope, name):
+    for header, value in scope['headers']:
+        if header == name:
+            return value.decode('latin-1')
+    return None
+
+
+def _last_event_id(scope):
+    last_event_id = _header(scope, b'last-event-id')
+    if last_event_id is not None:
+        return last_event_id
+    query = parse_qs(scope['query_string'].decode())
+    return query.get('after', [None])[0]
+
+
+async def _plain_response(send, status, text):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'text/plain; charset=utf-8')],
+    })
+    await send({'type': 'http.response.body', 'body': text.encode()})
+
+
+async def _wait_disconnect(receive, queue):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+    close(queue)
+
+
+async def _send_events(send, queue, after, user):
+    """Пишет события из очереди в поток до CLOSE."""
+    while True:
+        item = await queue.get()
+        if item is CLOSE:
+            return
+        if item is PING:
+            body = b': ping\n\n'
+        else:
+            comment_id, fragments = item
+            # комментарий мог уже уйти в начальной выборке
+            if comment_id <= after:
+                continue
+            after = comment_id
+            body = format_event(
+                comment_id, fragments.get(user.pk, fragments[None]))
+        await send({'type': 'http.response.body', 'body': body,
+                    'more_body': True})
+
+
+async def comment_stream(scope, receive, send, post_id):
+    """ASGI-приложение потока комментариев поста, видимого пользователю.
+
+    Если задан Last-Event-ID (или ?after=), сначала отдаёт комментарии
+    после него, затем новые по мере появления.
+    """
+    if scope['method'] != 'GET':
+        return await _plain_response(send, 405, 'Method Not Allowed')
+    last_event_id = _last_event_id(scope)
+    try:
+        after = int(last_event_id or 0)
+    except ValueError:
+        return await _plain_response(send, 400, 'Bad Request')
+    user = await in_pool(_viewer)(scope)
+    if not await in_pool(_visible_to)(post_id, user):
+        return await _plain_response(send, 404, 'Not Found')
+
+    queue = await broker.subscribe(post_id)
+    # отключение клиента кладёт в очередь CLOSE
+    disconnect = asyncio.ensure_future(_wait_disconnect(receive, queue))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        backlog = []
+        if last_event_id is not None:
+            backlog = await in_pool(_comments_after)(post_id, after, user)
+        body = b''.join(format_event(*event) for event in backlog)
+        await send({'type': 'http.response.body', 'body': body,
+                    'more_body': True})
+        if backlog:
+            after = backlog[-1][0]
+        await _send_events(send, queue, after, user)
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        broker.unsubscribe(post_id, queue)
+        disconnect.cancel()
@@ -0,0 +1,190 @@
+"""Лента подписок: гибрид рассылки при записи и слияния при чтении.
+
+Пост автора с небольшим числом подписчиков копируется в ленты всех
+подписчиков задачей fan_out. Посты авторов, у которых подписчиков не
+меньше TIMELINE_FANOUT_LIMIT, не рассылаются: при чтении они
+выбираются по индексу (author, pub_date) и сливаются с лентой. Лента
+пользователя ограничена TIMELINE_MAX_ENTRIES записями, лишнее удаляет
+prune() (manage.py prune_timelines или run_workers --prune).
+
+Число подписчиков ведут обработчики сигналов Follow, поэтому оно
+сходится и при удалении подписок каскадом или из админки.
+"""
+import heapq
+from itertools import product
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.pagination import after, decode_cursor, encode_cursor
+from core.jobs import enqueue
+from .constants import MAIN_PAGE_MAX_POSTS
+from .models import Follow, FollowerCount, Post, TimelineEntry
+
+ORDERING = ('-pub_date', '-pk')
+ENTRY_ORDERING = ('-pub_date', '-post_id')
+
+
+def _change_followers(author_id, delta):
+    """Новое число подписчиков или None, если автора уже удаляют."""
+    if delta > 0:
+        FollowerCount.objects.get_or_create(author_id=author_id)
+    FollowerCount.objects.filter(
+        author_id=author_id, followers__gte=-delta,
+    ).update(followers=F('followers') + delta)
+    return FollowerCount.objects.filter(author_id=author_id).values_list(
+        'followers', flat=True).first()
+
+
+def merged_on_read(author_id):
+    return FollowerCount.objects.filter(
+        author_id=author_id,
+        followers__gte=settings.TIMELINE_FANOUT_LIMIT).exists()
+
+
+def _entries(user_ids, author_id, posts):
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id,
+                       author_id=author_id, pub_date=pub_date)
+         for user_id, (post_id, pub_date) in product(user_ids, posts)),
+        batch_size=settings.TIMELINE_FANOUT_BATCH,
+        ignore_conflicts=True)
+
+
+def _recent_posts(author_id):
+    return list(
+        Post.objects.filter(author_id=author_id)
+        .order_by(*ORDERING)
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_BACKFILL])
+
+
+def _follower_batches(author_id):
+    """Подписчики автора пачками по id, без OFFSET."""
+    last_pk = 0
+    while True:
+        batch = list(
+            Follow.objects.filter(author_id=author_id, pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'user_id')[:settings.TIMELINE_FANOUT_BATCH])
+        if not batch:
+            return
+        yield [user_id for _, user_id in batch]
+        last_pk = batch[-1][0]
+
+
+def follow(user, author):
+    """Подписывает user на author; False, если подписка уже есть."""
+    with transaction.atomic():
+        _, created = Follow.objects.get_or_create(user=user, author=author)
+    return created
+
+
+def unfollow(user, author):
+    """Отменяет подписку; False, если её не было."""
+    deleted, _ = Follow.objects.filter(user=user, author=author).delete()
+    return bool(deleted)
+
+
+def add_follower(follow):
+    """Учитывает новую подписку и заполняет ленту подписчика."""
+    followers = _change_followers(follow.author_id, 1)
+    if followers < settings.TIMELINE_FANOUT_LIMIT:
+        _entries([follow.user_id], follow.author_id,
+                 _recent_posts(follow.author_id))
+
+
+def remove_follower(follow):
+    """Учитывает отменённую подписку и чистит ленту подписчика."""
+    followers = _change_followers(follow.author_id, -1)
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, author_id=follow.author_id).delete()
+    if followers == settings.TIMELINE_FANOUT_LIMIT - 1:
+        # посты, вышедшие, пока автор сливался при чтении, в лентах
+        # отсутствуют: без рассылки они пропали бы из них
+        enqueue(refill, follow.author_id, lane=settings.TIMELINE_LANE)
+
+
+def fan_out(post_id):
+    """Задача: копирует новый пост в ленты подписчиков автора."""
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'pub_date').first()
+    if post is None:
+        return
+    author_id, pub_date = post
+    if merged_on_read(author_id):
+        return
+    for user_ids in _follower_batches(author_id):
+        _entries(user_ids, author_id, [(post_id, pub_date)])
+
+
+def refill(author_id):
+    """Задача: возвращает последние посты автора в ленты подписчиков."""
+    if merged_on_read(author_id):
+        return
+    posts = _recent_posts(author_id)
+    for user_ids in _follower_batches(author_id):
+        _entries(user_ids, author_id, posts)
+
+
+def schedule_fan_out(post):
+    transaction.on_commit(lambda: enqueue(
+        fan_out, post.pk, lane=settings.TIMELINE_LANE))
+
+
+def update_pub_date(post):
+    TimelineEntry.objects.filter(post=post).exclude(
+        pub_date=post.pub_date).update(pub_date=post.pub_date)
+
+
+def read(user, cursor=None, limit=MAIN_PAGE_MAX_POSTS):
+    """Страница ленты: посты и курсор следующей страницы или None.
+
+    Вызывает core.pagination.InvalidCursor для испорченного курсора.
+    """
+    stored = TimelineEntry.objects.filter(
+        user=user, pub_date__lte=timezone.now(),
+        post__is_published=True, post__category__is_published=True)
+    merged = Post.objects.published().filter(author__in=Follow.objects.filter(
+        user=user,
+        author__follower_count__followers__gte=settings.TIMELINE_FANOUT_LIMIT,
+    ).values('author'))
+    if cursor:
+        values = decode_cursor(cursor, Post, ORDERING)
+        stored = stored.filter(after(ENTRY_ORDERING, values))
+        merged = merged.filter(after(ORDERING, values))
+    stored = stored.order_by(*ENTRY_ORDERING).values_list(
+        'pub_date', 'post_id')[:limit + 1]
+    merged = merged.order_by(*ORDERING).values_list(
+        'pub_date', 'pk')[:limit + 1]
+
+    keys = []
+    for key in heapq.merge(stored, merged, reverse=True):
+        # пост автора, перешедшего порог, может оказаться в обоих списках
+        if not keys or keys[-1] != key:
+            keys.append(key)
+    page = keys[:limit]
+    posts = {
+        post.pk: post
+        for post in Post.objects.filter(
+            pk__in=[pk for _, pk in page]).for_cards()
+    }
+    next_cursor = encode_cursor(list(page[-1])) if len(keys) > limit else None
+    return [posts[pk] for _, pk in page if pk in posts], next_cursor
+
+
+def prune(max_entries=None):
+    """Оставляет в каждой ленте max_entries самых новых записей."""
+    max_entries = max_entries or settings.TIMELINE_MAX_ENTRIES
+    table = connection.ops.quote_name(TimelineEntry._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN ('
+            f' SELECT id FROM ('
+            f'  SELECT id, ROW_NUMBER() OVER ('
+            f'   PARTITION BY user_id ORDER BY pub_date DESC, post_id DESC'
+            f'  ) AS position FROM {table}'
+            f' ) AS ranked WHERE position > %s)',
+            [max_entries])
+        return cursor.rowcount
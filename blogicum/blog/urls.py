@@ -1,19 +1,40 @@
+from django.conf import settings
 from django.urls import include, path
 
-from . import views
+from . import async_views, feeds, sitemaps, views
 
 app_name = 'blog'
 
+if settings.ASYNC_VIEWS:
+    index_view = async_views.index
+    category_view = async_views.category_posts
+    profile_view = async_views.profile
+    post_detail_view = async_views.post_detail
+else:
+    index_view = views.BlogListView.as_view()
+    category_view = views.CategoryListView.as_view()
+    profile_view = views.ProfileListView.as_view()
+    post_detail_view = views.PostDetailView.as_view()
+
 profile_patterns = [
     path('edit/',
          views.UserUpdateView.as_view(),
          name='edit_profile'),
     path('',
-         views.ProfileListView.as_view(),
+         profile_view,
          name='profile'),
     path('<str:username>/',
-         views.ProfileListView.as_view(),
+         profile_view,
          name='profile'),
+    path('<str:username>/feed/<str:feed_format>/',
+         feeds.author_feed,
+         name='author_feed'),
+    path('<str:username>/follow/',
+         views.follow,
+         name='follow'),
+    path('<str:username>/unfollow/',
+         views.unfollow,
+         name='unfollow'),
 ]
 
 post_patterns = [
@@ -21,7 +42,7 @@ post_patterns = [
          views.PostCreateView.as_view(),
          name='create_post'),
     path('<int:pk>/',
-         views.PostDetailView.as_view(),
+         post_detail_view,
          name='post_detail'),
     path('<int:pk>/edit/',
          views.PostUpdateView.as_view(),
@@ -42,11 +63,26 @@ post_patterns = [
 
 urlpatterns = [
     path('',
-         views.BlogListView.as_view(),
+         index_view,
          name='index'),
     path('category/<slug:category_slug>/',
-         views.CategoryListView.as_view(),
+         category_view,
          name='category_posts'),
+    path('category/<slug:category_slug>/feed/<str:feed_format>/',
+         feeds.category_feed,
+         name='category_feed'),
+    path('feed/<str:feed_format>/',
+         feeds.posts_feed,
+         name='feed'),
+    path('timeline/',
+         views.timeline,
+         name='timeline'),
+    path('sitemap.xml',
+         sitemaps.sitemap_index,
+         name='sitemap'),
+    path('sitemap-<int:shard>.xml',
+         sitemaps.sitemap_shard,
+         name='sitemap_shard'),
     path('profile/', include(profile_patterns)),
     path('posts/', include(post_patterns)),
 ]
@@ -1,7 +1,9 @@
-from django.shortcuts import get_object_or_404, redirect
+from django.http import Http404
+from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
 from django.urls import reverse, reverse_lazy
 from django.views.generic import (
     UpdateView,
@@ -11,10 +13,14 @@ from django.views.generic import (
     DeleteView
 )
 
+from core.pagination import InvalidCursor
 from blogicum.forms import UserUpdateForm
-from .models import Post, Category, Comment
+from . import timelines
+from .caches import category_cache
+from .models import Post, Comment, Follow
 from .forms import CreatePostForm, CreateCommentForm
 from .mixins import PaginatorListMixin
+from .streams import comment_stream_url
 from .constants import (
     POST_ID_NAME,
     COMMENT_ID_NAME,
@@ -25,12 +31,25 @@ from .constants import (
 User = get_user_model()
 
 
+def get_visible_post_or_404(user, pk):
+    try:
+        return Post.objects.with_cached_references().get_visible(user, pk=pk)
+    except Post.DoesNotExist:
+        raise Http404('Публикация не найдена.')
+
+
 class BlogListView(PaginatorListMixin, ListView):
     model = Post
     template_name = 'blog/index.html'
 
     def get_queryset(self):
-        return Post.objects.published()
+        return Post.objects.published().for_cards()
+
+
+def is_following(user, author):
+    if not user.is_authenticated or user.pk == author.pk:
+        return None
+    return Follow.objects.filter(user=user, author=author).exists()
 
 
 class ProfileListView(PaginatorListMixin, ListView):
@@ -50,11 +69,13 @@ class ProfileListView(PaginatorListMixin, ListView):
         posts = url_user.posts_author.all()
         if url_user != current_user:
             posts = posts.published()
-        return posts
+        return posts.for_cards()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['profile'] = self._get_user()
+        context['is_following'] = is_following(
+            self.request.user, context['profile'])
         return context
 
 
@@ -67,8 +88,10 @@ class CategoryListView(PaginatorListMixin, ListView):
             return self._category
 
         category_slug = self.kwargs.get('category_slug')
-        self._category = get_object_or_404(
-            Category, slug=category_slug, is_published=True)
+        category = category_cache.get_by_slug(category_slug)
+        if category is None or not category.is_published:
+            raise Http404('Категория не найдена.')
+        self._category = category
         return self._category
 
     def get_context_data(self, **kwargs):
@@ -78,7 +101,7 @@ class CategoryListView(PaginatorListMixin, ListView):
 
     def get_queryset(self):
         category = self._get_category()
-        return Post.objects.in_category(category)
+        return Post.objects.in_category(category).for_cards()
 
 
 class PostCreateView(LoginRequiredMixin, CreateView):
@@ -100,16 +123,15 @@ class PostDetailView(DetailView):
     template_name = 'blog/detail.html'
 
     def get_object(self, queryset=None):
-        posts_for_user = Post.objects.available_for_user(
-            self.request.user, queryset)
-
-        obj = super().get_object(queryset=posts_for_user)
-        return obj
+        return get_visible_post_or_404(
+            self.request.user, self.kwargs[self.pk_url_kwarg])
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['form'] = CreateCommentForm()
         context['comments'] = self.object.comments.select_related('author')
+        context['comment_stream_url'] = comment_stream_url(
+            self.object, context['comments'], self.request.user)
         return context
 
 
@@ -188,7 +210,7 @@ class CommentDeleteView(LoginRequiredMixin, DeleteView):
 @login_required
 def add_comment(request, pk):
     user = request.user
-    post = get_object_or_404(Post.objects.available_for_user(user), pk=pk)
+    post = get_visible_post_or_404(user, pk)
     form = CreateCommentForm(request.POST)
 
     if not form.is_valid():
@@ -200,3 +222,33 @@ def add_comment(request, pk):
     comment.save()
 
     return redirect('blog:post_detail', pk=pk)
+
+
+@login_required
+@require_POST
+def follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if author.pk != request.user.pk:
+        timelines.follow(request.user, author)
+    return redirect('blog:profile', username=username)
+
+
+@login_required
+@require_POST
+def unfollow(request, username):
+    author = get_object_or_404(User, username=username)
+    timelines.unfollow(request.user, author)
+    return redirect('blog:profile', username=username)
+
+
+@login_required
+def timeline(request):
+    try:
+        posts, next_cursor = timelines.read(
+            request.user, request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404('Неверный курсор.')
+    return render(request, 'blog/timeline.html', {
+        'posts': posts,
+        'next_cursor': next_cursor,
+    })
@@ -13,4 +13,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogicum.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# импорт после настройки Django: модулю нужны модели
+from blog.streams import STREAM_PATH, comment_stream  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Потоки комментариев обслуживаются без Django, остальное — им."""
+    if scope['type'] == 'http':
+        match = STREAM_PATH.match(scope['path'])
+        if match:
+            return await comment_stream(
+                scope, receive, send, int(match['pk']))
+    await django_application(scope, receive, send)
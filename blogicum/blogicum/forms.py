@@ -2,6 +2,7 @@ from django import forms
 from django.forms import ValidationError
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
+from django.db import transaction
 
 from .constants import DENIED_USERNAMES
 
@@ -9,7 +10,15 @@ from .constants import DENIED_USERNAMES
 User = get_user_model()
 
 
-class CustomUserCreationForm(UserCreationForm):
+class AtomicSaveFormMixin:
+    """Сохраняет пользователя в одной транзакции с событием core.outbox."""
+
+    def save(self, commit=True):
+        with transaction.atomic():
+            return super().save(commit)
+
+
+class CustomUserCreationForm(AtomicSaveFormMixin, UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('username', 'first_name', 'last_name', 'email')
@@ -21,7 +30,7 @@ class CustomUserCreationForm(UserCreationForm):
         return username
 
 
-class UserUpdateForm(forms.ModelForm):
+class UserUpdateForm(AtomicSaveFormMixin, forms.ModelForm):
 
     class Meta:
         model = User
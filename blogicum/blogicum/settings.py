@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -25,8 +26,11 @@ ALLOWED_HOSTS = [
 # Application definition
 
 INSTALLED_APPS = [
+    'core.apps.CoreConfig',
     'blog.apps.BlogConfig',
     'pages.apps.PagesConfig',
+    'perf.apps.PerfConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -42,11 +46,19 @@ INTERNAL_IPS = [
 ]
 
 MIDDLEWARE = [
+    'perf.middleware.MemoryProfilerMiddleware',
+    'perf.middleware.SamplingProfilerMiddleware',
+    'perf.middleware.MetricsMiddleware',
+    'perf.middleware.ServerTimingMiddleware',
+    'perf.middleware.QueryInstrumentationMiddleware',
+    'perf.middleware.SlowQueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.auth.CachedAuthenticationMiddleware',
+    'perf.middleware.RequestLogMiddleware',
+    'perf.middleware.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -84,6 +96,186 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHE_DIR = BASE_DIR / 'cache'
+
+CACHES = {
+    # кэш в памяти конкретного процесса
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # общий для всех процессов на одной машине кэш
+    'shared': {
+        'BACKEND': 'core.cache.FileCache',
+        'LOCATION': CACHE_DIR / 'shared',
+        # при переполнении удаляется случайная треть файлов, в том числе
+        # сессии и метки поколений; переполнение проверяется раз
+        # в CULL_EVERY записей, а не на каждой
+        'OPTIONS': {'MAX_ENTRIES': 100000, 'CULL_EVERY': 1000},
+    },
+}
+
+
+# Sessions
+# https://docs.djangoproject.com/en/3.2/topics/http/sessions/
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'core.sessions',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_PROFILE = os.getenv('BLOGICUM_SESSION_PROFILE', 'cached_db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_PROFILE]
+SESSION_CACHE_ALIAS = 'shared'
+
+
+# Query instrumentation
+
+# учёт запросов к БД и поиск N+1 для каждого HTTP-запроса
+QUERY_INSTRUMENTATION = os.getenv('BLOGICUM_QUERY_INSTRUMENTATION') == '1'
+# сколько одинаковых по форме запросов считается признаком N+1
+QUERY_REPEAT_THRESHOLD = 3
+
+# заголовок Server-Timing и время фаз по именам URL в метрике
+# blogicum_phase_duration_seconds
+SERVER_TIMING = os.getenv('BLOGICUM_SERVER_TIMING') == '1'
+SERVER_TIMING_APPS = ('blog', 'pages')
+
+# метрики в формате Prometheus по адресу /perf/metrics/
+METRICS_ENABLED = os.getenv('BLOGICUM_METRICS') == '1'
+# каталог, через который процессы-воркеры складывают метрики
+METRICS_DIR = CACHE_DIR / 'metrics'
+METRICS_FLUSH_INTERVAL = 1
+METRICS_ACTIVE_USER_WINDOW = 15 * 60
+# доступ к метрикам: сотрудникам и по заголовку
+# Authorization: Bearer <METRICS_TOKEN>; адреса из INTERNAL_IPS пускаются
+# только явно, за прокси REMOTE_ADDR у всех запросов одинаковый
+METRICS_TOKEN = os.getenv('BLOGICUM_METRICS_TOKEN', '')
+METRICS_ALLOW_INTERNAL_IPS = os.getenv('BLOGICUM_METRICS_INTERNAL_IPS') == '1'
+if METRICS_ENABLED:
+    # попадания и промахи кэшей считает обёртка над настоящим бэкендом
+    for cache_config in CACHES.values():
+        cache_config['OPTIONS'] = {
+            **cache_config.get('OPTIONS', {}),
+            'BACKEND': cache_config['BACKEND'],
+        }
+        cache_config['BACKEND'] = 'perf.metrics.CountedCache'
+
+# профилирование запросов сотрудников по ?_profile=1 или X-Profile;
+# включается BLOGICUM_PROFILER=1
+PROFILER_ENABLED = os.getenv('BLOGICUM_PROFILER') == '1'
+PROFILE_DIR = CACHE_DIR / 'profiles'
+# сколько хранить отчёты профилировщика, см. PRUNE_TASKS
+PROFILE_RETENTION = 7 * 24 * 60 * 60
+
+# постоянный сэмплирующий профилировщик (SIGPROF), см. dump_flamegraph
+SAMPLING_PROFILER = os.getenv('BLOGICUM_SAMPLING_PROFILER') == '1'
+SAMPLING_INTERVAL = 0.01
+SAMPLING_WINDOW = 60
+SAMPLING_FLUSH_INTERVAL = 5
+SAMPLING_DIR = CACHE_DIR / 'samples'
+# сколько секунд хранятся окна сэмплов
+SAMPLING_RETENTION = 24 * 60 * 60
+
+# диагностика памяти через tracemalloc; сильно замедляет запросы
+MEMORY_PROFILER = os.getenv('BLOGICUM_MEMORY_PROFILER') == '1'
+MEMORY_PROFILER_REPORT_INTERVAL = 60
+# глубина стека на выделение: 1 хватает для отчёта по строкам,
+# 10 кадров замедляют страницу поста с 10k комментариев ещё в 5 раз
+MEMORY_PROFILER_FRAMES = 1
+MEMORY_PROFILER_DIR = CACHE_DIR / 'memory'
+
+# RSS/Atom-ленты: число постов, срок хранения в общем кэше и max-age
+FEED_ITEMS = 20
+FEED_CACHE_TIMEOUT = 24 * 60 * 60
+FEED_MAX_AGE = 5 * 60
+
+# карта сайта: шарды по диапазонам id постов, файлы шардов на диске
+SITEMAP_SHARD_SIZE = 10000
+SITEMAP_DIR = CACHE_DIR / 'sitemaps'
+SITEMAP_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+SITEMAP_MAX_AGE = 60 * 60
+
+# JSON API: размер страницы по умолчанию и наибольший допустимый limit
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+# записей журнала изменений за один запрос синхронизации
+API_CHANGES_LIMIT = 500
+
+# асинхронные страницы чтения для запуска под ASGI (blog.async_views);
+# запросы к БД и рендеринг идут в пуле core.pool из ASYNC_VIEW_THREADS потоков
+ASYNC_VIEWS = os.getenv('BLOGICUM_ASYNC_VIEWS') == '1'
+ASYNC_VIEW_THREADS = 8
+
+# поток новых комментариев поста (SSE) из blogicum.asgi, см. blog.streams;
+# опрос исходящих событий для комментариев из других процессов
+COMMENT_STREAM = os.getenv('BLOGICUM_COMMENT_STREAM') == '1'
+COMMENT_STREAM_POLL_INTERVAL = 0.5
+COMMENT_STREAM_HEARTBEAT = 15
+# неотправленных событий на соединение, после чего поток закрывается
+COMMENT_STREAM_QUEUE_SIZE = 100
+
+# лента подписок, см. blog.timelines: посты авторов, у которых меньше
+# TIMELINE_FANOUT_LIMIT подписчиков, рассылаются по лентам задачей,
+# посты остальных подмешиваются при чтении
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_FANOUT_BATCH = 1000
+TIMELINE_LANE = 'default'
+# записей в ленте пользователя после очистки timelines.prune(),
+# см. PRUNE_TASKS и manage.py prune_timelines
+TIMELINE_MAX_ENTRIES = 1000
+# сколько последних постов автора попадает в ленту при подписке
+TIMELINE_BACKFILL = 50
+
+# потребители исходящих событий, см. manage.py run_outbox_consumers
+OUTBOX_CONSUMERS = []
+OUTBOX_POLL_INTERVAL = 1
+# сколько ждать событие с пропущенным id, прежде чем счесть его
+# откаченным, см. core.outbox.visible_position
+OUTBOX_GAP_TIMEOUT = 60
+# сколько хранить события, уже прочитанные всеми потребителями
+OUTBOX_RETENTION = 7 * 24 * 60 * 60
+
+# очередь задач в БД, см. core.jobs и manage.py run_workers;
+# полосы перечислены в порядке приоритета
+JOB_LANES = ('high', 'default', 'low')
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF = 10
+JOB_RETRY_BACKOFF_MAX = 60 * 60
+# исполнитель продлевает захват задачи каждые JOB_HEARTBEAT секунд;
+# задача без продления дольше JOB_TIMEOUT считается брошенной
+JOB_HEARTBEAT = 60
+JOB_TIMEOUT = 15 * 60
+JOB_POLL_INTERVAL = 1
+# сколько кандидатов перебирать при захвате задачи в SQLite
+JOB_CLAIM_CANDIDATES = 5
+JOB_RETENTION = 7 * 24 * 60 * 60
+# очистка по manage.py run_workers --prune, запускать по расписанию
+PRUNE_TASKS = (
+    'core.jobs.prune',
+    'core.mail.prune',
+    'core.outbox.prune',
+    'blog.timelines.prune',
+    'perf.profiling.prune',
+)
+
+# журнал медленных запросов к БД, см. manage.py slow_queries
+SLOW_QUERY_LOG = os.getenv('BLOGICUM_SLOW_QUERY_LOG') == '1'
+SLOW_QUERY_THRESHOLD = 0.1
+# доля остальных запросов, попадающих в журнал для сравнения
+SLOW_QUERY_SAMPLE_RATE = 0.001
+SLOW_QUERY_LOG_DIR = CACHE_DIR / 'slow_queries'
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+# буфер журнала сбрасывается на диск не реже раза в столько секунд
+SLOW_QUERY_FLUSH_INTERVAL = 5
+
+# JSONL-журнал запросов для manage.py replay_requests; пусто — выключен
+REQUEST_LOG_PATH = os.getenv('BLOGICUM_REQUEST_LOG', '')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -137,3 +329,18 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
+
+# очередь писем: запрос только сохраняет письмо, а отправляет его
+# пачками задача core.mail.deliver_batch через EMAIL_DELIVERY_BACKEND
+EMAIL_DELIVERY_BACKEND = EMAIL_BACKEND
+if os.getenv('BLOGICUM_EMAIL_DELIVERY') == 'smtp':
+    # локальная заглушка, например python -m smtpd -n -c DebuggingServer
+    EMAIL_DELIVERY_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    EMAIL_HOST = 'localhost'
+    EMAIL_PORT = int(os.getenv('BLOGICUM_EMAIL_PORT', '1025'))
+if os.getenv('BLOGICUM_EMAIL_QUEUE') == '1':
+    EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+EMAIL_QUEUE_LANE = 'high'
+EMAIL_BATCH_SIZE = 100
+EMAIL_MAX_ATTEMPTS = 5
+EMAIL_RETENTION = 7 * 24 * 60 * 60
@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.contrib.auth import views as auth_views
+from django.db import transaction
 from django.views.generic import CreateView
 from django.urls import path, include, reverse_lazy
 from django.conf import settings
@@ -10,6 +12,20 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('blog.urls')),
     path('pages/', include('pages.urls')),
+    path('perf/', include('perf.urls')),
+    path('api/', include('api.urls')),
+    # смена пароля сохраняет пользователя, а его события core.outbox
+    # пишутся только в транзакции изменения
+    path(
+        'auth/password_change/',
+        transaction.atomic(auth_views.PasswordChangeView.as_view()),
+        name='password_change',
+    ),
+    path(
+        'auth/reset/<uidb64>/<token>/',
+        transaction.atomic(auth_views.PasswordResetConfirmView.as_view()),
+        name='password_reset_confirm',
+    ),
     path('auth/', include('django.contrib.auth.urls')),
     path(
         'auth/registration/',
@@ -0,0 +1,85 @@
+from copy import copy
+
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY,
+    HASH_SESSION_KEY,
+    _get_user_session_key,
+    load_backend,
+)
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from .cache import LocalCache
+
+USER_CACHE_SIZE = 4096
+
+user_cache = LocalCache('users', maxsize=USER_CACHE_SIZE)
+
+
+def _load_user(backend_path, user_id):
+    def load():
+        user = load_backend(backend_path).get_user(user_id)
+        return None if user is None else (backend_path, user)
+
+    # ключ — только id, чтобы сохранение пользователя сбрасывало его
+    # по instance.pk
+    cached = user_cache.get_or_set(str(user_id), load)
+    if cached is not None and cached[0] != backend_path:
+        cached = load()
+    if cached is None:
+        return None
+    # запрос может менять объект (например, форма профиля),
+    # поэтому закэшированный экземпляр наружу не отдаётся
+    return copy(cached[1])
+
+
+def _session_hash_verified(request, user):
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    if not session_hash:
+        return False
+    if constant_time_compare(session_hash, user.get_session_auth_hash()):
+        return True
+    return (
+        hasattr(user, '_legacy_get_session_auth_hash')
+        and constant_time_compare(
+            session_hash, user._legacy_get_session_auth_hash())
+    )
+
+
+def get_user(request):
+    """Аналог django.contrib.auth.get_user с кэшированием пользователя.
+
+    Проверка хеша сессии выполняется на каждом запросе, как и в Django.
+    """
+    try:
+        user_id = _get_user_session_key(request)
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+
+    user = _load_user(backend_path, user_id)
+    if user is None:
+        return AnonymousUser()
+    if (hasattr(user, 'get_session_auth_hash')
+            and not _session_hash_verified(request, user)):
+        request.session.flush()
+        return AnonymousUser()
+    return user
+
+
+def get_cached_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = get_user(request)
+    return request._cached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
@@ -0,0 +1,146 @@
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+
+SHARED_CACHE_ALIAS = 'shared'
+
+
+class FileCache(FileBasedCache):
+    """Файловый кэш, который не перечисляет каталог на каждой записи.
+
+    FileBasedCache проверяет MAX_ENTRIES при каждом set() и для этого
+    читает список всех файлов; здесь проверка идёт раз в CULL_EVERY
+    записей процесса, и каталог может ненадолго превысить предел.
+    """
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        options = params.get('OPTIONS', {})
+        self._cull_every = int(options.get('CULL_EVERY', 100))
+        self._writes = itertools.count(1)
+
+    def _cull(self):
+        if next(self._writes) % self._cull_every == 0:
+            super()._cull()
+
+
+def get_generation(key):
+    """Метка поколения из общего кэша; пропавшая метка создаётся заново.
+
+    Значение по умолчанию вместо новой метки после вытеснения ключа
+    снова открыло бы записи, сохранённые до первого сброса.
+    """
+    cache = caches[SHARED_CACHE_ALIAS]
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(*keys):
+    caches[SHARED_CACHE_ALIAS].set_many(
+        {key: uuid.uuid4().hex for key in keys}, None)
+
+
+class LocalCache:
+    """LRU-кэш в памяти процесса, сбрасываемый во всех процессах сразу.
+
+    Метка поколения хранится в общем кэше: invalidate() меняет её,
+    а остальные процессы замечают смену не позже чем через
+    check_interval секунд и очищают свою копию. Так же у каждого ключа
+    есть своя метка, которую меняет delete(key).
+    """
+
+    def __init__(self, namespace, maxsize=1024, check_interval=1.0):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.check_interval = check_interval
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = None
+        self._checked_at = None
+
+    @property
+    def _generation_key(self):
+        return f'local-cache-generation:{self.namespace}'
+
+    def _key_generation_key(self, key):
+        return f'local-cache-key:{self.namespace}:{key}'
+
+    def _sync(self):
+        now = time.monotonic()
+        if (self._checked_at is not None
+                and now - self._checked_at < self.check_interval):
+            return
+        self._checked_at = now
+        generation = caches[SHARED_CACHE_ALIAS].get(self._generation_key)
+        if generation != self._generation:
+            self._data.clear()
+            self._generation = generation
+
+    def get(self, key, default=None):
+        with self._lock:
+            self._sync()
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            self._data.move_to_end(key)
+        value, generation, checked_at = entry
+        now = time.monotonic()
+        if now - checked_at < self.check_interval:
+            return value
+        # общий кэш читается без блокировки
+        current = get_generation(self._key_generation_key(key))
+        with self._lock:
+            if self._data.get(key) is entry:
+                if current == generation:
+                    self._data[key] = (value, generation, now)
+                else:
+                    del self._data[key]
+        return value if current == generation else default
+
+    def _store(self, key, value, generation):
+        with self._lock:
+            self._sync()
+            self._data[key] = (value, generation, time.monotonic())
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def set(self, key, value):
+        self._store(
+            key, value, get_generation(self._key_generation_key(key)))
+
+    def get_or_set(self, key, load):
+        """Значение из кэша или результат load(); None не кэшируется.
+
+        Метка ключа читается до load(): если delete(key) придёт во время
+        загрузки, устаревшее значение не останется в кэше.
+        """
+        value = self.get(key)
+        if value is None:
+            generation = get_generation(self._key_generation_key(key))
+            value = load()
+            if value is not None:
+                self._store(key, value, generation)
+        return value
+
+    def delete(self, key):
+        """Сбрасывает ключ в текущем процессе и во всех остальных."""
+        bump_generation(self._key_generation_key(key))
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate(self):
+        """Сбрасывает кэш в текущем процессе и во всех остальных."""
+        caches[SHARED_CACHE_ALIAS].set(
+            self._generation_key, uuid.uuid4().hex, None)
+        with self._lock:
+            self._data.clear()
+            self._checked_at = None
@@ -0,0 +1,219 @@
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger('core.jobs')
+
+
+def task_path(func):
+    return func if isinstance(func, str) else (
+        f'{func.__module__}.{func.__qualname__}')
+
+
+def enqueue(func, *args, lane='default', delay=None, run_at=None,
+            max_attempts=None, **kwargs):
+    """Ставит вызов func(*args, **kwargs) в очередь.
+
+    Аргументы должны сериализоваться в JSON. Задача видна исполнителям
+    только после фиксации текущей транзакции.
+    """
+    if lane not in settings.JOB_LANES:
+        raise ValueError(f'Неизвестная полоса очереди: {lane}')
+    if run_at is None:
+        run_at = timezone.now() + (delay or timedelta())
+    return Job.objects.create(
+        task=task_path(func), args=list(args), kwargs=kwargs, lane=lane,
+        run_at=run_at,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def _stale(now):
+    expired = now - timedelta(seconds=settings.JOB_TIMEOUT)
+    return Q(status=Job.RUNNING, locked_at__lt=expired)
+
+
+def _ready(lane, now):
+    # задачи упавших исполнителей забираются повторно, пока не
+    # исчерпаны попытки
+    return Job.objects.filter(
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | (_stale(now) & Q(attempts__lt=F('max_attempts'))),
+        lane=lane,
+    ).order_by('run_at', 'pk')
+
+
+def _fail_abandoned(now):
+    """Помечает FAILED брошенные задачи без оставшихся попыток."""
+    failed = Job.objects.filter(
+        _stale(now), attempts__gte=F('max_attempts'),
+    ).update(status=Job.FAILED, finished_at=now, locked_by='',
+             locked_at=None,
+             last_error='Исполнитель не завершил задачу за JOB_TIMEOUT.')
+    if failed:
+        logger.error('Брошенных задач без попыток: %s', failed)
+    return failed
+
+
+def _claim_skip_locked(lane, now, worker):
+    with transaction.atomic():
+        job = (_ready(lane, now)
+               .select_for_update(skip_locked=True).first())
+        if job is None:
+            return None
+        job.status = Job.RUNNING
+        job.locked_by = worker
+        job.locked_at = now
+        job.attempts += 1
+        job.save(update_fields=(
+            'status', 'locked_by', 'locked_at', 'attempts'))
+        return job
+
+
+def _claim_compare_and_set(lane, now, worker):
+    # в SQLite нет SELECT ... FOR UPDATE: задачу забирает тот, чей
+    # UPDATE с прежним состоянием в условии изменил строку
+    for candidate in _ready(lane, now).values(
+            'pk', 'status', 'locked_at')[:settings.JOB_CLAIM_CANDIDATES]:
+        claimed = Job.objects.filter(
+            pk=candidate['pk'], status=candidate['status'],
+            locked_at=candidate['locked_at'],
+        ).update(status=Job.RUNNING, locked_by=worker, locked_at=now,
+                 attempts=F('attempts') + 1)
+        if claimed:
+            return Job.objects.get(pk=candidate['pk'])
+    return None
+
+
+def claim(lanes, worker=None):
+    """Забирает первую готовую задачу из полос в порядке приоритета."""
+    worker = worker or worker_name()
+    now = timezone.now()
+    _fail_abandoned(now)
+    if connection.features.has_select_for_update_skip_locked:
+        claim_one = _claim_skip_locked
+    else:
+        claim_one = _claim_compare_and_set
+    for lane in lanes:
+        job = claim_one(lane, now, worker)
+        if job is not None:
+            return job
+    return None
+
+
+def backoff(attempts):
+    """Пауза перед повтором: экспоненциальная, с разбросом."""
+    delay = min(settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1),
+                settings.JOB_RETRY_BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def _held(job):
+    """Задача, пока её захват принадлежит этому исполнителю."""
+    return Job.objects.filter(pk=job.pk, status=Job.RUNNING,
+                              locked_by=job.locked_by)
+
+
+class Heartbeat(threading.Thread):
+    """Продлевает захват задачи, пока она выполняется."""
+
+    def __init__(self, job):
+        super().__init__(daemon=True)
+        self.job = job
+        self.done = threading.Event()
+
+    def run(self):
+        try:
+            while not self.done.wait(settings.JOB_HEARTBEAT):
+                if not _held(self.job).update(locked_at=timezone.now()):
+                    return
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.done.set()
+        self.join()
+
+
+def _finish(job, **fields):
+    # результат записывается, только если задачу не забрал другой
+    # исполнитель после истечения захвата
+    if not _held(job).update(**fields):
+        logger.warning('Задача %s: захват потерян, результат не записан',
+                       job.pk)
+        return False
+    return True
+
+
+def execute(job):
+    """Выполняет задачу и записывает результат; ошибки не пробрасывает."""
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    try:
+        import_string(job.task)(*job.args, **job.kwargs)
+    except Exception:
+        heartbeat.stop()
+        fields = {'last_error': traceback.format_exc(),
+                  'locked_by': '', 'locked_at': None}
+        if job.attempts >= job.max_attempts:
+            fields.update(status=Job.FAILED, finished_at=timezone.now())
+            logger.error('Задача %s не выполнена: %s', job.pk, job.task)
+        else:
+            fields.update(status=Job.QUEUED,
+                          run_at=timezone.now() + backoff(job.attempts))
+        _finish(job, **fields)
+        return False
+    heartbeat.stop()
+    return _finish(job, status=Job.DONE, finished_at=timezone.now())
+
+
+def work(lanes, stop, poll_interval=None):
+    """Цикл исполнителя: берёт задачи, пока не установлен stop."""
+    poll_interval = poll_interval or settings.JOB_POLL_INTERVAL
+    worker = worker_name()
+    try:
+        while not stop.is_set():
+            job = claim(lanes, worker)
+            if job is None:
+                stop.wait(poll_interval)
+                continue
+            execute(job)
+    finally:
+        connection.close()
+
+
+def run_pending(lanes=None):
+    """Выполняет все готовые задачи в текущем потоке (тесты, отладка)."""
+    lanes = lanes or settings.JOB_LANES
+    done = 0
+    while True:
+        job = claim(lanes)
+        if job is None:
+            return done
+        execute(job)
+        done += 1
+
+
+def prune(keep_seconds=None):
+    keep_seconds = (settings.JOB_RETENTION
+                    if keep_seconds is None else keep_seconds)
+    deleted, _ = Job.objects.filter(
+        status=Job.DONE,
+        finished_at__lt=timezone.now() - timedelta(seconds=keep_seconds),
+    ).delete()
+    return deleted
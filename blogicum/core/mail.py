@@ -0,0 +1,178 @@
+import email
+import email.message
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.message import EmailMessage, MIMEMixin
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import jobs
+from .models import Job, OutgoingEmail
+
+logger = logging.getLogger('core.mail')
+
+DELIVER_TASK = 'core.mail.deliver_batch'
+
+
+class StoredMIMEMessage(MIMEMixin, email.message.Message):
+    """MIME с as_bytes(linesep=...), который ожидает SMTP-бэкенд."""
+
+
+class StoredEmailMessage(EmailMessage):
+    """Письмо из очереди: готовый MIME без повторной сборки."""
+
+    def __init__(self, raw, from_email, recipients):
+        super().__init__(from_email=from_email)
+        self.raw = raw
+        self._recipients = recipients
+
+    def message(self):
+        return email.message_from_bytes(self.raw, _class=StoredMIMEMessage)
+
+    def recipients(self):
+        return self._recipients
+
+
+def schedule_delivery(run_at=None):
+    """Ставит задачу отправки, если в очереди нет задачи на срок run_at."""
+    run_at = run_at or timezone.now()
+    if not Job.objects.filter(task=DELIVER_TASK, status=Job.QUEUED,
+                              run_at__lte=run_at).exists():
+        jobs.enqueue(DELIVER_TASK, lane=settings.EMAIL_QUEUE_LANE,
+                     run_at=run_at)
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Сохраняет письма в очередь вместо отправки в потоке запроса.
+
+    Отправляет их задача deliver_batch через EMAIL_DELIVERY_BACKEND.
+    """
+
+    def send_messages(self, email_messages):
+        now = timezone.now()
+        queued = [
+            OutgoingEmail(
+                from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+                recipients=message.recipients(),
+                message=message.message().as_bytes(),
+                send_after=now)
+            for message in email_messages if message.recipients()
+        ]
+        if not queued:
+            return 0
+        with transaction.atomic():
+            OutgoingEmail.objects.bulk_create(queued)
+            schedule_delivery()
+        return len(queued)
+
+
+def _claimable(now):
+    # пачка упавшего исполнителя возвращается в работу через JOB_TIMEOUT
+    stale = now - timedelta(seconds=settings.JOB_TIMEOUT)
+    return OutgoingEmail.objects.filter(
+        Q(status=OutgoingEmail.QUEUED, send_after__lte=now)
+        | Q(status=OutgoingEmail.SENDING, send_after__lt=stale))
+
+
+def _claim_batch():
+    """Помечает пачку писем своей меткой; чужие пачки не трогаются."""
+    batch = uuid.uuid4().hex
+    now = timezone.now()
+    ids = list(_claimable(now).values_list(
+        'pk', flat=True)[:settings.EMAIL_BATCH_SIZE])
+    # повторная проверка условия в UPDATE делает захват атомарным
+    _claimable(now).filter(pk__in=ids).update(
+        status=OutgoingEmail.SENDING, batch=batch, send_after=now)
+    return list(OutgoingEmail.objects.filter(batch=batch,
+                                             status=OutgoingEmail.SENDING))
+
+
+def _failed(queued, error):
+    queued.attempts += 1
+    queued.last_error = repr(error)
+    if queued.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+        queued.status = OutgoingEmail.DEAD
+        logger.error('Письмо %s не доставлено: %r', queued.pk, error)
+    else:
+        queued.status = OutgoingEmail.QUEUED
+        queued.send_after = timezone.now() + jobs.backoff(queued.attempts)
+    queued.save(update_fields=(
+        'attempts', 'last_error', 'status', 'send_after'))
+
+
+def _open(pending):
+    """Открывает соединение; при сбое откладывает все оставшиеся письма."""
+    connection = get_connection(settings.EMAIL_DELIVERY_BACKEND)
+    try:
+        connection.open()
+    except Exception as error:
+        for queued in pending:
+            _failed(queued, error)
+        return None
+    return connection
+
+
+def deliver_batch():
+    """Отправляет пачку писем через одно соединение.
+
+    Ошибка отдельного письма не прерывает пачку: письмо откладывается
+    с нарастающей паузой, а после EMAIL_MAX_ATTEMPTS попыток остаётся
+    в таблице со статусом «не доставлено». Если соединение не
+    открылось, так же откладываются все письма пачки.
+    """
+    batch = _claim_batch()
+    pending = list(batch)
+    connection = None
+    try:
+        while pending:
+            if connection is None:
+                connection = _open(pending)
+                if connection is None:
+                    break
+            queued = pending.pop(0)
+            message = StoredEmailMessage(
+                bytes(queued.message), queued.from_email, queued.recipients)
+            try:
+                connection.send_messages([message])
+            except Exception as error:
+                _failed(queued, error)
+                # после сбоя соединение могло остаться в плохом
+                # состоянии; следующее письмо пойдёт через новое
+                connection.close()
+                connection = None
+                continue
+            queued.status = OutgoingEmail.SENT
+            queued.sent_at = timezone.now()
+            queued.save(update_fields=('status', 'sent_at'))
+    finally:
+        if connection is not None:
+            connection.close()
+
+    next_email = (
+        OutgoingEmail.objects.filter(status=OutgoingEmail.QUEUED)
+        .values_list('send_after', flat=True).first())
+    if next_email is not None:
+        schedule_delivery(max(next_email, timezone.now()))
+    return len(batch)
+
+
+def prune(keep_seconds=None):
+    """Удаляет старые отправленные и недоставленные письма.
+
+    В письмах лежат ссылки сброса пароля, поэтому недоставленные
+    тоже не хранятся дольше EMAIL_RETENTION.
+    """
+    keep_seconds = (settings.EMAIL_RETENTION
+                    if keep_seconds is None else keep_seconds)
+    expired = timezone.now() - timedelta(seconds=keep_seconds)
+    deleted, _ = OutgoingEmail.objects.filter(
+        Q(status=OutgoingEmail.SENT, sent_at__lt=expired)
+        | Q(status=OutgoingEmail.DEAD, send_after__lt=expired)
+    ).delete()
+    return deleted
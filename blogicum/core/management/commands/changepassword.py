@@ -0,0 +1,10 @@
+from django.contrib.auth.management.commands import changepassword
+from django.db import transaction
+
+
+class Command(changepassword.Command):
+    # пользователь сохраняется в одной транзакции с событием core.outbox
+
+    def handle(self, *args, **options):
+        with transaction.atomic(using=options['database']):
+            return super().handle(*args, **options)
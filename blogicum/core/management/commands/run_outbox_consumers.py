@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import outbox
+
+
+class Command(BaseCommand):
+    help = ('Читает исходящие события пачками и передаёт их потребителям '
+            'из OUTBOX_CONSUMERS, сохраняя позицию каждого.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('consumers', nargs='*',
+                            help='Имена потребителей; по умолчанию все.')
+        parser.add_argument('--once', action='store_true',
+                            help='Выйти, когда новых событий не останется.')
+        parser.add_argument('--interval', type=float,
+                            help='Пауза между опросами без событий, с.')
+        parser.add_argument('--prune', action='store_true',
+                            help='Удалить события, прочитанные всеми.')
+
+    def handle(self, *args, **options):
+        if options['prune']:
+            deleted = outbox.prune()
+            self.stdout.write(f'Удалено событий: {deleted}')
+            return
+        consumers = outbox.get_consumers(options['consumers'])
+        if not consumers:
+            raise CommandError('Нет подходящих потребителей.')
+        outbox.run(consumers, once=options['once'],
+                   interval=options['interval'])
@@ -0,0 +1,83 @@
+import signal
+import threading
+from multiprocessing.connection import wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from core import jobs
+from core.processes import process
+
+# при fork дочерний процесс наследует обработчики родителя вместе с
+# этим событием, поэтому сигнал до установки своих обработчиков
+# не теряется
+_stop = threading.Event()
+
+
+def _stop_on_signals():
+    signal.signal(signal.SIGTERM, lambda *args: _stop.set())
+    signal.signal(signal.SIGINT, lambda *args: _stop.set())
+    return _stop
+
+
+def _run_process(lanes, threads):
+    stop = _stop_on_signals()
+    workers = [
+        threading.Thread(target=jobs.work, args=(lanes, stop), daemon=True)
+        for _ in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    while any(worker.is_alive() for worker in workers):
+        for worker in workers:
+            worker.join(timeout=1)
+
+
+class Command(BaseCommand):
+    help = ('Запускает исполнителей очереди задач: несколько процессов, '
+            'в каждом несколько потоков.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--threads', type=int, default=1)
+        parser.add_argument(
+            '--lanes', nargs='+',
+            help='Полосы в порядке приоритета; по умолчанию JOB_LANES.')
+        parser.add_argument(
+            '--prune', action='store_true',
+            help=('Удалить устаревшие данные задачами из PRUNE_TASKS: '
+                  'выполненные задачи, письма, записи лент, '
+                  'отчёты профилировщика.'))
+
+    def handle(self, *args, **options):
+        if options['prune']:
+            for path in settings.PRUNE_TASKS:
+                deleted = import_string(path)()
+                self.stdout.write(f'{path}: удалено {deleted}')
+            return
+        _stop.clear()
+        lanes = options['lanes'] or settings.JOB_LANES
+        unknown = set(lanes) - set(settings.JOB_LANES)
+        if unknown:
+            raise CommandError(f'Неизвестные полосы: {", ".join(unknown)}')
+        if options['processes'] == 1:
+            _run_process(lanes, options['threads'])
+            return
+
+        children = [
+            process(f'{__name__}._run_process', (lanes, options['threads']))
+            for _ in range(options['processes'])
+        ]
+        # по SIGTERM/SIGINT родитель останавливает дочерние процессы:
+        # они доделывают текущие задачи и завершаются
+        stop = _stop_on_signals()
+        for child in children:
+            child.start()
+        while not stop.is_set() and any(
+                child.is_alive() for child in children):
+            wait([child.sentinel for child in children
+                  if child.is_alive()], timeout=1)
+        for child in children:
+            child.terminate()
+            child.join()
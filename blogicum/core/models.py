@@ -1,4 +1,6 @@
-from django.db import models
+from functools import wraps
+
+from django.db import models, router, transaction
 
 
 class BlogBaseModel(models.Model):
@@ -12,3 +14,152 @@ class BlogBaseModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+def atomic_save(save):
+    """Выполняет save() в транзакции вместе с исходящими событиями.
+
+    События пишутся из post_save, и без транзакции вокруг save() в
+    shell и командах управления они фиксировались бы отдельно.
+    """
+    @wraps(save)
+    def wrapper(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            return save(self, *args, **kwargs)
+    return wrapper
+
+
+class AtomicSaveMixin:
+    """Модель, для которой пишутся события core.outbox."""
+
+    @atomic_save
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+
+
+class OutboxEvent(models.Model):
+    """Изменение модели, записанное в одной транзакции с ним самим.
+
+    Читается потребителями из core.outbox.
+    """
+
+    SAVE = 'save'
+    DELETE = 'delete'
+    ACTION_CHOICES = (
+        (SAVE, 'сохранение'),
+        (DELETE, 'удаление'),
+    )
+
+    topic = models.CharField('Тема', max_length=64)
+    object_id = models.BigIntegerField('Идентификатор объекта')
+    action = models.CharField('Действие', max_length=16,
+                              choices=ACTION_CHOICES)
+    payload = models.JSONField('Данные', default=dict)
+    created_at = models.DateTimeField('Время записи', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'событие'
+        verbose_name_plural = 'Исходящие события'
+        ordering = ('id',)
+
+    def __str__(self):
+        return f'{self.pk}: {self.topic} {self.action} {self.object_id}'
+
+
+class OutboxCheckpoint(models.Model):
+    consumer = models.CharField('Потребитель', max_length=128,
+                                primary_key=True)
+    position = models.BigIntegerField('Последнее событие', default=0)
+    updated_at = models.DateTimeField('Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'позиция потребителя'
+        verbose_name_plural = 'Позиции потребителей'
+
+    def __str__(self):
+        return f'{self.consumer}: {self.position}'
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди на БД, см. core.jobs и run_workers."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'в очереди'),
+        (RUNNING, 'выполняется'),
+        (DONE, 'выполнена'),
+        (FAILED, 'не выполнена'),
+    )
+
+    task = models.CharField('Функция', max_length=255)
+    args = models.JSONField('Аргументы', default=list)
+    kwargs = models.JSONField('Именованные аргументы', default=dict)
+    lane = models.CharField('Полоса', max_length=32, default='default')
+    status = models.CharField('Состояние', max_length=16,
+                              choices=STATUS_CHOICES, default=QUEUED)
+    run_at = models.DateTimeField('Выполнить не раньше')
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Наибольшее число попыток',
+                                                    default=5)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    locked_by = models.CharField('Исполнитель', max_length=64, blank=True)
+    locked_at = models.DateTimeField('Взята в работу', null=True,
+                                     blank=True)
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+    finished_at = models.DateTimeField('Завершена', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'задача'
+        verbose_name_plural = 'Очередь задач'
+        ordering = ('run_at', 'id')
+        indexes = (
+            models.Index(fields=('lane', 'status', 'run_at'),
+                         name='job_lane_status_run_at_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.pk}: {self.task} ({self.status})'
+
+
+class OutgoingEmail(models.Model):
+    """Письмо в очереди на отправку, см. core.mail."""
+
+    QUEUED = 'queued'
+    SENDING = 'sending'
+    SENT = 'sent'
+    DEAD = 'dead'
+    STATUS_CHOICES = (
+        (QUEUED, 'в очереди'),
+        (SENDING, 'отправляется'),
+        (SENT, 'отправлено'),
+        (DEAD, 'не доставлено'),
+    )
+
+    from_email = models.CharField('Отправитель', max_length=254)
+    recipients = models.JSONField('Получатели', default=list)
+    message = models.BinaryField('Письмо в формате MIME')
+    status = models.CharField('Состояние', max_length=16,
+                              choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    send_after = models.DateTimeField('Отправить не раньше')
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    batch = models.CharField('Пачка', max_length=32, blank=True)
+    created_at = models.DateTimeField('Создано', auto_now_add=True)
+    sent_at = models.DateTimeField('Отправлено', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'письмо'
+        verbose_name_plural = 'Очередь писем'
+        ordering = ('send_after', 'id')
+        indexes = (
+            models.Index(fields=('status', 'send_after'),
+                         name='email_status_send_after_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.pk}: {", ".join(self.recipients)} ({self.status})'
@@ -0,0 +1,141 @@
+"""Исходящие события: изменения моделей и потребители, читающие их.
+
+Потребитель хранит id последнего прочитанного события. Это верно, пока
+события фиксируются в порядке id: в SQLite пишущие транзакции идут по
+очереди. При нескольких одновременных писателях (PostgreSQL) событие
+с меньшим id может зафиксироваться позже большего, поэтому чтение
+останавливается перед пропуском в id, пока пропуск моложе
+OUTBOX_GAP_TIMEOUT, см. visible_position().
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.transaction import TransactionManagementError
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboxCheckpoint, OutboxEvent
+
+logger = logging.getLogger('core.outbox')
+
+
+def record(topic, instance, action=OutboxEvent.SAVE, **payload):
+    """Пишет событие; вызывается из сигналов внутри транзакции записи.
+
+    Вне транзакции событие и изменение фиксировались бы по отдельности,
+    поэтому такой вызов — ошибка. Модели с событиями сохраняются в
+    транзакции сами (core.models.AtomicSaveMixin), а пользователь — в
+    транзакции места сохранения: форм, представлений смены пароля и
+    команд createsuperuser и changepassword.
+    """
+    if not connection.in_atomic_block:
+        raise TransactionManagementError(
+            f'Событие {topic} записывается вне транзакции изменения.')
+    OutboxEvent.objects.create(
+        topic=topic, object_id=instance.pk, action=action, payload=payload)
+
+
+def visible_position(position, limit):
+    """Наибольший id, до которого прочитаны все зафиксированные события.
+
+    Пропуск в id может оказаться событием ещё не зафиксированной
+    транзакции, поэтому события за свежим пропуском не читаются. Пропуск
+    старше OUTBOX_GAP_TIMEOUT считается откатом и перешагивается. С
+    нулевой позиции читается с первого события: более ранние могли быть
+    удалены prune().
+    """
+    horizon = timezone.now() - timedelta(seconds=settings.OUTBOX_GAP_TIMEOUT)
+    events = (OutboxEvent.objects.filter(pk__gt=position).order_by('pk')
+              .values_list('pk', 'created_at')[:limit])
+    for pk, created_at in events:
+        if position and pk != position + 1 and created_at > horizon:
+            break
+        position = pk
+    return position
+
+
+class Consumer:
+    """Потребитель событий: получает пачки и сам хранит позицию.
+
+    Доставка «хотя бы один раз»: если процесс упадёт после handle(),
+    но до сохранения позиции, пачка придёт повторно, поэтому handle()
+    должен быть идемпотентным.
+    """
+
+    name = None
+    topics = ()
+    batch_size = 100
+
+    def handle(self, events):
+        raise NotImplementedError
+
+    def position(self):
+        checkpoint, _ = OutboxCheckpoint.objects.get_or_create(
+            consumer=self.name)
+        return checkpoint.position
+
+    def poll(self):
+        """Обрабатывает одну пачку; возвращает сдвиг позиции.
+
+        Позиция сдвигается и через события чужих тем, чтобы не
+        перечитывать их при каждом опросе.
+        """
+        position = self.position()
+        visible = visible_position(position, self.batch_size)
+        if visible == position:
+            return 0
+        events = OutboxEvent.objects.filter(pk__gt=position, pk__lte=visible)
+        if self.topics:
+            events = events.filter(topic__in=self.topics)
+        events = list(events.order_by('pk'))
+        if events:
+            self.handle(events)
+        OutboxCheckpoint.objects.filter(consumer=self.name).update(
+            position=visible)
+        return visible - position
+
+
+def get_consumers(names=None):
+    consumers = [import_string(path)() for path in settings.OUTBOX_CONSUMERS]
+    if names:
+        consumers = [
+            consumer for consumer in consumers if consumer.name in names]
+    return consumers
+
+
+def run(consumers, once=False, interval=None):
+    """Опрашивает потребителей, пока есть события; иначе ждёт interval."""
+    interval = settings.OUTBOX_POLL_INTERVAL if interval is None else interval
+    while True:
+        processed = 0
+        for consumer in consumers:
+            # без общей транзакции: в SQLite она держала бы блокировку
+            # и задерживала запись в запросах на всё время handle()
+            try:
+                processed += consumer.poll()
+            except Exception:
+                # позиция не сдвинулась, пачка будет доставлена снова
+                logger.exception('Ошибка потребителя %s', consumer.name)
+        if once and not processed:
+            return
+        if not processed:
+            time.sleep(interval)
+
+
+def prune(keep_seconds=None):
+    """Удаляет события старше keep_seconds, прочитанные всеми потребителями.
+
+    Без потребителей события некому читать, и удаляются все старые.
+    """
+    keep_seconds = (settings.OUTBOX_RETENTION
+                    if keep_seconds is None else keep_seconds)
+    events = OutboxEvent.objects.filter(
+        created_at__lt=timezone.now() - timedelta(seconds=keep_seconds))
+    positions = [consumer.position() for consumer in get_consumers()]
+    if positions:
+        events = events.filter(pk__lte=min(positions))
+    deleted, _ = events.delete()
+    return deleted
@@ -0,0 +1,67 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Сохраняет время с микросекундами.
+
+    DjangoJSONEncoder округляет его до миллисекунд, и условие keyset
+    пропускало строки, попавшие в ту же миллисекунду после курсора.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    data = json.dumps(values, cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, ordering):
+    """Восстанавливает значения полей сортировки из курсора."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError) as error:
+        raise InvalidCursor('Неверный курсор.') from error
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise InvalidCursor('Неверный курсор.')
+    fields = [
+        model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        for name in (field.lstrip('-') for field in ordering)
+    ]
+    try:
+        return [field.to_python(value)
+                for field, value in zip(fields, values)]
+    except Exception as error:
+        raise InvalidCursor('Неверный курсор.') from error
+
+
+def after(ordering, values):
+    """Условие «строго после» для набора полей сортировки (keyset).
+
+    Для ('-pub_date', '-pk') это pub_date < v1 OR
+    (pub_date = v1 AND pk < v2): индекс по сортировке используется
+    так же, как для первой страницы, без OFFSET.
+    """
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        branch = Q(**{f'{name}__{lookup}': values[position]})
+        for previous, value in zip(ordering[:position], values):
+            branch &= Q(**{previous.lstrip('-'): value})
+        condition |= branch
+    return condition
@@ -0,0 +1,32 @@
+"""Ограниченный пул потоков для синхронного кода из асинхронного.
+
+У каждого потока своё соединение с БД, поэтому размер пула
+ограничивает и число соединений. Сигналы начала и конца запроса
+в потоках пула не приходят, поэтому устаревшие и сломанные
+соединения закрываются вокруг каждого вызова.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_VIEW_THREADS, thread_name_prefix='async-view')
+
+
+def _with_fresh_connections(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return wrapper
+
+
+def in_pool(func):
+    return sync_to_async(_with_fresh_connections(func),
+                         thread_sensitive=False, executor=executor)
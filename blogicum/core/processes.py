@@ -0,0 +1,51 @@
+"""Пулы и процессы для команд управления.
+
+Процессы запускаются через fork, где он есть, иначе через spawn (Windows,
+macOS по умолчанию). При spawn дочерний процесс ничего не наследует:
+Django в нём настраивается заново, а состояние передаётся
+инициализатору явно.
+"""
+import multiprocessing
+
+import django
+from django.apps import apps
+from django.db import connections
+from django.utils.module_loading import import_string
+
+
+def get_context():
+    """Контекст multiprocessing: fork, где он есть, иначе spawn."""
+    method = ('fork' if 'fork' in multiprocessing.get_all_start_methods()
+              else 'spawn')
+    return multiprocessing.get_context(method)
+
+
+def _init_process(initializer, initargs):
+    if not apps.ready:
+        django.setup()
+    if initializer:
+        import_string(initializer)(*initargs)
+
+
+def _run_target(target, args):
+    _init_process(None, ())
+    import_string(target)(*args)
+
+
+def process(target, args=()):
+    """Процесс с настроенным Django; target — путь импорта функции."""
+    # соединения с БД не должны наследоваться дочерними процессами
+    connections.close_all()
+    return get_context().Process(target=_run_target, args=(target, args))
+
+
+def process_pool(processes, initializer=None, initargs=()):
+    """Пул из processes процессов с настроенным Django.
+
+    initializer — путь импорта функции, а не сама функция: модуль
+    с моделями можно импортировать только после django.setup().
+    """
+    connections.close_all()
+    return get_context().Pool(
+        processes, initializer=_init_process,
+        initargs=(initializer, initargs))
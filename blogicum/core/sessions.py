@@ -0,0 +1,40 @@
+from copy import deepcopy
+
+from django.contrib.sessions.backends.cached_db import (
+    SessionStore as CachedDBStore,
+)
+
+
+class SessionStore(CachedDBStore):
+    """Сессии в общем кэше с записью в БД только при изменении данных.
+
+    Чтение сессии обслуживается кэшем, а повторное присваивание тех же
+    значений (например, при каждом запросе) не приводит к записи
+    в django_session.
+    """
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._loaded_data = None
+
+    def load(self):
+        data = super().load()
+        self._loaded_data = deepcopy(data)
+        return data
+
+    def _is_unchanged(self):
+        return (
+            self.session_key is not None
+            and self._loaded_data is not None
+            and self._session == self._loaded_data
+        )
+
+    def save(self, must_create=False):
+        if not must_create and self._is_unchanged():
+            return
+        super().save(must_create=must_create)
+        self._loaded_data = deepcopy(self._session)
+
+    def delete(self, session_key=None):
+        super().delete(session_key)
+        self._loaded_data = None
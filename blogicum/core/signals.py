@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import outbox
+from .auth import user_cache
+from .models import OutboxEvent
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_cache(instance, update_fields=None, **kwargs):
+    # вход обновляет только last_login, которое из кэша не читается;
+    # остальное сохранение покрывает и смену пароля, и правку профиля
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    key = str(instance.pk)
+    # до фиксации другой процесс успел бы закэшировать старую строку
+    transaction.on_commit(lambda: user_cache.delete(key))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def record_user_event(instance, signal, update_fields=None, **kwargs):
+    # вход пользователя обновляет только last_login
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    action = OutboxEvent.SAVE if signal is post_save else OutboxEvent.DELETE
+    outbox.record('user', instance, action)
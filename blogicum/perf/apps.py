@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+class PerfConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'perf'
+    verbose_name = 'Производительность'
+
+    def ready(self):
+        if settings.SLOW_QUERY_LOG:
+            from .slowlog import install_wrapper
+            connection_created.connect(
+                install_wrapper, dispatch_uid='perf_slow_query_log')
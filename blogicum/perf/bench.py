@@ -0,0 +1,55 @@
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+
+@contextmanager
+def isolated_database(keepdb=False):
+    """Создаёт отдельную тестовую БД на время замера."""
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(
+            old_name, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+class QueryCounter:
+    """Считает запросы к БД, в том числе к таблице сессий."""
+
+    def __init__(self):
+        self.total = 0
+        self.session = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        self.session += 'django_session' in sql
+        return execute(sql, params, many, context)
+
+
+def measure_requests(client, url, count):
+    """Выполняет count GET-запросов и возвращает сводку замера."""
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        started = time.perf_counter()
+        for _ in range(count):
+            response = client.get(url)
+            assert response.status_code == 200, response.status_code
+        elapsed = time.perf_counter() - started
+
+    return {
+        'requests': count,
+        'seconds': round(elapsed, 4),
+        'rps': round(count / elapsed, 1),
+        'queries_per_request': round(counter.total / count, 2),
+        'session_queries_per_request': round(counter.session / count, 2),
+    }
@@ -0,0 +1,298 @@
+import asyncio
+import statistics
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from importlib import import_module, reload
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db.models import Count
+from django.test import Client, RequestFactory, override_settings
+from django.urls import clear_url_caches
+
+from blog.models import Category, Comment, Post
+from .bench import QueryCounter
+from .queries import record_queries
+
+# секрет CSRF для POST-запросов; Django принимает немаскированный секрет
+CSRF_SECRET = 'b' * 32
+
+
+@dataclass
+class Scenario:
+    name: str
+    path: str
+    method: str = 'get'
+    data: dict = field(default_factory=dict)
+
+
+def client_cookies(user=None):
+    """Cookie CSRF и, если задан пользователь, его сессии."""
+    cookies = {settings.CSRF_COOKIE_NAME: CSRF_SECRET}
+    if user is not None:
+        client = Client()
+        client.force_login(user)
+        cookie = client.cookies[settings.SESSION_COOKIE_NAME]
+        cookies[settings.SESSION_COOKIE_NAME] = cookie.value
+    return cookies
+
+
+def _cookie_header(cookies):
+    return '; '.join(f'{name}={value}' for name, value in cookies.items())
+
+
+class WSGIClient:
+    """Вызывает WSGI-приложение Django напрямую, без сети.
+
+    delay моделирует медленного клиента: поток-обработчик ждёт его
+    до вызова приложения (приём запроса) и после (отдача ответа).
+    """
+
+    def __init__(self, user=None, delay=0):
+        self.handler = WSGIHandler()
+        self.factory = RequestFactory()
+        self.cookies = client_cookies(user)
+        self.delay = delay
+
+    def request(self, method, path, data=None):
+        """Выполняет запрос и возвращает HTTP-статус ответа."""
+        method = method.lower()
+        data = dict(data or {})
+        if method == 'post':
+            data['csrfmiddlewaretoken'] = CSRF_SECRET
+        environ = getattr(self.factory, method)(path, data).environ
+        environ['HTTP_COOKIE'] = _cookie_header(self.cookies)
+        status = []
+        time.sleep(self.delay)
+        response = self.handler(
+            environ, lambda code, headers: status.append(code))
+        for _ in response:
+            pass
+        response.close()
+        time.sleep(self.delay)
+        return int(status[0].split()[0])
+
+
+class ASGIClient:
+    """Вызывает ASGI-приложение Django напрямую, без сети.
+
+    delay моделирует медленного клиента так же, как в WSGIClient, но
+    приложение ждёт его в receive и send, не занимая поток.
+    """
+
+    def __init__(self, user=None, delay=0):
+        self.handler = ASGIHandler()
+        self.cookies = client_cookies(user)
+        self.delay = delay
+
+    async def request(self, method, path, data=None):
+        """Выполняет запрос и возвращает HTTP-статус ответа."""
+        method = method.upper()
+        data = dict(data or {})
+        path, _, query = path.partition('?')
+        headers = [
+            (b'host', b'testserver'),
+            (b'cookie', _cookie_header(self.cookies).encode()),
+        ]
+        body = b''
+        if method == 'POST':
+            data['csrfmiddlewaretoken'] = CSRF_SECRET
+            body = urlencode(data).encode()
+            headers += [
+                (b'content-type', b'application/x-www-form-urlencoded'),
+                (b'content-length', str(len(body)).encode()),
+            ]
+        elif data:
+            query = urlencode(data)
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': headers,
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+        }
+        status = []
+
+        async def receive():
+            await asyncio.sleep(self.delay)
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif not message.get('more_body'):
+                await asyncio.sleep(self.delay)
+
+        await self.handler(scope, receive, send)
+        return status[0]
+
+
+def _reload_urlconf():
+    reload(import_module('blog.urls'))
+    reload(import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+@contextmanager
+def read_views(use_async):
+    """Подключает синхронные или асинхронные страницы чтения блога."""
+    try:
+        with override_settings(ASYNC_VIEWS=use_async):
+            _reload_urlconf()
+            yield
+    finally:
+        _reload_urlconf()
+
+
+def add_hot_post(comments, author):
+    """Публикует пост с большим числом комментариев для PostDetailView."""
+    post = Post.objects.published().first()
+    Comment.objects.bulk_create(
+        (Comment(text=f'Комментарий {i}', post=post, author=author)
+         for i in range(comments)),
+        batch_size=2000)
+    return post
+
+
+def default_scenarios(user, hot_post):
+    category = (
+        Category.objects.filter(is_published=True)
+        .annotate(total=Count('posts')).order_by('-total').first())
+    last_page = max(
+        1, -(-Post.objects.published().count() // 10))
+    return [
+        Scenario('index page 1', '/'),
+        Scenario('index deep page', f'/?page={last_page}'),
+        Scenario('category', f'/category/{category.slug}/'),
+        Scenario('profile', f'/profile/{user.username}/'),
+        Scenario('detail with many comments', f'/posts/{hot_post.pk}/'),
+        Scenario('add_comment', f'/posts/{hot_post.pk}/comment/',
+                 method='post', data={'text': 'Комментарий из бенчмарка'}),
+    ]
+
+
+def _percentile(values, percent):
+    # quantiles() требует хотя бы двух значений
+    if len(values) < 2:
+        return values[0] if values else 0
+    return statistics.quantiles(values, n=100, method='inclusive')[
+        percent - 1]
+
+
+def run_scenario(client, scenario, iterations, warmup=3):
+    """Замеряет задержку, число запросов к БД и пик памяти на запрос."""
+    def request():
+        return client.request(scenario.method, scenario.path, scenario.data)
+
+    for _ in range(warmup):
+        request()
+
+    timings = []
+    counter = QueryCounter()
+    with record_queries(counter):
+        for _ in range(iterations):
+            started = time.perf_counter()
+            status = request()
+            timings.append(time.perf_counter() - started)
+    assert status < 400, f'{scenario.name}: HTTP {status}'
+
+    # память меряется отдельным проходом: tracemalloc искажает время
+    peak = 0
+    tracemalloc.start()
+    try:
+        for _ in range(max(1, iterations // 10)):
+            tracemalloc.reset_peak()
+            request()
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'scenario': scenario.name,
+        'method': scenario.method.upper(),
+        'path': scenario.path,
+        'iterations': iterations,
+        'p50_ms': round(_percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(_percentile(timings, 95) * 1000, 3),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3),
+        'queries_per_request': round(counter.total / iterations, 2),
+        'peak_memory_kib': round(peak / 1024, 1),
+    }
+
+
+def _throughput(server, scenario, timings, elapsed, statuses):
+    failed = [status for status in statuses if status >= 400]
+    assert not failed, f'{server} {scenario.name}: HTTP {failed[0]}'
+    return {
+        'server': server,
+        'scenario': scenario.name,
+        'path': scenario.path,
+        'requests': len(timings),
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(_percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(_percentile(timings, 95) * 1000, 3),
+    }
+
+
+def wsgi_throughput(client, scenario, clients, requests, workers):
+    """Нагрузка от clients клиентов на WSGI-сервер с workers потоками.
+
+    Каждый клиент отправляет requests запросов подряд; запрос ждёт
+    свободный поток и держит его, пока медленный клиент не дочитает
+    ответ. Задержка считается вместе с ожиданием потока.
+    """
+    slots = threading.BoundedSemaphore(workers)
+    timings = []
+    statuses = []
+
+    def run_client():
+        for _ in range(requests):
+            started = time.perf_counter()
+            with slots:
+                status = client.request(
+                    scenario.method, scenario.path, scenario.data)
+            timings.append(time.perf_counter() - started)
+            statuses.append(status)
+
+    threads = [threading.Thread(target=run_client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return _throughput('wsgi', scenario, timings,
+                       time.perf_counter() - started, statuses)
+
+
+def asgi_throughput(client, scenario, clients, requests):
+    """То же для ASGI: все клиенты обслуживаются одним циклом событий."""
+    timings = []
+    statuses = []
+
+    async def run_client():
+        for _ in range(requests):
+            started = time.perf_counter()
+            status = await client.request(
+                scenario.method, scenario.path, scenario.data)
+            timings.append(time.perf_counter() - started)
+            statuses.append(status)
+
+    async def run_clients():
+        await asyncio.gather(*(run_client() for _ in range(clients)))
+
+    started = time.perf_counter()
+    asyncio.run(run_clients())
+    return _throughput('asgi', scenario, timings,
+                       time.perf_counter() - started, statuses)
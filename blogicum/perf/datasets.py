@@ -0,0 +1,192 @@
+import bisect
+import itertools
+import random
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+from faker import Faker
+
+from blog.caches import category_cache, location_cache
+from blog.feeds import invalidate_feeds
+from blog.models import Category, Comment, Location, Post
+from blog.sitemaps import invalidate_sitemap
+from core.processes import process_pool
+
+User = get_user_model()
+
+# Faker медленный, поэтому тексты генерируются заранее и переиспользуются
+TEXT_POOL_SIZE = 500
+# медиана «возраста» поста; распределение смещено к свежим публикациям
+PUB_DATE_MEAN_AGE = timedelta(days=60)
+PUB_DATE_MAX_AGE = timedelta(days=5 * 365)
+DEFERRED_MAX_AHEAD = timedelta(days=30)
+# показатель степенного закона для числа постов автора и комментариев
+PARETO_ALPHA = 1.5
+
+
+@dataclass
+class Dataset:
+    posts: int = 10000
+    users: int = 200
+    categories: int = 20
+    locations: int = 50
+    comments_per_post: int = 3
+    # доли снятых с публикации и отложенных постов
+    unpublished: float = 0.05
+    deferred: float = 0.02
+    batch_size: int = 2000
+    # процессы, генерирующие строки; вставляет их текущий процесс
+    workers: int = 1
+    seed: int = 0
+
+
+# общее состояние процессов-генераторов, передаётся _set_state
+_state = {}
+
+
+def _set_state(state):
+    _state.update(state)
+
+
+def _text_pool(faker, method, size=TEXT_POOL_SIZE):
+    return [getattr(faker, method)() for _ in range(size)]
+
+
+def _pareto_cumulative(rnd, size):
+    weights = (rnd.paretovariate(PARETO_ALPHA) for _ in range(size))
+    return list(itertools.accumulate(weights))
+
+
+def _weighted_choice(rnd, values, cumulative):
+    point = rnd.random() * cumulative[-1]
+    return values[bisect.bisect_left(cumulative, point)]
+
+
+def _chunk(table, chunk, total):
+    state = _state
+    rnd = random.Random(f'{state["seed"]}:{table}:{chunk}')
+    first = chunk * state['batch_size']
+    return rnd, range(first, min(first + state['batch_size'], total))
+
+
+def _posts(chunk):
+    state = _state
+    rnd, rows = _chunk('post', chunk, state['posts'])
+    now = state['now']
+    posts = []
+    for _ in rows:
+        if rnd.random() < state['deferred']:
+            pub_date = now + rnd.random() * DEFERRED_MAX_AHEAD
+        else:
+            age = timedelta(seconds=rnd.expovariate(
+                1 / PUB_DATE_MEAN_AGE.total_seconds()))
+            pub_date = now - min(age, PUB_DATE_MAX_AGE)
+        posts.append(Post(
+            title=rnd.choice(state['titles'])[:256],
+            text=rnd.choice(state['texts']),
+            author_id=_weighted_choice(
+                rnd, state['user_ids'], state['author_weights']),
+            category_id=rnd.choice(state['category_ids']),
+            location_id=rnd.choice(state['location_ids']),
+            is_published=rnd.random() >= state['unpublished'],
+            pub_date=pub_date))
+    return posts
+
+
+def _comments(chunk):
+    state = _state
+    rnd, rows = _chunk('comment', chunk, state['comments'])
+    return [
+        Comment(text=rnd.choice(state['titles']),
+                post_id=_weighted_choice(
+                    rnd, state['post_ids'], state['post_weights']),
+                author_id=rnd.choice(state['user_ids']))
+        for _ in rows
+    ]
+
+
+def _insert(model, make_objects, total, dataset):
+    """Создаёт объекты пачками, в пуле процессов при dataset.workers > 1.
+
+    Вставка идёт через bulk_create в текущем процессе и одной транзакции.
+    """
+    chunks = range(-(-total // dataset.batch_size))
+    if dataset.workers == 1:
+        with transaction.atomic():
+            for chunk in chunks:
+                model.objects.bulk_create(make_objects(chunk))
+        return
+    # пул закрывает соединения с БД, поэтому создаётся вне транзакции
+    with process_pool(dataset.workers, f'{__name__}._set_state',
+                      (_state,)) as pool, transaction.atomic():
+        for objects in pool.imap(make_objects, chunks):
+            model.objects.bulk_create(objects)
+
+
+def build(dataset=None, **kwargs):
+    """Заполняет БД синтетическими данными через bulk_create.
+
+    Даты публикации смещены к свежим, число постов автора и комментариев
+    к посту распределено по степенному закону. Результат детерминирован
+    значением dataset.seed и не зависит от числа процессов. Сигналы не
+    вызываются, поэтому исходящие события, журнал изменений API и ленты
+    подписок не заполняются, а кэши и ленты RSS сбрасываются целиком.
+    """
+    dataset = dataset or Dataset(**kwargs)
+    rnd = random.Random(dataset.seed)
+    faker = Faker('ru_RU')
+    faker.seed_instance(dataset.seed)
+    titles = _text_pool(faker, 'sentence')
+    texts = _text_pool(faker, 'paragraph')
+    # суффиксы не совпадают с данными предыдущих запусков
+    users = User.objects.count()
+    categories = Category.objects.count()
+
+    User.objects.bulk_create(
+        (User(username=f'{faker.user_name()}_{users + i}', password='!')
+         for i in range(dataset.users)),
+        batch_size=dataset.batch_size)
+    Category.objects.bulk_create(
+        Category(title=faker.word().capitalize(),
+                 slug=f'category-{categories + i}',
+                 description=rnd.choice(texts),
+                 is_published=i % 10 != 0)
+        for i in range(dataset.categories))
+    Location.objects.bulk_create(
+        Location(name=faker.city()) for _ in range(dataset.locations))
+
+    _state.clear()
+    _state.update(
+        asdict(dataset),
+        now=timezone.now(),
+        titles=titles,
+        texts=texts,
+        comments=dataset.posts * dataset.comments_per_post,
+        user_ids=list(User.objects.values_list('pk', flat=True)),
+        category_ids=list(Category.objects.values_list('pk', flat=True)),
+        location_ids=list(Location.objects.values_list('pk', flat=True)),
+    )
+    _state['author_weights'] = _pareto_cumulative(
+        rnd, len(_state['user_ids']))
+    _insert(Post, _posts, dataset.posts, dataset)
+
+    _state['post_ids'] = list(Post.objects.values_list('pk', flat=True))
+    _state['post_weights'] = _pareto_cumulative(
+        rnd, len(_state['post_ids']))
+    _insert(Comment, _comments, _state['comments'], dataset)
+
+    analyze()
+    category_cache.invalidate()
+    location_cache.invalidate()
+    invalidate_feeds()
+    invalidate_sitemap()
+    return dataset
+
+
+def analyze():
+    """Обновляет статистику планировщика после массовой загрузки."""
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
@@ -0,0 +1,87 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.test import override_settings
+
+from perf import datasets
+from perf.bench import isolated_database
+from perf.benchmarks import (
+    ASGIClient,
+    WSGIClient,
+    add_hot_post,
+    asgi_throughput,
+    default_scenarios,
+    read_views,
+    wsgi_throughput,
+)
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность синхронных страниц под WSGI '
+            'и асинхронных под ASGI при множестве медленных клиентов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--detail-comments', type=int, default=100)
+        parser.add_argument('--clients', type=int, default=100,
+                            help='Число одновременных клиентов.')
+        parser.add_argument('--requests', type=int, default=5,
+                            help='Запросов от каждого клиента.')
+        parser.add_argument('--delay', type=float, default=0.05,
+                            help='Задержка медленного клиента на приём '
+                                 'запроса и на отдачу ответа, секунды.')
+        parser.add_argument('--wsgi-workers', type=int, default=8,
+                            help='Потоков WSGI-сервера.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для JSON-результата.')
+
+    def handle(self, *args, **options):
+        results = []
+        with isolated_database(), override_settings(DEBUG=False):
+            datasets.build(posts=options['posts'],
+                           users=max(20, options['posts'] // 50),
+                           seed=options['seed'])
+            user = (User.objects.annotate(total=Count('posts_author'))
+                    .order_by('-total').first())
+            hot_post = add_hot_post(options['detail_comments'], user)
+            datasets.analyze()
+            scenarios = [
+                scenario for scenario in default_scenarios(user, hot_post)
+                if scenario.method == 'get'
+            ]
+            load = (options['clients'], options['requests'])
+
+            client = WSGIClient(user, delay=options['delay'])
+            with read_views(use_async=False):
+                for scenario in scenarios:
+                    results.append(self.report(wsgi_throughput(
+                        client, scenario, *load, options['wsgi_workers'])))
+
+            client = ASGIClient(user, delay=options['delay'])
+            with read_views(use_async=True):
+                for scenario in scenarios:
+                    results.append(self.report(
+                        asgi_throughput(client, scenario, *load)))
+
+        report = json.dumps({
+            'clients': options['clients'],
+            'requests_per_client': options['requests'],
+            'delay': options['delay'],
+            'wsgi_workers': options['wsgi_workers'],
+            'results': results,
+        }, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report)
+        else:
+            self.stdout.write(report)
+
+    def report(self, result):
+        self.stderr.write(
+            f'{result["server"]} {result["scenario"]}: '
+            f'{result["rps"]} rps, p95 {result["p95_ms"]} ms')
+        return result
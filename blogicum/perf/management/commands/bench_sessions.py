@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from mixer.backend.django import mixer
+
+from perf.bench import isolated_database, measure_requests
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность ленты BlogListView '
+            'для авторизованного пользователя с разными профилями сессий.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=30)
+        parser.add_argument(
+            '--profiles', nargs='+', default=list(settings.SESSION_ENGINES))
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            user = mixer.blend(get_user_model())
+            mixer.cycle(options['posts']).blend(
+                'blog.Post', author=user, category__is_published=True)
+
+            for profile in options['profiles']:
+                engine = settings.SESSION_ENGINES[profile]
+                with override_settings(DEBUG=False, SESSION_ENGINE=engine):
+                    client = Client()
+                    client.force_login(user)
+                    # прогрев кэшей и ленивых импортов
+                    client.get('/')
+                    result = measure_requests(
+                        client, '/', options['requests'])
+                self.stdout.write(
+                    f'{profile:>15}: {result["rps"]:>8} req/s, '
+                    f'{result["queries_per_request"]} queries/req, '
+                    f'{result["session_queries_per_request"]} '
+                    'session queries/req'
+                )
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from perf.bench import isolated_database
+from perf import datasets
+from perf.plans import check_plans
+
+
+class Command(BaseCommand):
+    help = ('Проверяет планы EXPLAIN QUERY PLAN запросов блога на '
+            'заполненной БД: полный просмотр и сортировка во временном '
+            'B-дереве горячих таблиц считаются ошибкой.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments-per-post', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            datasets.build(
+                posts=options['posts'],
+                comments_per_post=options['comments_per_post'])
+            report = check_plans()
+
+        failed = 0
+        for name, plan, problems in report:
+            status = self.style.ERROR('FAIL') if problems else 'ok'
+            self.stdout.write(f'{status} {name}')
+            for line in plan:
+                self.stdout.write(f'    {line}')
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(f'    ! {problem}'))
+            failed += bool(problems)
+        if failed:
+            raise CommandError(f'Регрессии планов запросов: {failed}')
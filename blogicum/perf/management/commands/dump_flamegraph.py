@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from perf.sampling import load_stacks, to_speedscope, to_svg
+
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_duration(value):
+    try:
+        return float(value[:-1]) * UNITS[value[-1]]
+    except (KeyError, ValueError, IndexError):
+        raise CommandError(
+            f'Неверная длительность {value!r}, ожидается например 15m.')
+
+
+class Command(BaseCommand):
+    help = ('Объединяет стеки сэмплирующего профилировщика всех воркеров '
+            'за окно времени в flamegraph (SVG или speedscope JSON).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', default='15m',
+                            help='Окно от текущего момента: 30s, 15m, 2h.')
+        parser.add_argument('--url-name',
+                            help='Только стеки указанного имени URL.')
+        parser.add_argument('--format', choices=('svg', 'speedscope'),
+                            default='svg')
+        parser.add_argument('--output', required=True)
+
+    def handle(self, *args, **options):
+        since = time.time() - parse_duration(options['since'])
+        stacks = load_stacks(since, url_name=options['url_name'])
+        if not stacks:
+            raise CommandError('Нет сэмплов за указанный период.')
+        if options['format'] == 'svg':
+            content = to_svg(stacks)
+        else:
+            content = to_speedscope(stacks)
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            file.write(content)
+        total = sum(sum(counter.values()) for counter in stacks.values())
+        self.stdout.write(
+            f'{total} сэмплов по {len(stacks)} URL записаны в '
+            f'{options["output"]}')
@@ -0,0 +1,50 @@
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.test import override_settings
+
+from perf import datasets
+from perf.bench import isolated_database
+from perf.benchmarks import WSGIClient, add_hot_post
+from perf.memory import memory_profiler
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Замеряет пик выделений памяти на запрос для страницы поста '
+            'с большим числом комментариев и для ленты постов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--iterations', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        settings_override = override_settings(
+            DEBUG=False, MEMORY_PROFILER=True,
+            MEMORY_PROFILER_REPORT_INTERVAL=float('inf'))
+        with isolated_database(), settings_override:
+            datasets.build(posts=options['posts'],
+                           users=max(20, options['posts'] // 50),
+                           seed=options['seed'])
+            user = (User.objects.annotate(total=Count('posts_author'))
+                    .order_by('-total').first())
+            hot_post = add_hot_post(options['comments'], user)
+            datasets.analyze()
+            client = WSGIClient(user)
+            paths = ['/', f'/posts/{hot_post.pk}/']
+            # прогрев: импорты и кэши не должны попасть в отчёт
+            for path in paths:
+                client.request('get', path)
+            memory_profiler.reset()
+            try:
+                for _ in range(options['iterations']):
+                    for path in paths:
+                        client.request('get', path)
+                self.stdout.write(memory_profiler.report())
+            finally:
+                tracemalloc.stop()
@@ -0,0 +1,137 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import override_settings
+
+from blog.models import Category, Comment, Post
+from core.processes import process_pool
+from perf.benchmarks import WSGIClient
+from perf.replay import (
+    LatencyStats,
+    RouteValues,
+    load_records,
+    replay,
+    replayable,
+)
+
+User = get_user_model()
+
+# сколько значений каждого параметра маршрута брать из БД
+ROUTE_VALUES = 1000
+
+
+def route_values():
+    posts = list(Post.objects.published().order_by('-pub_date')
+                 .values_list('pk', flat=True)[:ROUTE_VALUES])
+    return RouteValues({
+        'pk': posts,
+        'post_id': posts,
+        'comment_id': list(Comment.objects.filter(post_id__in=posts)
+                           .values_list('pk', flat=True)[:ROUTE_VALUES]),
+        'username': list(User.objects.order_by('pk')
+                         .values_list('username', flat=True)[:ROUTE_VALUES]),
+        'category_slug': list(Category.objects.filter(is_published=True)
+                              .values_list('slug', flat=True)),
+        'feed_format': ['rss', 'atom'],
+    })
+
+
+class UserClients:
+    """Сопоставляет псевдонимам из журнала реальных пользователей БД."""
+
+    def __init__(self, user_ids):
+        self.user_ids = user_ids
+        self.clients = {}
+
+    def __call__(self, alias):
+        if alias not in self.clients:
+            user = None
+            if alias is not None and self.user_ids:
+                user_id = self.user_ids[int(alias, 16) % len(self.user_ids)]
+                user = User.objects.get(pk=user_id)
+            self.clients[alias] = WSGIClient(user)
+        return self.clients[alias]
+
+
+def _override_settings(values):
+    # процесс пула, запущенный через spawn, не наследует override_settings
+    override_settings(**values).enable()
+
+
+def _replay_chunk(records, user_ids):
+    try:
+        return replay(records, UserClients(user_ids))
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('Проигрывает журнал запросов (JSONL) через WSGI-приложение '
+            'в текущем процессе и выводит пропускную способность, '
+            'гистограмму задержек и долю ошибок. Проигрываются только '
+            'безопасные запросы (GET, HEAD, OPTIONS), поэтому данные '
+            'блога не меняются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSONL-журнал запросов.')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--mode', choices=('thread', 'process'),
+                            default='thread')
+        parser.add_argument('--limit', type=int)
+        parser.add_argument('--repeat', type=int, default=1,
+                            help='Сколько раз проиграть журнал.')
+        parser.add_argument('--users', type=int, default=100,
+                            help='Сколько пользователей БД использовать '
+                                 'для авторизованных запросов.')
+
+    def handle(self, *args, **options):
+        try:
+            records = list(load_records(options['path'], options['limit']))
+        except FileNotFoundError as error:
+            raise CommandError(error)
+        skipped = len(records)
+        records = list(replayable(records, route_values()))
+        skipped -= len(records)
+        records *= options['repeat']
+        if not records:
+            raise CommandError('В журнале нет запросов для проигрывания.')
+
+        user_ids = list(
+            User.objects.order_by('pk')
+            .values_list('pk', flat=True)[:options['users']])
+        concurrency = max(1, options['concurrency'])
+        chunks = [records[i::concurrency] for i in range(concurrency)]
+
+        # RequestFactory обращается к приложению как testserver
+        replay_settings = {
+            'DEBUG': False,
+            'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver'],
+        }
+        with override_settings(**replay_settings):
+            started = time.perf_counter()
+            results = self.run_pool(
+                options['mode'], chunks, user_ids, replay_settings)
+            elapsed = time.perf_counter() - started
+
+        stats = LatencyStats()
+        for result in results:
+            stats.merge(result)
+        summary = stats.summary(elapsed)
+        summary.update(mode=options['mode'], concurrency=concurrency,
+                       skipped=skipped)
+        self.stdout.write(json.dumps(summary, indent=2))
+
+    def run_pool(self, mode, chunks, user_ids, replay_settings):
+        if mode == 'thread':
+            with ThreadPoolExecutor(len(chunks)) as pool:
+                return list(pool.map(
+                    lambda chunk: _replay_chunk(chunk, user_ids), chunks))
+        with process_pool(len(chunks), f'{__name__}._override_settings',
+                          (replay_settings,)) as pool:
+            return pool.starmap(
+                _replay_chunk, [(chunk, user_ids) for chunk in chunks])
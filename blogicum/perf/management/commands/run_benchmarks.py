@@ -0,0 +1,82 @@
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.test import override_settings
+
+from perf import datasets
+from perf.bench import isolated_database
+from perf.benchmarks import (
+    WSGIClient,
+    add_hot_post,
+    default_scenarios,
+    run_scenario,
+)
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Замеряет основные страницы блога через WSGI-обработчик на '
+            'синтетических наборах данных и выводит результаты в JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[10000],
+            help='Число постов в наборах данных, например 10000 100000 '
+                 '1000000.')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--detail-comments', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--only', nargs='*',
+                            help='Запустить только указанные сценарии.')
+        parser.add_argument('--output', help='Файл для JSON-результата.')
+
+    def handle(self, *args, **options):
+        results = []
+        for size in options['sizes']:
+            self.stderr.write(f'Набор данных: {size} постов')
+            results.extend(self.run_size(size, options))
+
+        report = json.dumps({
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'argv': sys.argv[1:],
+            'results': results,
+        }, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report)
+        else:
+            self.stdout.write(report)
+
+    def run_size(self, size, options):
+        with isolated_database(), override_settings(DEBUG=False):
+            return self.measure(size, options)
+
+    def measure(self, size, options):
+        """Заполняет текущую БД набором данных и прогоняет сценарии."""
+        results = []
+        datasets.build(posts=size, users=max(20, size // 50),
+                       seed=options['seed'])
+        user = (User.objects.annotate(total=Count('posts_author'))
+                .order_by('-total').first())
+        hot_post = add_hot_post(options['detail_comments'], user)
+        datasets.analyze()
+        client = WSGIClient(user)
+        for scenario in default_scenarios(user, hot_post):
+            if options['only'] and scenario.name not in options['only']:
+                continue
+            result = run_scenario(client, scenario, options['iterations'])
+            result['dataset_posts'] = size
+            self.stderr.write(
+                f'  {scenario.name}: p50 {result["p50_ms"]} ms, '
+                f'p95 {result["p95_ms"]} ms')
+            results.append(result)
+        return results
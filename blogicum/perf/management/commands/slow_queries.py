@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from perf.slowlog import load_records, summarize
+from .dump_flamegraph import parse_duration
+
+SORT_KEYS = {'total': 'total_ms', 'count': 'count', 'p95': 'p95_ms'}
+
+
+class Command(BaseCommand):
+    help = ('Сводка журнала медленных запросов: отпечатки с наибольшим '
+            'общим временем, числом выполнений или p95.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sort', choices=SORT_KEYS, default='total')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--since',
+                            help='Окно от текущего момента: 30s, 15m, 2h.')
+        parser.add_argument('--view', help='Только указанное имя URL.')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = time.time() - parse_duration(options['since'])
+        records = load_records(settings.SLOW_QUERY_LOG_DIR, since)
+        if options['view']:
+            records = (record for record in records
+                       if record['view'] == options['view'])
+        summary = summarize(records)
+        if not summary:
+            raise CommandError('Журнал медленных запросов пуст.')
+        summary.sort(key=lambda row: row[SORT_KEYS[options['sort']]],
+                     reverse=True)
+        for row in summary[:options['limit']]:
+            self.stdout.write(
+                f'{row["fingerprint"]}  всего {row["total_ms"]:.1f} мс, '
+                f'раз {row["count"]} (медленных {row["slow"]}), '
+                f'p95 {row["p95_ms"]:.1f} мс')
+            self.stdout.write(f'    {row["shape"]}')
+            views = sorted(row['views'].items(),
+                           key=lambda item: item[1], reverse=True)
+            self.stdout.write('    ' + ', '.join(
+                f'{view}: {round(count)}' for view, count in views[:3]))
@@ -0,0 +1,118 @@
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+
+# сколько строк с наибольшим приростом учитывать в каждом снимке
+TOP_LINES = 30
+
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+)
+
+
+class MemoryProfiler:
+    """Снимки tracemalloc до и после каждого запроса.
+
+    Для каждого имени URL копятся пик выделений за запрос и память,
+    оставшаяся занятой после ответа, по строкам исходного кода
+    (в «осталось» входит и тело ещё не отправленного ответа).
+    Периодически пишется отчёт с разницей относительно первого снимка.
+    """
+
+    def __init__(self):
+        self.views = defaultdict(lambda: {
+            'requests': 0, 'peak': 0, 'retained': 0,
+            'lines': defaultdict(int)})
+        self._lock = threading.Lock()
+        self._baseline = None
+        self._reported_at = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self.views.clear()
+        self._baseline = self.snapshot() if tracemalloc.is_tracing() else None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(settings.MEMORY_PROFILER_FRAMES)
+        self._baseline = self.snapshot()
+
+    @staticmethod
+    def snapshot():
+        return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+    @contextmanager
+    def track(self, request):
+        """Снимки до и после обработки запроса внутри блока with."""
+        # пик общий для процесса: при нескольких потоках или
+        # асинхронных запросах он включает выделения параллельных
+        before = self.snapshot()
+        tracemalloc.reset_peak()
+        start_size = tracemalloc.get_traced_memory()[0]
+        yield
+        peak = tracemalloc.get_traced_memory()[1] - start_size
+        after = self.snapshot()
+
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        diff = after.compare_to(before, 'lineno')
+        with self._lock:
+            stats = self.views[view]
+            stats['requests'] += 1
+            stats['peak'] = max(stats['peak'], peak)
+            stats['retained'] += sum(item.size_diff for item in diff)
+            for item in diff[:TOP_LINES]:
+                if item.size_diff > 0:
+                    frame = item.traceback[0]
+                    stats['lines'][f'{frame.filename}:{frame.lineno}'] += (
+                        item.size_diff)
+        self.maybe_report()
+
+    def maybe_report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._reported_at < (
+                settings.MEMORY_PROFILER_REPORT_INTERVAL):
+            return None
+        self._reported_at = now
+        return self.write_report()
+
+    def write_report(self):
+        directory = Path(settings.MEMORY_PROFILER_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'memory-{datetime.now():%Y%m%d-%H%M%S}.txt'
+        path.write_text(self.report(), encoding='utf-8')
+        return path
+
+    def report(self):
+        lines = ['Память по представлениям (KiB):']
+        with self._lock:
+            views = sorted(self.views.items(),
+                           key=lambda item: item[1]['peak'], reverse=True)
+            for view, stats in views:
+                lines.append(
+                    f'{view}: запросов {stats["requests"]}, '
+                    f'пик {stats["peak"] / 1024:.1f}, '
+                    f'осталось {stats["retained"] / 1024:.1f}')
+                top = sorted(stats['lines'].items(),
+                             key=lambda item: item[1], reverse=True)
+                for line, size in top[:5]:
+                    lines.append(f'    {size / 1024:.1f} {line}')
+        if self._baseline is not None:
+            lines.append('')
+            lines.append('Рост с момента запуска:')
+            diff = self.snapshot().compare_to(self._baseline, 'lineno')
+            for item in diff[:TOP_LINES]:
+                lines.append(f'    {item}')
+        return '\n'.join(lines) + '\n'
+
+
+memory_profiler = MemoryProfiler()
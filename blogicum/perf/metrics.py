@@ -0,0 +1,347 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache.backends.base import BaseCache
+from django.utils.module_loading import import_string
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DEFAULT_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+    def _key(self, labels):
+        return json.dumps([str(labels[name]) for name in self.labels])
+
+    def empty(self):
+        raise NotImplementedError
+
+    def merge(self, value, other):
+        raise NotImplementedError
+
+    def samples(self, key, value):
+        raise NotImplementedError
+
+    def _label_text(self, key, extra=()):
+        pairs = list(zip(self.labels, json.loads(key))) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (
+            (name, str(value).replace('\\', r'\\').replace('"', r'\"'))
+            for name, value in pairs)
+        return '{' + ','.join(
+            f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def empty(self):
+        return 0
+
+    def merge(self, value, other):
+        return value + other
+
+    def samples(self, key, value):
+        yield f'{self.name}{self._label_text(key)} {value}'
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def empty(self):
+        # счётчики по корзинам, затем сумма и количество наблюдений
+        return [0] * len(self.buckets) + [0.0, 0]
+
+    def merge(self, value, other):
+        return [left + right for left, right in zip(value, other)]
+
+    def observation(self, amount):
+        value = self.empty()
+        for index, bound in enumerate(self.buckets):
+            if amount <= bound:
+                value[index] = 1
+                break
+        value[-2] = amount
+        value[-1] = 1
+        return value
+
+    def samples(self, key, value):
+        cumulative = 0
+        for bound, count in zip(self.buckets, value):
+            cumulative += count
+            labels = self._label_text(key, [('le', bound)])
+            yield f'{self.name}_bucket{labels} {cumulative}'
+        labels = self._label_text(key, [('le', '+Inf')])
+        yield f'{self.name}_bucket{labels} {value[-1]}'
+        yield f'{self.name}_sum{self._label_text(key)} {value[-2]}'
+        yield f'{self.name}_count{self._label_text(key)} {value[-1]}'
+
+
+def _process_alive(pid):
+    try:
+        pid = int(pid)
+    except ValueError:
+        return False
+    if os.name != 'posix':
+        # в Windows os.kill завершает процесс, проверка недоступна
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # процесс есть, но принадлежит другому пользователю
+        return True
+    return True
+
+
+@contextmanager
+def _file_lock(path):
+    with open(path, 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+class Registry:
+    """Метрики процесса с периодическим сбросом в файл.
+
+    Каждый процесс пишет своё состояние в отдельный файл каталога
+    METRICS_DIR, а при выдаче метрик файлы всех процессов складываются.
+    Значения завершившихся процессов переносятся в файл retired.json,
+    чтобы счётчики не убывали.
+    """
+
+    retired_name = 'retired'
+
+    def __init__(self):
+        self.metrics = {}
+        self._values = {}
+        self._lock = threading.Lock()
+        self._flushed_at = 0.0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def _add(self, metric, labels, amount):
+        key = metric._key(labels)
+        with self._lock:
+            values = self._values.setdefault(metric.name, {})
+            values[key] = metric.merge(
+                values.get(key, metric.empty()), amount)
+
+    def inc(self, metric, amount=1, **labels):
+        self._add(metric, labels, amount)
+
+    def observe(self, metric, amount, **labels):
+        self._add(metric, labels, metric.observation(amount))
+
+    @property
+    def directory(self):
+        return Path(settings.METRICS_DIR)
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._flushed_at < (
+                settings.METRICS_FLUSH_INTERVAL):
+            return
+        self._flushed_at = now
+        with self._lock:
+            data = json.dumps(self._values)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f'{os.getpid()}.json'
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(data)
+        os.replace(tmp_path, path)
+
+    def _read(self, path):
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _merge(self, target, data):
+        for name, values in data.items():
+            metric = self.metrics.get(name)
+            if metric is None:
+                continue
+            merged = target.setdefault(name, {})
+            for key, value in values.items():
+                merged[key] = metric.merge(
+                    merged.get(key, metric.empty()), value)
+        return target
+
+    def _retire(self, path):
+        """Добавляет значения завершившегося процесса в retired.json."""
+        # переименование удаётся только одному из собирающих процессов,
+        # поэтому значения не попадут в retired.json дважды
+        claimed = path.with_name(f'{path.stem}.{os.getpid()}.retiring')
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            return
+        retired = self.directory / f'{self.retired_name}.json'
+        with _file_lock(self.directory / f'{self.retired_name}.lock'):
+            data = self._merge(self._read(retired), self._read(claimed))
+            tmp_path = retired.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(data))
+            os.replace(tmp_path, retired)
+        claimed.unlink()
+
+    def collect(self):
+        """Складывает значения из файлов всех процессов."""
+        self.flush(force=True)
+        for path in self.directory.glob('*.json'):
+            if (path.stem != self.retired_name
+                    and not _process_alive(path.stem)):
+                self._retire(path)
+        merged = {}
+        for path in self.directory.glob('*.json'):
+            self._merge(merged, self._read(path))
+        return merged
+
+    def exposition(self, extra=()):
+        """Текстовый формат Prometheus; extra — пары (Gauge, значение)."""
+        merged = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for key, value in sorted(merged.get(name, {}).items()):
+                lines.extend(metric.samples(key, value))
+        for metric, value in extra:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples(metric._key({}), value))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+atexit.register(lambda: registry.flush(force=True) if registry._values
+                else None)
+
+http_requests = registry.counter(
+    'blogicum_http_requests_total', 'Число HTTP-запросов.',
+    labels=('view', 'method', 'status'))
+http_duration = registry.histogram(
+    'blogicum_http_request_duration_seconds',
+    'Время обработки HTTP-запроса.', labels=('view',))
+db_queries = registry.counter(
+    'blogicum_db_queries_total', 'Число запросов к БД.', labels=('view',))
+db_duration = registry.histogram(
+    'blogicum_db_duration_seconds',
+    'Суммарное время запросов к БД за HTTP-запрос.', labels=('view',))
+template_duration = registry.histogram(
+    'blogicum_template_render_seconds',
+    'Время рендеринга шаблонов за HTTP-запрос.', labels=('view',))
+phase_duration = registry.histogram(
+    'blogicum_phase_duration_seconds',
+    'Время фаз Server-Timing по именам URL из SERVER_TIMING_APPS.',
+    labels=('view', 'phase'))
+cache_requests = registry.counter(
+    'blogicum_cache_requests_total', 'Обращения к кэшу на чтение.',
+    labels=('backend', 'result'))
+
+active_sessions = Gauge(
+    'blogicum_active_sessions', 'Неистёкшие сессии в БД.')
+active_users = Gauge(
+    'blogicum_active_users',
+    'Пользователи, входившие за METRICS_ACTIVE_USER_WINDOW.')
+
+
+_MISSING = object()
+
+
+class CountedCache(BaseCache):
+    """Обёртка бэкенда кэша, считающая попадания и промахи get().
+
+    Настоящий бэкенд задаётся в OPTIONS['BACKEND'], остальные параметры
+    передаются ему без изменений.
+    """
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        backend = import_string(options.pop('BACKEND'))
+        super().__init__({**params, 'OPTIONS': options})
+        self.cache = backend(location, {**params, 'OPTIONS': options})
+        self.backend_name = backend.__name__
+
+    def get(self, key, default=None, version=None):
+        value = self.cache.get(key, _MISSING, version)
+        hit = value is not _MISSING
+        registry.inc(cache_requests, backend=self.backend_name,
+                     result='hit' if hit else 'miss')
+        return value if hit else default
+
+    def add(self, *args, **kwargs):
+        return self.cache.add(*args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        return self.cache.set(*args, **kwargs)
+
+    def touch(self, *args, **kwargs):
+        return self.cache.touch(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self.cache.delete(*args, **kwargs)
+
+    def get_many(self, *args, **kwargs):
+        return self.cache.get_many(*args, **kwargs)
+
+    def has_key(self, *args, **kwargs):
+        return self.cache.has_key(*args, **kwargs)  # noqa: W601
+
+    def incr(self, *args, **kwargs):
+        return self.cache.incr(*args, **kwargs)
+
+    def decr(self, *args, **kwargs):
+        return self.cache.decr(*args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        return self.cache.set_many(*args, **kwargs)
+
+    def delete_many(self, *args, **kwargs):
+        return self.cache.delete_many(*args, **kwargs)
+
+    def clear(self):
+        return self.cache.clear()
+
+    def close(self, **kwargs):
+        return self.cache.close(**kwargs)
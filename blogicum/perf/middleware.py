@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+
+from . import metrics, profiling, slowlog, timing
+from .memory import memory_profiler
+from .sampling import sampler
+from .metrics import registry
+from .queries import record_queries
+from .replay import RequestLogWriter, make_record
+
+logger = logging.getLogger('perf.queries')
+
+
+class PerfMiddleware:
+    """Основа middleware perf для синхронного и асинхронного стека.
+
+    Включается настройкой setting. Подкласс задаёт handle(request) —
+    генератор, который один раз отдаёт управление дальше по цепочке
+    (yield возвращает ответ) и возвращает итоговый ответ. Так один код
+    работает и в WSGI, и в ASGI, а асинхронные представления не
+    переводятся в поток ради middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+    setting = None
+
+    def __init__(self, get_response):
+        if not getattr(settings, self.setting):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # так Django 3.2 отличает асинхронную middleware
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        self.setup()
+
+    def setup(self):
+        pass
+
+    def handle(self, request):
+        return (yield)
+
+    @staticmethod
+    def _finish(steps, response):
+        try:
+            steps.send(response)
+        except StopIteration as stop:
+            return stop.value
+        raise RuntimeError('handle() должен отдавать управление один раз.')
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        steps = self.handle(request)
+        next(steps)
+        try:
+            response = self.get_response(request)
+        except BaseException as exc:
+            steps.throw(exc)
+            raise
+        return self._finish(steps, response)
+
+    async def __acall__(self, request):
+        steps = self.handle(request)
+        next(steps)
+        try:
+            response = await self.get_response(request)
+        except BaseException as exc:
+            steps.throw(exc)
+            raise
+        return self._finish(steps, response)
+
+
+class QueryInstrumentationMiddleware(PerfMiddleware):
+    """Считает запросы к БД на каждый запрос и ищет повторы (N+1)."""
+
+    setting = 'QUERY_INSTRUMENTATION'
+
+    def setup(self):
+        self.threshold = settings.QUERY_REPEAT_THRESHOLD
+
+    def handle(self, request):
+        with record_queries() as recorder:
+            response = yield
+
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path
+        logger.info('%s: %d queries, %.1f ms', view_name,
+                    len(recorder), recorder.total_time * 1000)
+        for repeated in recorder.repeated_shapes(self.threshold):
+            logger.warning(
+                '%s: N+1 suspected, %d x %s from %s', view_name,
+                repeated['count'], repeated['shape'], repeated['origins'])
+        response['X-Query-Count'] = len(recorder)
+        return response
+
+
+class RequestLogMiddleware(PerfMiddleware):
+    """Пишет обезличенный журнал запросов для replay_requests."""
+
+    setting = 'REQUEST_LOG_PATH'
+
+    def setup(self):
+        self.writer = RequestLogWriter(settings.REQUEST_LOG_PATH)
+
+    def handle(self, request):
+        started = time.perf_counter()
+        response = yield
+        self.writer.write(make_record(
+            request, response, time.perf_counter() - started))
+        return response
+
+
+class ServerTimingMiddleware(PerfMiddleware):
+    """Разбивает время ответа по фазам и отдаёт его в Server-Timing.
+
+    view включает рендеринг шаблонов и запросы к БД из представления,
+    middleware — всё остальное время обработки запроса.
+    """
+
+    setting = 'SERVER_TIMING'
+
+    def setup(self):
+        timing.install()
+
+    def handle(self, request):
+        started = time.perf_counter()
+        with timing.collect() as timings:
+            response = yield
+        total = time.perf_counter() - started
+
+        view_started = getattr(request, '_perf_view_started', None)
+        if view_started is not None:
+            view = time.perf_counter() - view_started
+            timings.add('view', view)
+            timings.add('middleware', total - view)
+        timings.add('total', total)
+        response['Server-Timing'] = timing.server_timing_header(timings)
+
+        match = request.resolver_match
+        if match and match.app_name in settings.SERVER_TIMING_APPS:
+            for phase, duration in timings.phases.items():
+                registry.observe(metrics.phase_duration, duration,
+                                 view=match.view_name, phase=phase)
+            registry.flush()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._perf_view_started = time.perf_counter()
+
+
+class MetricsMiddleware(PerfMiddleware):
+    """Собирает метрики запросов для выдачи в формате Prometheus."""
+
+    setting = 'METRICS_ENABLED'
+
+    def setup(self):
+        timing.install()
+
+    def handle(self, request):
+        started = time.perf_counter()
+        with timing.collect() as timings:
+            response = yield
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        registry.inc(metrics.http_requests, view=view,
+                     method=request.method, status=response.status_code)
+        registry.observe(metrics.http_duration, duration, view=view)
+        registry.inc(metrics.db_queries, timings.counts['db'], view=view)
+        registry.observe(
+            metrics.db_duration, timings.phases['db'], view=view)
+        registry.observe(
+            metrics.template_duration, timings.phases['template'], view=view)
+        registry.flush()
+        return response
+
+
+class ProfilerMiddleware(PerfMiddleware):
+    """Профилирует запрос сотрудника по параметру _profile или X-Profile.
+
+    Работает и с выключенным DEBUG: отчёт и pstats-файл сохраняются
+    в PROFILE_DIR, в режиме html отчёт возвращается вместо ответа.
+    """
+
+    setting = 'PROFILER_ENABLED'
+
+    def handle(self, request):
+        mode = profiling.requested_mode(request)
+        if mode is None or not request.user.is_staff:
+            return (yield)
+
+        with profiling.profile_request(request) as result:
+            response = yield
+        name = result.save()
+        if mode == 'store':
+            response['X-Profile-Report'] = name
+            return response
+
+        sort = request.GET.get(profiling.SORT_PARAM)
+        if sort not in profiling.SORT_KEYS:
+            sort = 'cumulative'
+        report = HttpResponse(result.render(sort))
+        report['X-Profile-Report'] = name
+        return report
+
+    async def __acall__(self, request):
+        if profiling.requested_mode(request) is not None:
+            # пользователь загружается из БД, а в цикле событий это
+            # запрещено: загрузка в потоке, дальше он берётся из запроса
+            await sync_to_async(lambda: request.user.is_staff)()
+        return await super().__acall__(request)
+
+
+class SamplingProfilerMiddleware(PerfMiddleware):
+    """Помечает потоки именем URL для постоянного сэмплирования стеков.
+
+    В асинхронном стеке помечается поток цикла событий, поэтому при
+    параллельных запросах метка относится к последнему из них.
+    """
+
+    setting = 'SAMPLING_PROFILER'
+
+    def setup(self):
+        sampler.start(settings.SAMPLING_INTERVAL)
+        if self.is_async:
+            # синхронный process_view выполнялся бы в другом потоке
+            self.process_view = self._aprocess_view
+
+    def handle(self, request):
+        sampler.label('<middleware>')
+        try:
+            return (yield)
+        finally:
+            sampler.label(None)
+            sampler.flush()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        sampler.label(request.resolver_match.view_name)
+
+    async def _aprocess_view(self, request, *args):
+        sampler.label(request.resolver_match.view_name)
+
+
+class MemoryProfilerMiddleware(PerfMiddleware):
+    """Снимки tracemalloc вокруг каждого запроса, см. perf.memory."""
+
+    setting = 'MEMORY_PROFILER'
+
+    def setup(self):
+        memory_profiler.start()
+
+    def handle(self, request):
+        with memory_profiler.track(request):
+            response = yield
+        return response
+
+
+class SlowQueryLogMiddleware(PerfMiddleware):
+    """Сообщает журналу медленных запросов имя текущего представления."""
+
+    setting = 'SLOW_QUERY_LOG'
+
+    def handle(self, request):
+        token = slowlog.set_view(None)
+        try:
+            return (yield)
+        finally:
+            slowlog.reset_view(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        slowlog.set_view(request.resolver_match.view_name)
@@ -0,0 +1,76 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Count
+
+from blog.models import Category, Comment, Post
+
+User = get_user_model()
+
+# таблицы, полный просмотр или сортировка которых недопустимы
+HOT_TABLES = ('blog_post', 'blog_comment')
+
+FULL_SCAN = re.compile(r'\bSCAN (\w+)(?! USING)')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def plan_cases():
+    """Запросы PostQuerySet и представлений блога, планы которых проверяются.
+
+    Возвращает пары (название, queryset, разрешена ли сортировка во
+    временном B-дереве).
+    """
+    user = User.objects.filter(posts_author__isnull=False).first()
+    category = Category.objects.filter(is_published=True).first()
+    post = Post.objects.published().first()
+    anonymous = AnonymousUser()
+
+    return [
+        ('published', Post.objects.published(), False),
+        ('published count', Post.objects.published().order_by(), False),
+        ('in_category', Post.objects.in_category(category), False),
+        ('available_for_user (anonymous)',
+         Post.objects.available_for_user(anonymous), False),
+        ('available_for_user (authenticated)',
+         Post.objects.available_for_user(user), False),
+        ('available_for_user (authenticated) page',
+         Post.objects.available_for_user(user)[:10], False),
+        ('BlogListView', Post.objects.published().for_cards()[:10], False),
+        ('CategoryListView',
+         Post.objects.in_category(category).for_cards()[:10], False),
+        ('ProfileListView (own)',
+         user.posts_author.all().for_cards()[:10], False),
+        ('ProfileListView (other)',
+         user.posts_author.published().for_cards()[:10], False),
+        ('PostDetailView', Post.objects.filter(pk=post.pk), False),
+        ('PostDetailView comments',
+         post.comments.select_related('author'), False),
+        ('comment_count',
+         Comment.objects.filter(post__in=[post.pk]).order_by()
+         .values_list('post').annotate(total=Count('pk')), False),
+    ]
+
+
+def explain(queryset):
+    return queryset.explain().splitlines()
+
+
+def find_problems(queryset, plan, allow_sort=False):
+    problems = [
+        line for line in plan
+        if (match := FULL_SCAN.search(line)) and match[1] in HOT_TABLES
+    ]
+    if (not allow_sort and queryset.model._meta.db_table in HOT_TABLES
+            and any(TEMP_SORT in line for line in plan)):
+        problems.append(TEMP_SORT)
+    return problems
+
+
+def check_plans():
+    """Возвращает отчёт по всем запросам: название, план, проблемы."""
+    report = []
+    for name, queryset, allow_sort in plan_cases():
+        plan = explain(queryset)
+        report.append((name, plan, find_problems(queryset, plan, allow_sort)))
+    return report
@@ -0,0 +1,127 @@
+import cProfile
+import pstats
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.functional import cached_property
+
+from .queries import QueryRecorder, record_queries
+
+PROFILE_PARAM = '_profile'
+SORT_PARAM = '_profile_sort'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+SORT_KEYS = ('cumulative', 'tottime', 'calls')
+# значения _profile и X-Profile: html — вернуть отчёт вместо ответа,
+# store — только сохранить файлы
+MODES = {'1': 'html', 'html': 'html', 'store': 'store'}
+MAX_ROWS = 300
+
+
+def requested_mode(request):
+    """Режим профилирования из параметра или заголовка, либо None.
+
+    Неизвестные значения, например _profile=0, профилирование не включают.
+    """
+    mode = request.GET.get(PROFILE_PARAM) or request.META.get(PROFILE_HEADER)
+    return MODES.get(mode)
+
+
+class ProfileResult:
+
+    def __init__(self, request):
+        self.request = request
+        self.profiler = cProfile.Profile()
+        self.recorder = QueryRecorder()
+        self.duration = None
+
+    @cached_property
+    def stats(self):
+        return pstats.Stats(self.profiler)
+
+    def rows(self, sort):
+        sort_field = 'calls_sort' if sort == 'calls' else sort
+        rows = []
+        for (filename, line, function), data in self.stats.stats.items():
+            primitive, calls, total, cumulative, _ = data
+            rows.append({
+                'function': function,
+                'location': f'{filename}:{line}',
+                'calls': (calls if calls == primitive
+                          else f'{calls}/{primitive}'),
+                'calls_sort': calls,
+                'tottime': total,
+                'cumulative': cumulative,
+            })
+        rows.sort(key=lambda row: row[sort_field], reverse=True)
+        return rows[:MAX_ROWS]
+
+    def save(self):
+        """Сохраняет pstats-файл и HTML-отчёт, возвращает их имя."""
+        directory = Path(settings.PROFILE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        match = self.request.resolver_match
+        view = re.sub(r'\W', '_', match.view_name if match else 'unresolved')
+        name = f'{datetime.now():%Y%m%d-%H%M%S-%f}-{view}'
+        self.stats.dump_stats(directory / f'{name}.prof')
+        (directory / f'{name}.html').write_text(
+            self.render('cumulative'), encoding='utf-8')
+        return name
+
+    def render(self, sort):
+        queries = [
+            {
+                'sql': query['sql'],
+                'duration_ms': query['duration'] * 1000,
+                'origin': query['template'] or query['code'] or '',
+            }
+            for query in self.recorder.queries
+        ]
+        return render_to_string('perf/profile.html', {
+            'path': self.request.get_full_path(),
+            'duration_ms': self.duration * 1000,
+            'sort': sort,
+            'sort_keys': SORT_KEYS,
+            'rows': self.rows(sort),
+            'queries': queries,
+            'query_time_ms': self.recorder.total_time * 1000,
+        })
+
+
+@contextmanager
+def profile_request(request):
+    """Профилирует обработку запроса внутри блока with.
+
+    В асинхронном стеке в профиль попадает всё, что выполняется в потоке
+    цикла событий, в том числе другие запросы.
+    """
+    result = ProfileResult(request)
+    with record_queries(result.recorder):
+        started = time.perf_counter()
+        result.profiler.enable()
+        try:
+            yield result
+        finally:
+            result.profiler.disable()
+            result.duration = time.perf_counter() - started
+
+
+def prune(keep_seconds=None):
+    """Удаляет отчёты из PROFILE_DIR старше keep_seconds."""
+    keep_seconds = (settings.PROFILE_RETENTION
+                    if keep_seconds is None else keep_seconds)
+    directory = Path(settings.PROFILE_DIR)
+    if not directory.exists():
+        return 0
+    expired = time.time() - keep_seconds
+    deleted = 0
+    for path in directory.iterdir():
+        if path.suffix in ('.prof', '.html') and (
+                path.stat().st_mtime < expired):
+            path.unlink(missing_ok=True)
+            deleted += 1
+    return deleted
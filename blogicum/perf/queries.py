@@ -0,0 +1,120 @@
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+PERF_DIR = str(Path(__file__).resolve().parent)
+
+_WHITESPACE = re.compile(r'\s+')
+_IN_LIST = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+def sql_shape(sql):
+    """Приводит запрос к форме без литералов и длины списков в IN."""
+    shape = _WHITESPACE.sub(' ', sql).strip()
+    shape = _STRING.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    return _IN_LIST.sub('IN (...)', shape)
+
+
+def template_origin(frame):
+    """Возвращает 'шаблон:строка' ближайшего рендерящегося узла шаблона."""
+    while frame is not None:
+        if frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            origin = getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                return f'{origin.template_name}:{token.lineno}'
+        frame = frame.f_back
+    return None
+
+
+def code_origin(frame):
+    """Возвращает 'файл:строка' ближайшего вызова из кода проекта."""
+    base_dir = str(settings.BASE_DIR)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base_dir) and not filename.startswith(
+                PERF_DIR):
+            return (f'{Path(filename).relative_to(base_dir)}:'
+                    f'{frame.f_lineno}')
+        frame = frame.f_back
+    return None
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper, записывающая запросы и их источник."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            frame = sys._getframe(1)
+            self.queries.append({
+                'sql': sql,
+                'shape': sql_shape(sql),
+                'duration': duration,
+                'template': template_origin(frame),
+                'code': code_origin(frame),
+            })
+
+    def __len__(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(query['duration'] for query in self.queries)
+
+    def repeated_shapes(self, threshold):
+        """Формы запросов, выполненные не менее threshold раз (N+1)."""
+        counts = Counter(query['shape'] for query in self.queries)
+        origins = defaultdict(Counter)
+        for query in self.queries:
+            if counts[query['shape']] >= threshold:
+                origin = query['template'] or query['code'] or 'unknown'
+                origins[query['shape']][origin] += 1
+        return [
+            {'shape': shape, 'count': counts[shape],
+             'origins': dict(origins[shape])}
+            for shape in origins
+        ]
+
+    def report(self, threshold=None):
+        lines = [f'{len(self)} queries, {self.total_time * 1000:.1f} ms']
+        for query in self.queries:
+            origin = query['template'] or query['code'] or ''
+            lines.append(f'  [{origin}] {query["sql"]}')
+        if threshold:
+            for repeated in self.repeated_shapes(threshold):
+                lines.append(
+                    f'N+1: {repeated["count"]}x {repeated["shape"]} '
+                    f'from {repeated["origins"]}')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def execute_wrapper(wrapper):
+    """Подключает обёртку execute_wrapper ко всем соединениям с БД."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield wrapper
+
+
+def record_queries(recorder=None):
+    if recorder is None:
+        recorder = QueryRecorder()
+    return execute_wrapper(recorder)
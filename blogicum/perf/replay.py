@@ -0,0 +1,203 @@
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.utils.crypto import salted_hmac
+
+# границы корзин гистограммы задержек, мс
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+# методы, которые проигрываются: остальные изменили бы данные БД
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# параметр шаблона адреса, например <int:pk>
+_PARAMETER = re.compile(r'<(?:\w+:)?(?P<name>\w+)>')
+
+
+def anonymize_user(user):
+    """Стабильный псевдоним пользователя, не раскрывающий его id."""
+    if not user.is_authenticated:
+        return None
+    return salted_hmac(
+        'perf.replay.user', str(user.pk)).hexdigest()[:16]
+
+
+def anonymize_value(value):
+    """Стабильный псевдоним значения параметра адреса."""
+    return salted_hmac('perf.replay.value', str(value)).hexdigest()[:16]
+
+
+def make_record(request, response, duration):
+    """Запись журнала без значений из адреса.
+
+    Вместо адреса пишется шаблон маршрута: имена пользователей, токены
+    сброса пароля и id остаются только псевдонимами, а от строки запроса
+    остаются имена параметров.
+    """
+    match = request.resolver_match
+    return {
+        'ts': datetime.now(timezone.utc).isoformat(),
+        'method': request.method,
+        'route': f'/{match.route}' if match else None,
+        'params': {
+            name: anonymize_value(value)
+            for name, value in match.kwargs.items()
+        } if match else {},
+        'query_keys': sorted(request.GET),
+        'view': match.view_name if match else None,
+        'user': anonymize_user(request.user),
+        # значения полей форм не пишутся, только их имена
+        'data_keys': sorted(
+            key for key in request.POST if key != 'csrfmiddlewaretoken'),
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+    }
+
+
+class RequestLogWriter:
+    """Дописывает записи в JSONL-файл; безопасен для потоков."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._file is None:
+                # каждая строка пишется одним вызовом write в режиме
+                # добавления, поэтому процессы не перемешивают записи
+                self._file = open(
+                    self.path, 'a', encoding='utf-8', buffering=1)
+            self._file.write(line)
+
+
+def load_records(path, limit=None):
+    with open(path, encoding='utf-8') as file:
+        for number, line in enumerate(file):
+            if limit is not None and number >= limit:
+                return
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+class RouteValues:
+    """Подставляет в шаблоны маршрутов значения из БД.
+
+    Псевдоним параметра всегда даёт одно и то же значение, поэтому
+    популярные в журнале посты остаются популярными и при проигрывании.
+    """
+
+    def __init__(self, values):
+        # имя параметра -> список допустимых значений
+        self.values = values
+
+    def path(self, record):
+        """Адрес для записи или None, если его не собрать."""
+        route, params = record.get('route'), record.get('params', {})
+        # маршруты на регулярных выражениях и 404 не восстанавливаются
+        if not route or route.startswith('/^') or '(?' in route:
+            return None
+        names = _PARAMETER.findall(route)
+        if any(not self.values.get(name) or name not in params
+               for name in names):
+            return None
+
+        def value(match):
+            choices = self.values[match['name']]
+            return str(choices[int(params[match['name']], 16) % len(choices)])
+
+        return _PARAMETER.sub(value, route)
+
+
+def replayable(records, route_values):
+    """Записи безопасных запросов с восстановленным адресом."""
+    for record in records:
+        if record.get('method') not in SAFE_METHODS:
+            continue
+        path = route_values.path(record)
+        if path is not None:
+            yield {**record, 'path': path}
+
+
+class LatencyStats:
+
+    def __init__(self):
+        self.durations = []
+        self.statuses = {}
+        self.errors = 0
+
+    def add(self, duration, status):
+        self.durations.append(duration)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def add_error(self):
+        self.errors += 1
+
+    def merge(self, other):
+        self.durations.extend(other.durations)
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.errors += other.errors
+
+    def histogram(self):
+        buckets = {f'<={bound}ms': 0 for bound in LATENCY_BUCKETS_MS}
+        buckets['>5000ms'] = 0
+        for duration in self.durations:
+            ms = duration * 1000
+            for bound in LATENCY_BUCKETS_MS:
+                if ms <= bound:
+                    buckets[f'<={bound}ms'] += 1
+                    break
+            else:
+                buckets['>5000ms'] += 1
+        return buckets
+
+    def percentile(self, percent):
+        if not self.durations:
+            return None
+        ordered = sorted(self.durations)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+        return round(ordered[index] * 1000, 3)
+
+    def summary(self, elapsed):
+        total = len(self.durations) + self.errors
+        server_errors = sum(
+            count for status, count in self.statuses.items()
+            if status >= 500)
+        return {
+            'requests': total,
+            'seconds': round(elapsed, 3),
+            'throughput_rps': round(total / elapsed, 1) if elapsed else None,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'error_rate': round(
+                (server_errors + self.errors) / total, 4) if total else 0,
+            'exceptions': self.errors,
+            'statuses': {
+                str(status): count
+                for status, count in sorted(self.statuses.items())},
+            'histogram': self.histogram(),
+        }
+
+
+def replay(records, client_for_user):
+    """Проигрывает записи из replayable() и возвращает LatencyStats.
+
+    client_for_user(alias) возвращает WSGIClient для псевдонима
+    пользователя из записи.
+    """
+    stats = LatencyStats()
+    for record in records:
+        client = client_for_user(record.get('user'))
+        started = time.perf_counter()
+        try:
+            status = client.request(record['method'], record['path'])
+        except Exception:
+            stats.add_error()
+            continue
+        stats.add(time.perf_counter() - started, status)
+    return stats
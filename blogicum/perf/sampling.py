@@ -0,0 +1,247 @@
+import atexit
+import json
+import logging
+import os
+import shutil
+import signal
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from html import escape
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger('perf.sampling')
+
+MAX_STACK_DEPTH = 64
+IDLE_LABEL = None
+
+
+def _frame_name(code):
+    return (f'{code.co_name} ({Path(code.co_filename).name}:'
+            f'{code.co_firstlineno})')
+
+
+def folded_stack(frame):
+    """Стек в свёрнутом формате flamegraph: от корня к листу через ';'."""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """Статистический профилировщик на таймере SIGPROF.
+
+    По сигналу снимает стеки всех потоков, которые сейчас обрабатывают
+    запрос, и копит их по имени URL. Накопленное периодически сбрасывается
+    в файлы окна SAMPLING_WINDOW, общие для всех воркеров.
+    """
+
+    def __init__(self):
+        self.labels = {}
+        self.counts = Counter()
+        self.started = False
+        self._flushed_at = time.monotonic()
+
+    def start(self, interval):
+        if self.started:
+            return
+        if threading.current_thread() is not threading.main_thread():
+            logger.warning('Сэмплирующий профилировщик запускается только '
+                           'из главного потока.')
+            return
+        signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, interval, interval)
+        atexit.register(self._shutdown)
+        self.started = True
+
+    def stop(self):
+        if self.started:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, signal.SIG_DFL)
+            self.started = False
+
+    def _shutdown(self):
+        # таймер останавливается до завершения интерпретатора, иначе
+        # SIGPROF с обработчиком по умолчанию завершит процесс
+        self.stop()
+        self.flush(force=True)
+
+    def _sample(self, signum, frame):
+        frames = sys._current_frames()
+        for thread_id, label in list(self.labels.items()):
+            thread_frame = frames.get(thread_id)
+            if thread_frame is not None:
+                self.counts[(label, folded_stack(thread_frame))] += 1
+
+    def label(self, value):
+        """Помечает текущий поток именем URL; None — поток простаивает."""
+        thread_id = threading.get_ident()
+        if value is IDLE_LABEL:
+            self.labels.pop(thread_id, None)
+        else:
+            self.labels[thread_id] = value
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._flushed_at < (
+                settings.SAMPLING_FLUSH_INTERVAL):
+            return
+        self._flushed_at = now
+        # обработчик сигнала пишет в self.counts, поэтому счётчик
+        # подменяется целиком: новые сэмплы попадут в следующий сброс.
+        # Обработчик мог взять старый счётчик до подмены, поэтому он
+        # читается снимком: list() по элементам словаря выполняется
+        # одной операцией и не прерывается сигналом
+        counts, self.counts = self.counts, Counter()
+        items = list(counts.items())
+        if not items:
+            return
+        timestamp = time.time()
+        directory = window_dir(timestamp)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{os.getpid()}.folded'
+        with open(path, 'a', encoding='utf-8') as file:
+            for (label, stack), count in items:
+                file.write(f'{label}\t{stack} {count}\n')
+        prune_windows(timestamp)
+
+
+def window_dir(timestamp):
+    window = int(timestamp // settings.SAMPLING_WINDOW)
+    return Path(settings.SAMPLING_DIR) / str(window)
+
+
+def prune_windows(timestamp):
+    """Удаляет окна старше SAMPLING_RETENTION секунд."""
+    oldest = int((timestamp - settings.SAMPLING_RETENTION)
+                 // settings.SAMPLING_WINDOW)
+    for directory in Path(settings.SAMPLING_DIR).iterdir():
+        if directory.name.isdigit() and int(directory.name) < oldest:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def load_stacks(since, until=None, url_name=None):
+    """Складывает свёрнутые стеки всех воркеров за интервал времени."""
+    until = until or time.time()
+    first = int(since // settings.SAMPLING_WINDOW)
+    last = int(until // settings.SAMPLING_WINDOW)
+    stacks = {}
+    root = Path(settings.SAMPLING_DIR)
+    if not root.exists():
+        return stacks
+    for directory in root.iterdir():
+        if not directory.name.isdigit():
+            continue
+        if not first <= int(directory.name) <= last:
+            continue
+        for path in directory.glob('*.folded'):
+            with open(path, encoding='utf-8') as file:
+                for line in file:
+                    label, _, rest = line.rstrip('\n').partition('\t')
+                    stack, _, count = rest.rpartition(' ')
+                    if url_name and label != url_name:
+                        continue
+                    per_url = stacks.setdefault(label, Counter())
+                    per_url[stack] += int(count)
+    return stacks
+
+
+def to_speedscope(stacks):
+    frames = []
+    frame_index = {}
+    profiles = []
+    for label, counter in sorted(stacks.items()):
+        samples = []
+        weights = []
+        for stack, count in counter.items():
+            indexes = []
+            for name in stack.split(';'):
+                if name not in frame_index:
+                    frame_index[name] = len(frames)
+                    frames.append({'name': name})
+                indexes.append(frame_index[name])
+            samples.append(indexes)
+            weights.append(count)
+        profiles.append({
+            'type': 'sampled',
+            'name': label,
+            'unit': 'none',
+            'startValue': 0,
+            'endValue': sum(weights),
+            'samples': samples,
+            'weights': weights,
+        })
+    return json.dumps({
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': frames},
+        'profiles': profiles,
+        'name': 'blogicum',
+        'exporter': 'blogicum perf.sampling',
+    })
+
+
+def _tree(stacks):
+    root = {'name': 'all', 'value': 0, 'children': {}}
+    for label, counter in stacks.items():
+        for stack, count in counter.items():
+            node = root
+            node['value'] += count
+            for name in [label] + stack.split(';'):
+                node = node['children'].setdefault(
+                    name, {'name': name, 'value': 0, 'children': {}})
+                node['value'] += count
+    return root
+
+
+def to_svg(stacks, width=1200, row_height=16):
+    """Простой SVG-flamegraph: ширина блока пропорциональна сэмплам."""
+    root = _tree(stacks)
+    rects = []
+    max_depth = 0
+
+    def walk(node, x, depth):
+        nonlocal max_depth
+        max_depth = max(max_depth, depth)
+        node_width = width * node['value'] / root['value']
+        rects.append((x, depth, node_width, node))
+        child_x = x
+        for child in sorted(node['children'].values(),
+                            key=lambda item: item['name']):
+            walk(child, child_x, depth + 1)
+            child_x += width * child['value'] / root['value']
+
+    if root['value']:
+        walk(root, 0, 0)
+    height = (max_depth + 1) * row_height
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" '
+        f'height="{height}" font-family="monospace" font-size="11">'
+    ]
+    for x, depth, rect_width, node in rects:
+        if rect_width < 0.5:
+            continue
+        y = height - (depth + 1) * row_height
+        name = escape(node['name'])
+        hue = 20 + zlib.crc32(node['name'].encode()) % 40
+        parts.append(
+            f'<g><title>{name} ({node["value"]})</title>'
+            f'<rect x="{x:.2f}" y="{y}" width="{rect_width:.2f}" '
+            f'height="{row_height - 1}" fill="hsl({hue},90%,60%)"/>'
+        )
+        if rect_width > 40:
+            chars = int(rect_width / 7)
+            parts.append(
+                f'<text x="{x + 2:.2f}" y="{y + row_height - 4}">'
+                f'{escape(node["name"][:chars])}</text>')
+        parts.append('</g>')
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+
+sampler = Sampler()
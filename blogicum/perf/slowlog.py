@@ -0,0 +1,206 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from logging.handlers import MemoryHandler, RotatingFileHandler
+from pathlib import Path
+
+from django.conf import settings
+
+from .queries import PERF_DIR, sql_shape, template_origin
+
+# записей в буфере до сброса на диск
+BUFFER_CAPACITY = 100
+STACK_DEPTH = 5
+
+_view = ContextVar('perf_slow_query_view', default=None)
+
+
+def fingerprint(shape):
+    return hashlib.sha1(shape.encode()).hexdigest()[:12]
+
+
+def short_stack(frame, depth=STACK_DEPTH):
+    """Ближайшие вызовы из кода проекта: 'файл:строка функция'."""
+    base_dir = str(settings.BASE_DIR)
+    stack = []
+    while frame is not None and len(stack) < depth:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base_dir) and not filename.startswith(
+                PERF_DIR):
+            stack.append(f'{Path(filename).relative_to(base_dir)}:'
+                         f'{frame.f_lineno} {frame.f_code.co_name}')
+        frame = frame.f_back
+    return stack
+
+
+def set_view(view_name):
+    return _view.set(view_name)
+
+
+def reset_view(token):
+    _view.reset(token)
+
+
+class TimedMemoryHandler(MemoryHandler):
+    """Буфер записей, который сбрасывается по заполнении или по времени.
+
+    Время проверяется при каждой новой записи; остаток буфера
+    сбрасывается при выходе из процесса.
+    """
+
+    def __init__(self, capacity, interval, target):
+        super().__init__(capacity, flushLevel=logging.CRITICAL,
+                         target=target)
+        self.interval = interval
+        self._flushed_at = time.monotonic()
+
+    def shouldFlush(self, record):  # noqa: N802
+        return (super().shouldFlush(record)
+                or time.monotonic() - self._flushed_at >= self.interval)
+
+    def flush(self):
+        super().flush()
+        self._flushed_at = time.monotonic()
+
+
+class SlowQueryLog:
+    """Обёртка execute_wrapper: медленные запросы и случайная выборка.
+
+    Каждый процесс пишет в свой файл с ротацией, записи буферизуются
+    и сбрасываются пачками не реже раза в flush_interval секунд.
+    """
+
+    def __init__(self, directory, threshold, sample_rate,
+                 max_bytes, backups, flush_interval=5):
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.logger = logging.getLogger(f'perf.slow_queries.{id(self)}')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        self.target = RotatingFileHandler(
+            Path(directory) / f'{os.getpid()}.log',
+            maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        self.handler = TimedMemoryHandler(
+            BUFFER_CAPACITY, flush_interval, self.target)
+        self.logger.addHandler(self.handler)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            if duration >= self.threshold:
+                self.write(sql, duration, many, context, sampled=False)
+            elif random.random() < self.sample_rate:
+                self.write(sql, duration, many, context, sampled=True)
+
+    def write(self, sql, duration, many, context, sampled):
+        shape = sql_shape(sql)
+        frame = sys._getframe(2)
+        record = {
+            'time': time.time(),
+            'fingerprint': fingerprint(shape),
+            'shape': shape,
+            'duration_ms': round(duration * 1000, 3),
+            # выборочная запись представляет 1 / sample_rate запросов
+            'sampled': sampled,
+            'weight': 1 / self.sample_rate if sampled else 1,
+            'many': many,
+            'database': context['connection'].alias,
+            'view': _view.get(),
+            'template': template_origin(frame),
+            'stack': short_stack(frame),
+        }
+        self.logger.info(json.dumps(record, ensure_ascii=False))
+
+    def flush(self):
+        self.handler.flush()
+
+    def close(self):
+        self.handler.close()
+        self.target.close()
+
+
+_log = None
+
+
+def get_log():
+    global _log
+    if _log is None:
+        _log = SlowQueryLog(
+            settings.SLOW_QUERY_LOG_DIR,
+            settings.SLOW_QUERY_THRESHOLD,
+            settings.SLOW_QUERY_SAMPLE_RATE,
+            settings.SLOW_QUERY_LOG_MAX_BYTES,
+            settings.SLOW_QUERY_LOG_BACKUPS,
+            settings.SLOW_QUERY_FLUSH_INTERVAL)
+        atexit.register(_log.flush)
+    return _log
+
+
+def install_wrapper(sender, connection, **kwargs):
+    """Приёмник connection_created: подключает журнал к соединению."""
+    log = get_log()
+    # Django вызывает сигнал при каждом переподключении того же объекта
+    if log not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log)
+
+
+def load_records(directory, since=None):
+    for path in sorted(Path(directory).glob('*.log*')):
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if since is None or record['time'] >= since:
+                    yield record
+
+
+def _weighted_percentile(samples, percent):
+    samples = sorted(samples)
+    total = sum(weight for _, weight in samples)
+    seen = 0
+    for duration, weight in samples:
+        seen += weight
+        if seen >= total * percent / 100:
+            return duration
+    return 0
+
+
+def summarize(records):
+    """Сводка по отпечаткам: оценка числа, общего времени и p95, мс."""
+    groups = defaultdict(lambda: {
+        'count': 0, 'total_ms': 0, 'slow': 0, 'samples': [],
+        'views': defaultdict(int)})
+    for record in records:
+        group = groups[record['fingerprint']]
+        group['shape'] = record['shape']
+        weight = record['weight']
+        group['count'] += weight
+        group['total_ms'] += record['duration_ms'] * weight
+        group['slow'] += not record['sampled']
+        group['samples'].append((record['duration_ms'], weight))
+        group['views'][record['view'] or '<вне запроса>'] += weight
+    return [
+        {
+            'fingerprint': key,
+            'shape': group['shape'],
+            'count': round(group['count']),
+            'slow': group['slow'],
+            'total_ms': round(group['total_ms'], 3),
+            'p95_ms': _weighted_percentile(group['samples'], 95),
+            'views': dict(group['views']),
+        }
+        for key, group in groups.items()
+    ]
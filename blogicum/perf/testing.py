@@ -0,0 +1,32 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .queries import record_queries
+
+
+@contextmanager
+def assert_query_budget(budget, threshold=None):
+    """Проверяет, что блок кода укладывается в бюджет запросов к БД.
+
+    Также падает, если одна форма запроса повторилась не менее
+    threshold раз (признак N+1).
+    """
+    threshold = threshold or settings.QUERY_REPEAT_THRESHOLD
+    with record_queries() as recorder:
+        yield recorder
+    assert len(recorder) <= budget, (
+        f'Превышен бюджет запросов: {len(recorder)} > {budget}\n'
+        + recorder.report(threshold)
+    )
+    repeated = recorder.repeated_shapes(threshold)
+    assert not repeated, (
+        'Обнаружены повторяющиеся запросы (N+1):\n'
+        + recorder.report(threshold)
+    )
+
+
+def assert_url_query_budget(client, url, budget, method='get', **kwargs):
+    with assert_query_budget(budget):
+        response = getattr(client, method)(url, **kwargs)
+    return response
@@ -0,0 +1,146 @@
+import functools
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.base import Template
+from django.utils.module_loading import import_string
+
+from .queries import execute_wrapper
+
+CACHE_METHODS = (
+    'get', 'set', 'add', 'delete', 'touch', 'has_key', 'incr', 'decr',
+    'get_many', 'set_many', 'delete_many', 'get_or_set',
+)
+
+_current = ContextVar('perf_request_timings', default=None)
+_installed = False
+_install_lock = threading.Lock()
+
+
+class RequestTimings:
+    """Время по фазам обработки одного запроса, в секундах."""
+
+    def __init__(self):
+        self.phases = defaultdict(float)
+        self.counts = Counter()
+        self.templates = defaultdict(float)
+        self._template_depth = 0
+        self._cache_depth = 0
+
+    def add(self, phase, duration):
+        self.phases[phase] += duration
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    """Собирает время фаз; вложенные вызовы используют внешний сбор."""
+    timings = current()
+    if timings is not None:
+        yield timings
+        return
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        with execute_wrapper(db_wrapper):
+            yield timings
+    finally:
+        _current.reset(token)
+
+
+def db_wrapper(execute, sql, params, many, context):
+    timings = current()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add('db', time.perf_counter() - started)
+        timings.counts['db'] += 1
+
+
+def _timed_template_render(render):
+
+    @functools.wraps(render)
+    def wrapper(self, context):
+        timings = current()
+        if timings is None:
+            return render(self, context)
+        started = time.perf_counter()
+        timings._template_depth += 1
+        try:
+            return render(self, context)
+        finally:
+            timings._template_depth -= 1
+            duration = time.perf_counter() - started
+            # {% include %} и {% extends %} рендерятся вложенно:
+            # общее время шаблонов считается только по внешнему вызову
+            if timings._template_depth == 0:
+                timings.add('template', duration)
+            name = self.origin.template_name if self.origin else None
+            timings.templates[name or '<string>'] += duration
+
+    return wrapper
+
+
+def _timed_cache_method(method):
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        timings = current()
+        if timings is None:
+            return method(self, *args, **kwargs)
+        started = time.perf_counter()
+        timings._cache_depth += 1
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            timings._cache_depth -= 1
+            if timings._cache_depth == 0:
+                timings.add('cache', time.perf_counter() - started)
+
+    return wrapper
+
+
+def install():
+    """Оборачивает рендеринг шаблонов и бэкенды кэша (один раз)."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        Template.render = _timed_template_render(Template.render)
+        backends = {
+            import_string(config['BACKEND'])
+            for config in settings.CACHES.values()
+        }
+        for backend in backends:
+            for name in CACHE_METHODS:
+                setattr(backend, name,
+                        _timed_cache_method(getattr(backend, name)))
+        _installed = True
+
+
+def _metric_name(name):
+    return re.sub(r'[^A-Za-z0-9_-]', '-', name)
+
+
+def server_timing_header(timings):
+    """Значение заголовка Server-Timing, длительности в миллисекундах."""
+    metrics = [
+        f'{phase};dur={duration * 1000:.2f}'
+        for phase, duration in timings.phases.items()
+    ]
+    for name, duration in timings.templates.items():
+        metrics.append(
+            f'tpl-{_metric_name(name)};dur={duration * 1000:.2f};'
+            f'desc="{name}"')
+    return ', '.join(metrics)
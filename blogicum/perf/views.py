@@ -0,0 +1,54 @@
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.contrib.sessions.models import Session
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils import timezone
+
+from . import metrics
+
+User = get_user_model()
+
+
+def _state_gauges():
+    now = timezone.now()
+    gauges = [(
+        metrics.active_users,
+        User.objects.filter(
+            last_login__gte=now - timedelta(
+                seconds=settings.METRICS_ACTIVE_USER_WINDOW)).count(),
+    )]
+    # у сессий в подписанных cookie нет серверного хранилища
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    if issubclass(store, DBStore):
+        gauges.append((
+            metrics.active_sessions,
+            Session.objects.filter(expire_date__gt=now).count(),
+        ))
+    return gauges
+
+
+def _metrics_allowed(request):
+    if request.user.is_staff:
+        return True
+    if settings.METRICS_TOKEN and constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            f'Bearer {settings.METRICS_TOKEN}'):
+        return True
+    return (settings.METRICS_ALLOW_INTERNAL_IPS
+            and request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS)
+
+
+def metrics_view(request):
+    """Возвращает метрики всех процессов в формате Prometheus."""
+    if not _metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(
+        metrics.registry.exposition(_state_gauges()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -1,6 +1,7 @@
 import os
 import re
 import time
+from copy import deepcopy
 from http import HTTPStatus
 from inspect import getsource
 from pathlib import Path
@@ -19,12 +20,13 @@ from typing import (
 import pytest
 from django.apps import apps
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models import Model, Field
 from django.forms import BaseForm
 from django.http import HttpResponse
 from django.test import override_settings
 from django.test.client import Client
-from mixer.backend.django import mixer as _mixer
+from mixer.backend.django import Mixer
 
 N_PER_FIXTURE = 3
 N_PER_PAGE = 10
@@ -41,6 +43,41 @@ def enable_debug_false():
         yield
 
 
+@pytest.fixture(autouse=True)
+def isolate_cache_dir(tmp_path_factory):
+    # общий файловый кэш и каталоги perf не должны копиться в
+    # blogicum/cache, а метрики — сбрасываться туда при выходе
+    from django.conf import settings
+
+    from perf.metrics import registry
+
+    cache_dir = tmp_path_factory.mktemp('cache')
+    caches = deepcopy(settings.CACHES)
+    caches['shared']['LOCATION'] = cache_dir / 'shared'
+    with override_settings(
+            CACHE_DIR=cache_dir,
+            CACHES=caches,
+            METRICS_DIR=cache_dir / 'metrics',
+            PROFILE_DIR=cache_dir / 'profiles',
+            SAMPLING_DIR=cache_dir / 'samples',
+            MEMORY_PROFILER_DIR=cache_dir / 'memory',
+            SITEMAP_DIR=cache_dir / 'sitemaps',
+            SLOW_QUERY_LOG_DIR=cache_dir / 'slow_queries'):
+        yield cache_dir
+    registry._values.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_local_caches(isolate_cache_dir):
+    # кэши сбрасываются после фиксации, а транзакция теста откатывается,
+    # и id объектов в следующем тесте повторяются
+    from blog.caches import category_cache, location_cache
+    from core.auth import user_cache
+
+    for cache in (user_cache, category_cache, location_cache):
+        cache.invalidate()
+
+
 class SafeImportFromContextManager:
     def __init__(
             self,
@@ -96,6 +133,18 @@ pytest_plugins = [
 ]
 
 
+class AtomicMixer(Mixer):
+    # события core.outbox, в том числе пользователя из django.contrib.auth,
+    # пишутся только в транзакции сохранения
+
+    def postprocess(self, target):
+        with transaction.atomic():
+            return super().postprocess(target)
+
+
+_mixer = AtomicMixer()
+
+
 @pytest.fixture
 def mixer():
     return _mixer
@@ -0,0 +1,114 @@
+from datetime import timedelta
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from blog.models import Post
+
+
+def _collect(client, url):
+    results, pages = [], 0
+    while url:
+        data = client.get(url).json()
+        results.extend(data['results'])
+        url = data['next']
+        pages += 1
+    return results, pages
+
+
+@pytest.mark.django_db
+def test_posts_cursor_pagination_matches_visibility(
+        client, many_posts_with_published_locations, future_posts,
+        unpublished_posts_with_published_locations):
+    posts, pages = _collect(client, '/api/posts/?limit=3')
+    ids = [post['id'] for post in posts]
+    expected = sorted(
+        many_posts_with_published_locations,
+        key=lambda post: (post.pub_date, post.pk), reverse=True)
+    assert ids == [post.pk for post in expected], (
+        'Убедитесь, что API отдаёт те же опубликованные посты, что и '
+        'лента, без пропусков и повторов между страницами.'
+    )
+    assert pages > 1
+
+
+@pytest.mark.django_db
+def test_cursor_keeps_microseconds(
+        client, many_posts_with_published_locations):
+    first, second = many_posts_with_published_locations[:2]
+    pub_date = timezone.now().replace(microsecond=500500) - timedelta(days=1)
+    Post.objects.filter(pk=first.pk).update(pub_date=pub_date)
+    Post.objects.filter(pk=second.pk).update(
+        pub_date=pub_date - timedelta(microseconds=100))
+    posts, _ = _collect(client, '/api/posts/?limit=1&fields=id')
+    ids = [post['id'] for post in posts]
+    assert ids.index(second.pk) == ids.index(first.pk) + 1, (
+        'Убедитесь, что курсор не теряет посты, опубликованные в ту же '
+        'миллисекунду.'
+    )
+
+
+@pytest.mark.django_db
+def test_author_sees_own_unpublished_posts(
+        user_client, unpublished_posts_with_published_locations):
+    post = unpublished_posts_with_published_locations[0]
+    response = user_client.get(f'/api/posts/{post.pk}/')
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['id'] == post.pk
+
+
+@pytest.mark.django_db
+def test_unpublished_post_is_hidden(
+        client, unpublished_posts_with_published_locations):
+    post = unpublished_posts_with_published_locations[0]
+    for url in (f'/api/posts/{post.pk}/', f'/api/posts/{post.pk}/comments/'):
+        assert client.get(url).status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_sparse_fields_and_etag(client, many_posts_with_published_locations):
+    response = client.get('/api/posts/?fields=id,title')
+    assert set(response.json()['results'][0]) == {'id', 'title'}
+    with CaptureQueriesContext(connection) as queries:
+        not_modified = client.get(
+            '/api/posts/?fields=id,title',
+            HTTP_IF_NONE_MATCH=response['ETag'])
+    assert not_modified.status_code == HTTPStatus.NOT_MODIFIED
+    assert len(queries) == 1, (
+        'Убедитесь, что страница API читается одним запросом к БД.'
+    )
+    assert client.get(
+        '/api/posts/?fields=password').status_code == HTTPStatus.BAD_REQUEST
+    assert client.get(
+        '/api/posts/?cursor=xyz').status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_comments_and_references(
+        client, mixer, user, published_locations,
+        many_posts_with_published_locations):
+    post = many_posts_with_published_locations[0]
+    comment = mixer.blend('blog.Comment', post=post, author=user)
+    comments = client.get(f'/api/posts/{post.pk}/comments/').json()
+    assert [item['id'] for item in comments['results']] == [comment.pk]
+    categories = client.get('/api/categories/').json()['results']
+    assert post.category.slug in {item['slug'] for item in categories}
+    locations = client.get('/api/locations/').json()['results']
+    assert len(locations) == len(published_locations)
+
+
+@pytest.mark.django_db
+def test_unpublished_location_name_is_hidden(
+        client, mixer, post_with_published_location):
+    post = post_with_published_location
+    url = f'/api/posts/{post.pk}/?fields=id,location'
+    assert client.get(url).json()['location'] == post.location.name
+    post.location = mixer.blend('blog.Location', is_published=False)
+    post.save()
+    assert client.get(url).json()['location'] is None, (
+        'Убедитесь, что API не раскрывает название снятого с публикации '
+        'места.'
+    )
@@ -0,0 +1,127 @@
+import asyncio
+from http import HTTPStatus
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+
+from core import pool
+from perf import middleware as perf_middleware
+from perf.benchmarks import ASGIClient, read_views
+
+# представления читают БД из пула потоков, поэтому данные теста
+# должны быть закоммичены
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def _get_both(client, url):
+    with read_views(use_async=False):
+        sync_response = client.get(url)
+    with read_views(use_async=True):
+        async_response = client.get(url)
+    return sync_response, async_response
+
+
+def _page(response):
+    page = response.context['page_obj']
+    return [post.pk for post in page], page.paginator.count
+
+
+@pytest.mark.parametrize('query', ['', '?page=2', '?page=last'])
+def test_index_matches_sync_view(
+        client, many_posts_with_published_locations, query):
+    sync_response, async_response = _get_both(client, f'/{query}')
+    assert async_response.status_code == HTTPStatus.OK
+    assert _page(async_response) == _page(sync_response), (
+        'Убедитесь, что асинхронная главная страница показывает те же '
+        'посты и то же их число, что и синхронная.'
+    )
+
+
+def test_profile_and_category_match_sync_views(
+        user_client, user, many_posts_with_published_locations,
+        unpublished_posts_with_published_locations):
+    category = many_posts_with_published_locations[0].category
+    for url in (f'/profile/{user.username}/', '/profile/',
+                f'/category/{category.slug}/'):
+        sync_response, async_response = _get_both(user_client, url)
+        assert async_response.status_code == HTTPStatus.OK, url
+        assert _page(async_response) == _page(sync_response), (
+            f'Убедитесь, что асинхронная страница `{url}` совпадает '
+            'с синхронной.'
+        )
+
+
+@pytest.mark.parametrize('url', [
+    '/?page=100', '/?page=abc', '/category/missing/', '/profile/missing/',
+    '/posts/100500/',
+])
+def test_not_found(client, many_posts_with_published_locations, url):
+    with read_views(use_async=True):
+        response = client.get(url)
+    assert response.status_code == HTTPStatus.NOT_FOUND, (
+        f'Убедитесь, что асинхронная страница `{url}` отвечает 404.'
+    )
+
+
+def test_post_detail_hides_unpublished_post(
+        client, user_client, unpublished_posts_with_published_locations):
+    post = unpublished_posts_with_published_locations[0]
+    with read_views(use_async=True):
+        assert client.get(f'/posts/{post.pk}/').status_code == (
+            HTTPStatus.NOT_FOUND)
+        response = user_client.get(f'/posts/{post.pk}/')
+    assert response.status_code == HTTPStatus.OK, (
+        'Убедитесь, что автор видит свой неопубликованный пост.'
+    )
+
+
+def test_post_detail_served_over_asgi(
+        mixer, user, user_client, published_category):
+    post = mixer.blend('blog.Post', category=published_category,
+                       is_published=True, pub_date='2020-01-01 00:00Z')
+    mixer.blend('blog.Comment', post=post, author=user,
+                text='Комментарий под ASGI')
+    with read_views(use_async=True):
+        status = asyncio.run(
+            ASGIClient(user).request('get', f'/posts/{post.pk}/'))
+    assert status == HTTPStatus.OK, (
+        'Убедитесь, что страница поста работает под ASGI.'
+    )
+    with read_views(use_async=True):
+        response = user_client.get(f'/posts/{post.pk}/')
+    assert 'Комментарий под ASGI' in response.content.decode()
+
+
+def test_pool_closes_old_connections(monkeypatch):
+    calls = []
+    monkeypatch.setattr(pool, 'close_old_connections',
+                        lambda: calls.append(True))
+    assert asyncio.run(pool.in_pool(lambda: 42)()) == 42
+    assert len(calls) == 2, (
+        'Устаревшие соединения должны закрываться до и после каждого '
+        'вызова в пуле.'
+    )
+
+
+@pytest.mark.parametrize('name, setting', [
+    ('QueryInstrumentationMiddleware', 'QUERY_INSTRUMENTATION'),
+    ('ServerTimingMiddleware', 'SERVER_TIMING'),
+    ('MetricsMiddleware', 'METRICS_ENABLED'),
+    ('ProfilerMiddleware', 'PROFILER_ENABLED'),
+    ('SlowQueryLogMiddleware', 'SLOW_QUERY_LOG'),
+])
+def test_perf_middleware_stays_async(settings, rf, name, setting):
+    async def view(request):
+        return HttpResponse('ok')
+
+    setattr(settings, setting, True)
+    middleware = getattr(perf_middleware, name)(view)
+    assert asyncio.iscoroutinefunction(middleware), (
+        f'Убедитесь, что {name} не переводит асинхронный стек в поток.'
+    )
+    request = rf.get('/')
+    request.resolver_match = None
+    request.user = AnonymousUser()
+    response = asyncio.run(middleware(request))
+    assert response.content == b'ok'
@@ -0,0 +1,28 @@
+from io import StringIO
+
+import pytest
+
+from perf.benchmarks import _percentile
+from perf.management.commands.run_benchmarks import Command
+
+
+def test_percentile_of_small_samples():
+    assert _percentile([0.5], 95) == 0.5
+    assert _percentile([], 50) == 0
+
+
+@pytest.mark.django_db
+def test_benchmark_smoke():
+    results = Command(stderr=StringIO()).measure(20, {
+        'seed': 0,
+        'detail_comments': 1,
+        'iterations': 1,
+        'only': ['index page 1', 'add_comment'],
+    })
+    assert [result['scenario'] for result in results] == [
+        'index page 1', 'add_comment'], (
+        'Сценарии бенчмарка должны выполняться и при одной итерации.'
+    )
+    for result in results:
+        assert result['p50_ms'] == result['p95_ms'] > 0
+        assert result['queries_per_request'] > 0
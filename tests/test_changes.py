@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.models import ChangeLog
+from core.pagination import encode_cursor
+from blog.models import Post
+
+
+def _sync(client, token):
+    return client.get('/api/changes/', {'since': token}).json()
+
+
+@pytest.mark.django_db
+def test_changes_since_token(
+        client, mixer, user, published_category,
+        many_posts_with_published_locations):
+    token = client.get('/api/changes/').json()['next']
+    assert _sync(client, token)['posts'] == []
+
+    post, removed = many_posts_with_published_locations[:2]
+    post.title = 'Изменённый заголовок'
+    post.save()
+    comment = mixer.blend('blog.Comment', post=post, author=user)
+    removed_id = removed.pk
+    removed.delete()
+
+    with CaptureQueriesContext(connection) as queries:
+        data = _sync(client, token)
+    assert [item['title'] for item in data['posts']] == [
+        'Изменённый заголовок']
+    assert [item['id'] for item in data['comments']] == [comment.pk]
+    assert data['deleted']['posts'] == [removed_id]
+    assert len(queries) <= 4, (
+        'Убедитесь, что синхронизация не зависит от размера базы.'
+    )
+
+    assert _sync(client, data['next'])['posts'] == []
+
+
+@pytest.mark.django_db
+def test_hidden_posts_are_reported_as_deleted(
+        client, published_category, many_posts_with_published_locations):
+    token = client.get('/api/changes/').json()['next']
+    published_category.is_published = False
+    published_category.save()
+    data = _sync(client, token)
+    assert data['posts'] == []
+    assert set(data['deleted']['posts']) == {
+        post.pk for post in many_posts_with_published_locations}
+
+
+@pytest.mark.django_db
+def test_scheduled_post_appears_when_published(
+        client, user, published_category):
+    synced_at = timezone.now() - timedelta(hours=1)
+    token = encode_cursor([0, synced_at])
+    # пост, отложенный до синхронизации: в журнал его сохранение
+    # попало раньше, чем он стал видимым
+    Post.objects.bulk_create([Post(
+        title='Отложенный', text='Текст', author=user,
+        category=published_category,
+        pub_date=synced_at + timedelta(minutes=30))])
+    data = _sync(client, token)
+    assert [item['title'] for item in data['posts']] == ['Отложенный']
+
+
+def test_invalid_token(client):
+    assert client.get(
+        '/api/changes/', {'since': 'broken'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_deleted_drafts_of_other_users_are_not_reported(
+        client, user_client, user, mixer, published_category):
+    draft = mixer.blend('blog.Post', author=user, is_published=False,
+                        category=published_category)
+    token = client.get('/api/changes/').json()['next']
+    draft_id = draft.pk
+    draft.delete()
+    assert _sync(client, token)['deleted']['posts'] == [], (
+        'Убедитесь, что клиент не узнаёт id чужих неопубликованных постов.'
+    )
+    assert _sync(user_client, token)['deleted']['posts'] == [draft_id]
+
+
+@pytest.mark.django_db
+def test_reference_edits_are_logged_only_when_visible_fields_change(
+        client, published_category, many_posts_with_published_locations):
+    token = client.get('/api/changes/').json()['next']
+    logged = ChangeLog.objects.count()
+    published_category.title = 'Новый заголовок'
+    published_category.save()
+    assert ChangeLog.objects.count() == logged, (
+        'Правка категории, не меняющая slug и публикацию, не должна '
+        'попадать в журнал для каждого поста.'
+    )
+
+    published_category.slug = 'new-slug'
+    with CaptureQueriesContext(connection) as queries:
+        published_category.save()
+    assert ChangeLog.objects.count() == logged + len(
+        many_posts_with_published_locations)
+    assert len(queries) <= 4, (
+        'Убедитесь, что записи о постах категории пишутся одним запросом.'
+    )
+    assert {post['category'] for post in _sync(client, token)['posts']} == {
+        'new-slug'}
+
+
+@pytest.mark.django_db
+def test_username_change_is_logged(client, user, mixer,
+                                   post_with_published_location):
+    comment = mixer.blend('blog.Comment', author=user,
+                          post=post_with_published_location)
+    token = client.get('/api/changes/').json()['next']
+    user.username = 'renamed'
+    user.save()
+    data = _sync(client, token)
+    assert [post['author'] for post in data['posts']] == ['renamed']
+    assert [item['id'] for item in data['comments']] == [comment.pk]
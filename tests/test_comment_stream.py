@@ -0,0 +1,244 @@
+import asyncio
+from http import HTTPStatus
+
+import pytest
+from django.db.models.signals import post_save
+from django.test import override_settings
+
+from blog.models import Comment
+from blog.signals import publish_new_comment
+from blogicum.asgi import application
+from core.pool import in_pool
+
+# поток читает БД из пула потоков, поэтому данные теста должны быть
+# закоммичены
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+class StreamClient:
+    """Подключение к ASGI-приложению, которое держится до disconnect()."""
+
+    def __init__(self, path, headers=()):
+        path, _, query = path.partition('?')
+        self.scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': path,
+            'query_string': query.encode(),
+            'headers': list(headers),
+        }
+        self.messages = []
+        self.closed = asyncio.Event()
+
+    async def receive(self):
+        await self.closed.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        self.messages.append(message)
+
+    def connect(self):
+        self.task = asyncio.ensure_future(
+            application(self.scope, self.receive, self.send))
+
+    @property
+    def status(self):
+        return self.messages[0]['status'] if self.messages else None
+
+    @property
+    def body(self):
+        return b''.join(
+            message.get('body', b'') for message in self.messages
+        ).decode()
+
+    async def wait_until(self, condition, timeout=5):
+        async def poll():
+            while not condition():
+                await asyncio.sleep(0.01)
+        await asyncio.wait_for(poll(), timeout)
+
+    async def wait_for(self, text, timeout=5):
+        await self.wait_until(lambda: text in self.body, timeout)
+
+    async def subscribed(self):
+        # заголовки и начальная выборка отправляются после подписки
+        await self.wait_until(lambda: len(self.messages) >= 2)
+
+    async def disconnect(self):
+        self.closed.set()
+        await asyncio.wait_for(self.task, 5)
+
+
+def _create_comment(post, author, text):
+    return in_pool(Comment.objects.create)(
+        post=post, author=author, text=text)
+
+
+@pytest.fixture
+def post(mixer, published_category):
+    return mixer.blend('blog.Post', category=published_category,
+                       is_published=True, pub_date='2020-01-01 00:00Z')
+
+
+@override_settings(COMMENT_STREAM_POLL_INTERVAL=10)
+def test_new_comment_is_pushed_without_waiting_for_poll(post, user):
+    old = Comment.objects.create(post=post, author=user, text='Старый')
+
+    async def scenario():
+        stream = StreamClient(f'/posts/{post.pk}/comments/stream/'
+                              f'?after={old.pk}')
+        stream.connect()
+        await stream.subscribed()
+        comment = await _create_comment(post, user, 'Новый комментарий')
+        await stream.wait_for('Новый комментарий', timeout=1)
+        await stream.disconnect()
+        return stream, comment
+
+    stream, comment = asyncio.run(scenario())
+    assert stream.status == HTTPStatus.OK
+    assert f'id: {comment.pk}\nevent: comment\n' in stream.body
+    assert 'Старый' not in stream.body, (
+        'Убедитесь, что поток не повторяет комментарии до ?after=.'
+    )
+
+
+@override_settings(COMMENT_STREAM_POLL_INTERVAL=0.05)
+def test_comment_from_another_process_is_polled(post, user):
+    # без publish комментарий виден только через исходящие события,
+    # как если бы его сохранил другой процесс
+    post_save.disconnect(publish_new_comment, sender=Comment)
+    try:
+        async def scenario():
+            stream = StreamClient(f'/posts/{post.pk}/comments/stream/')
+            stream.connect()
+            await stream.subscribed()
+            await _create_comment(post, user, 'Из другого процесса')
+            await stream.wait_for('Из другого процесса')
+            await stream.disconnect()
+
+        asyncio.run(scenario())
+    finally:
+        post_save.connect(publish_new_comment, sender=Comment)
+
+
+def test_reconnect_resumes_from_last_event_id(post, user):
+    first, second, third = (
+        Comment.objects.create(post=post, author=user, text=f'Номер {i}')
+        for i in range(3))
+
+    async def scenario():
+        stream = StreamClient(
+            f'/posts/{post.pk}/comments/stream/',
+            headers=[(b'last-event-id', str(first.pk).encode())])
+        stream.connect()
+        await stream.wait_for('Номер 2')
+        await stream.disconnect()
+        return stream.body
+
+    body = asyncio.run(scenario())
+    assert 'Номер 0' not in body and 'Номер 1' in body, (
+        'Убедитесь, что при переподключении поток отдаёт комментарии '
+        'после Last-Event-ID.'
+    )
+
+
+@override_settings(COMMENT_STREAM_QUEUE_SIZE=1)
+def test_slow_reader_is_disconnected(post, user):
+    async def scenario():
+        stream = StreamClient(f'/posts/{post.pk}/comments/stream/')
+        blocked = asyncio.Event()
+
+        async def send(message):
+            stream.messages.append(message)
+            if len(stream.messages) > 2:
+                # клиент перестал читать
+                await blocked.wait()
+
+        stream.send = send
+        stream.connect()
+        await stream.subscribed()
+        for i in range(3):
+            await _create_comment(post, user, f'Поток {i}')
+        await asyncio.sleep(0.2)
+        blocked.set()
+        await asyncio.wait_for(stream.task, 5)
+        return stream
+
+    stream = asyncio.run(scenario())
+    assert stream.messages[-1] == {
+        'type': 'http.response.body', 'body': b''}, (
+        'Убедитесь, что поток медленного клиента закрывается.'
+    )
+
+
+def test_unpublished_post_is_not_streamed(mixer, user):
+    post = mixer.blend('blog.Post', is_published=False)
+
+    async def scenario():
+        stream = StreamClient(f'/posts/{post.pk}/comments/stream/')
+        stream.connect()
+        await asyncio.wait_for(stream.task, 5)
+        return stream.status
+
+    assert asyncio.run(scenario()) == HTTPStatus.NOT_FOUND
+
+
+@override_settings(COMMENT_STREAM=True)
+def test_detail_page_links_stream(client, post, user):
+    comment = Comment.objects.create(post=post, author=user, text='Есть')
+    content = client.get(f'/posts/{post.pk}/').content.decode()
+    assert (f'data-stream="/posts/{post.pk}/comments/stream/'
+            f'?after={comment.pk}"') in content, (
+        'Убедитесь, что страница поста подключает поток комментариев '
+        'начиная с последнего показанного.'
+    )
+
+
+def _session_cookie(client):
+    return (b'cookie', f'sessionid={client.cookies["sessionid"].value}'
+            .encode())
+
+
+@override_settings(COMMENT_STREAM_POLL_INTERVAL=10)
+def test_fragment_rendered_for_subscriber(
+        post, user, user_client, another_user_client):
+    async def scenario():
+        author = StreamClient(f'/posts/{post.pk}/comments/stream/',
+                              headers=[_session_cookie(user_client)])
+        other = StreamClient(f'/posts/{post.pk}/comments/stream/',
+                             headers=[_session_cookie(another_user_client)])
+        for stream in (author, other):
+            stream.connect()
+            await stream.subscribed()
+        await _create_comment(post, user, 'Свой комментарий')
+        for stream in (author, other):
+            await stream.wait_for('Свой комментарий')
+            await stream.disconnect()
+        return author.body, other.body
+
+    author_body, other_body = asyncio.run(scenario())
+    assert 'Удалить комментарий' in author_body, (
+        'Убедитесь, что автор видит в потоке ссылки на правку '
+        'своего комментария.'
+    )
+    assert 'Удалить комментарий' not in other_body
+
+
+@override_settings(COMMENT_STREAM=True)
+def test_stream_follows_post_visibility(mixer, user, user_client, client):
+    post = mixer.blend('blog.Post', author=user, is_published=False)
+    url = f'/posts/{post.pk}/comments/stream/'
+    assert 'data-stream' in user_client.get(
+        f'/posts/{post.pk}/').content.decode()
+
+    async def scenario():
+        stream = StreamClient(url, headers=[_session_cookie(user_client)])
+        stream.connect()
+        await stream.subscribed()
+        await stream.disconnect()
+        return stream.status
+
+    assert asyncio.run(scenario()) == HTTPStatus.OK, (
+        'Убедитесь, что автор может подключиться к потоку своего '
+        'неопубликованного поста.'
+    )
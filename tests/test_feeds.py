@@ -0,0 +1,134 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from blog.feeds import invalidate_feeds
+from blog.models import Post
+
+
+@pytest.fixture(autouse=True)
+def fresh_feeds():
+    # общий кэш лежит на диске и переживает запуски тестов
+    invalidate_feeds()
+
+
+@pytest.mark.django_db
+def test_feed_is_served_from_cache_with_etag(
+        client, many_posts_with_published_locations):
+    post = many_posts_with_published_locations[0]
+    response = client.get('/feed/atom/')
+    assert response.status_code == HTTPStatus.OK
+    assert post.title in response.content.decode()
+    assert response.has_header('Last-Modified')
+
+    with CaptureQueriesContext(connection) as queries:
+        cached = client.get('/feed/atom/')
+        not_modified = client.get(
+            '/feed/atom/', HTTP_IF_NONE_MATCH=response['ETag'])
+    assert cached.content == response.content
+    assert not_modified.status_code == HTTPStatus.NOT_MODIFIED, (
+        'Убедитесь, что лента отвечает 304 на совпадающий ETag.'
+    )
+    assert not queries.captured_queries, (
+        'Убедитесь, что готовая лента отдаётся без запросов к БД.'
+    )
+
+
+@pytest.mark.django_db
+def test_feed_is_rebuilt_after_post_change(
+        client, django_capture_on_commit_callbacks,
+        many_posts_with_published_locations):
+    post = many_posts_with_published_locations[0]
+    urls = (
+        '/feed/rss/',
+        f'/category/{post.category.slug}/feed/rss/',
+        f'/profile/{post.author.username}/feed/rss/',
+    )
+    etags = [client.get(url)['ETag'] for url in urls]
+    with django_capture_on_commit_callbacks(execute=True):
+        post.title = 'Новый заголовок'
+        post.save()
+    for url, etag in zip(urls, etags):
+        response = client.get(url)
+        assert response['ETag'] != etag, (
+            f'Убедитесь, что лента `{url}` перестраивается после '
+            'изменения поста.'
+        )
+        assert 'Новый заголовок' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_post_save_does_not_read_author(
+        client, many_posts_with_published_locations):
+    post = Post.objects.get(pk=many_posts_with_published_locations[0].pk)
+    url = f'/profile/{post.author.username}/feed/rss/'
+    client.get(url)
+    with CaptureQueriesContext(connection) as queries:
+        cached = client.get(url)
+    assert cached.status_code == HTTPStatus.OK
+    assert not queries.captured_queries, (
+        'Убедитесь, что лента автора отдаётся из кэша без запросов к БД.'
+    )
+
+    post = Post.objects.get(pk=post.pk)
+    post.title = 'Новый заголовок'
+    with CaptureQueriesContext(connection) as queries:
+        post.save()
+    selects = [query['sql'] for query in queries.captured_queries
+               if query['sql'].startswith('SELECT')
+               and ('"auth_user"' in query['sql']
+                    or 'FROM "blog_post"' in query['sql'])]
+    assert not selects, (
+        'Сброс лент при сохранении поста не должен читать автора '
+        'и прежнюю версию поста.'
+    )
+
+
+@pytest.mark.django_db
+def test_old_category_feed_is_rebuilt(
+        client, mixer, django_capture_on_commit_callbacks,
+        many_posts_with_published_locations):
+    post = Post.objects.get(pk=many_posts_with_published_locations[0].pk)
+    url = f'/category/{post.category.slug}/feed/rss/'
+    assert post.title in client.get(url).content.decode()
+    with django_capture_on_commit_callbacks(execute=True):
+        post.category = mixer.blend('blog.Category', is_published=True)
+        post.save()
+    assert post.title not in client.get(url).content.decode(), (
+        'Убедитесь, что лента прежней категории поста перестраивается.'
+    )
+
+
+@pytest.mark.django_db
+def test_feed_not_found(client, published_category):
+    assert client.get('/feed/json/').status_code == HTTPStatus.NOT_FOUND
+    assert client.get(
+        '/profile/nobody/feed/atom/').status_code == HTTPStatus.NOT_FOUND
+    assert client.get(
+        '/category/missing/feed/atom/').status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_user_save_rebuilds_only_own_feeds(
+        client, django_capture_on_commit_callbacks, another_user,
+        many_posts_with_published_locations):
+    author = many_posts_with_published_locations[0].author
+    author_url = f'/profile/{author.username}/feed/rss/'
+    other_url = f'/profile/{another_user.username}/feed/rss/'
+    client.get(author_url)
+    client.get(other_url)
+    with django_capture_on_commit_callbacks(execute=True):
+        another_user.username = 'renamed'
+        another_user.save()
+    with CaptureQueriesContext(connection) as queries:
+        client.get(author_url)
+    # имя автора снова ищется в БД, а сама лента берётся из кэша
+    assert len(queries.captured_queries) == 1, (
+        'Убедитесь, что сохранение пользователя не сбрасывает ленты '
+        'других авторов.'
+    )
+    assert client.get(other_url).status_code == HTTPStatus.NOT_FOUND
+    assert client.get(
+        '/profile/renamed/feed/rss/').status_code == HTTPStatus.OK
@@ -0,0 +1,50 @@
+import multiprocessing
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from blog.models import Category, Comment, Post
+from core.cache import get_generation
+from perf import datasets
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('start_method', ('fork', 'spawn'))
+def test_generate_small_dataset(monkeypatch, start_method):
+    monkeypatch.setattr(multiprocessing, 'get_all_start_methods',
+                        lambda: [start_method])
+    feed_generation = get_generation('feed-generation')
+    call_command(
+        'generate_blog_data', '--users', '5', '--categories', '2',
+        '--locations', '2', '--posts', '30', '--comments-per-post', '2',
+        '--batch-size', '7', '--workers', '2', stdout=StringIO(),
+        stderr=StringIO())
+    assert Post.objects.count() == 30
+    assert Comment.objects.count() == 60
+    assert not Post.objects.exclude(
+        category__in=Category.objects.all()).exists(), (
+        'Посты должны ссылаться на созданные категории.'
+    )
+    assert not Comment.objects.exclude(
+        post__in=Post.objects.all()).exists()
+    assert get_generation('feed-generation') != feed_generation, (
+        'После вставки в обход сигналов кэш лент должен сбрасываться.'
+    )
+
+
+@pytest.mark.django_db
+def test_dataset_does_not_depend_on_workers(monkeypatch):
+    monkeypatch.setattr(multiprocessing, 'get_all_start_methods',
+                        lambda: ['fork'])
+    rows = []
+    for workers in (1, 2):
+        Post.objects.all().delete()
+        datasets.build(posts=20, users=5, categories=2, locations=2,
+                       batch_size=6, workers=workers)
+        # пользователи и категории второго запуска — новые строки
+        rows.append(list(Post.objects.order_by('pk').values_list(
+            'title', 'is_published')))
+    assert rows[0] == rows[1], (
+        'Данные должны зависеть только от seed, а не от числа процессов.'
+    )
@@ -0,0 +1,171 @@
+import multiprocessing
+import os
+import signal
+import time
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from core import jobs
+from core.management.commands import run_workers
+from core.models import Job
+
+CALLS = []
+
+
+def record(value):
+    CALLS.append(value)
+
+
+def broken():
+    raise RuntimeError('сбой задачи')
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    CALLS.clear()
+
+
+@pytest.mark.django_db
+def test_lanes_and_delayed_jobs():
+    jobs.enqueue(record, 'low', lane='low')
+    jobs.enqueue(record, 'later', delay=timedelta(hours=1))
+    jobs.enqueue(record, 'high', lane='high')
+    jobs.enqueue(record, 'default')
+
+    assert jobs.run_pending() == 3
+    assert CALLS == ['high', 'default', 'low'], (
+        'Задачи должны выполняться в порядке приоритета полос.'
+    )
+    assert Job.objects.get(args=['later']).status == Job.QUEUED, (
+        'Отложенная задача не должна выполняться раньше срока.'
+    )
+
+
+@pytest.mark.django_db
+def test_retry_with_backoff_then_fail():
+    job = jobs.enqueue(broken, max_attempts=2)
+    jobs.run_pending()
+    job.refresh_from_db()
+    assert job.status == Job.QUEUED and job.attempts == 1
+    assert job.run_at > timezone.now(), 'Повтор должен быть отложен.'
+    assert 'сбой задачи' in job.last_error
+
+    Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+    jobs.run_pending()
+    job.refresh_from_db()
+    assert job.status == Job.FAILED and job.attempts == 2
+
+
+@pytest.mark.django_db
+def test_claim_is_exclusive_and_stale_jobs_are_reclaimed(settings):
+    job = jobs.enqueue(record, 'once')
+    assert jobs.claim(['default'], worker='first').pk == job.pk
+    assert jobs.claim(['default'], worker='second') is None, (
+        'Задачу не должны забрать два исполнителя сразу.'
+    )
+    Job.objects.filter(pk=job.pk).update(
+        locked_at=timezone.now() - timedelta(
+            seconds=settings.JOB_TIMEOUT + 1))
+    reclaimed = jobs.claim(['default'], worker='second')
+    assert reclaimed.pk == job.pk and reclaimed.attempts == 2
+
+
+def test_unknown_lane():
+    with pytest.raises(ValueError):
+        jobs.enqueue(record, lane='urgent')
+
+
+def slow():
+    time.sleep(0.3)
+
+
+def stop_worker():
+    os.kill(os.getpid(), signal.SIGTERM)
+    # обработчик сигнала выполняется в главном потоке
+    time.sleep(0.5)
+
+
+@pytest.fixture
+def restore_signals():
+    handlers = {signum: signal.getsignal(signum)
+                for signum in (signal.SIGTERM, signal.SIGINT)}
+    yield
+    for signum, handler in handlers.items():
+        signal.signal(signum, handler)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_heartbeat_extends_lease(settings):
+    settings.JOB_HEARTBEAT = 0.05
+    jobs.enqueue(slow)
+    job = jobs.claim(['default'])
+    assert jobs.execute(job)
+    claimed_at = job.locked_at
+    job.refresh_from_db()
+    assert job.status == Job.DONE
+    assert job.locked_at > claimed_at, (
+        'Исполнитель должен продлевать захват, пока задача выполняется.'
+    )
+
+
+@pytest.mark.django_db
+def test_result_of_lost_lease_is_not_saved():
+    jobs.enqueue(record, 'twice')
+    job = jobs.claim(['default'], worker='first')
+    Job.objects.filter(pk=job.pk).update(locked_by='second')
+    assert not jobs.execute(job)
+    job.refresh_from_db()
+    assert job.status == Job.RUNNING and job.locked_by == 'second', (
+        'Исполнитель с истёкшим захватом не должен перезаписывать задачу.'
+    )
+
+
+@pytest.mark.django_db
+def test_abandoned_job_without_attempts_fails(settings):
+    job = jobs.enqueue(record, 'lost', max_attempts=1)
+    jobs.claim(['default'])
+    Job.objects.filter(pk=job.pk).update(
+        locked_at=timezone.now() - timedelta(
+            seconds=settings.JOB_TIMEOUT + 1))
+    assert jobs.claim(['default']) is None
+    job.refresh_from_db()
+    assert job.status == Job.FAILED and job.finished_at, (
+        'Брошенная задача без оставшихся попыток должна стать FAILED.'
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_workers_stops_on_sigterm(restore_signals):
+    jobs.enqueue(record, 'done', lane='high')
+    jobs.enqueue(stop_worker)
+    jobs.enqueue(record, 'left', lane='low')
+    call_command('run_workers')
+    assert CALLS == ['done'], (
+        'Исполнитель должен доделать текущую задачу и остановиться '
+        'по SIGTERM.'
+    )
+
+
+def _wait_for_parent_stop(path):
+    def run(lanes, threads):
+        stop = run_workers._stop_on_signals()
+        os.kill(os.getppid(), signal.SIGTERM)
+        deadline = time.monotonic() + 10
+        while not stop.is_set() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if stop.is_set():
+            (path / str(os.getpid())).touch()
+    return run
+
+
+def test_run_workers_stops_children(monkeypatch, tmp_path, restore_signals):
+    monkeypatch.setattr(run_workers, '_run_process',
+                        _wait_for_parent_stop(tmp_path))
+    call_command('run_workers', '--processes', '2')
+    assert not multiprocessing.active_children()
+    assert len(list(tmp_path.iterdir())) == 2, (
+        'По SIGTERM родитель должен остановить дочерние процессы.'
+    )
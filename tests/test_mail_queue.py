@@ -0,0 +1,158 @@
+import threading
+from datetime import timedelta
+from email.header import decode_header, make_header
+
+import pytest
+from django.core.mail import send_mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test import override_settings
+from django.utils import timezone
+
+from core import jobs, mail
+from core.models import Job, OutgoingEmail
+
+SENT = []
+OPENED = []
+
+
+class FlakyBackend(BaseEmailBackend):
+    refuse = False
+
+    def open(self):
+        if self.refuse:
+            raise ConnectionError('сервер недоступен')
+        OPENED.append(True)
+        return True
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            if 'bad@example.com' in message.recipients():
+                raise ConnectionError('сервер отклонил письмо')
+            SENT.append(
+                str(make_header(decode_header(message.message()['Subject']))))
+        return len(email_messages)
+
+
+@pytest.fixture
+def queued_mail():
+    SENT.clear()
+    OPENED.clear()
+    FlakyBackend.refuse = False
+    with override_settings(
+            EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+            EMAIL_DELIVERY_BACKEND=f'{__name__}.FlakyBackend',
+            EMAIL_MAX_ATTEMPTS=2):
+        yield
+
+
+@pytest.mark.django_db
+def test_messages_are_queued_and_sent_in_one_batch(queued_mail):
+    for number in range(3):
+        send_mail(f'Письмо {number}', 'Текст', 'blog@example.com',
+                  ['reader@example.com'])
+    assert SENT == [], 'Письма не должны отправляться в потоке запроса.'
+    assert Job.objects.filter(status=Job.QUEUED).count() == 1
+
+    jobs.run_pending()
+    assert SENT == ['Письмо 0', 'Письмо 1', 'Письмо 2']
+    assert len(OPENED) == 1, 'Пачка должна идти через одно соединение.'
+    assert not OutgoingEmail.objects.exclude(
+        status=OutgoingEmail.SENT).exists()
+
+
+@pytest.mark.django_db
+def test_failed_message_is_retried_then_dead_lettered(queued_mail):
+    send_mail('Плохое', 'Текст', 'blog@example.com', ['bad@example.com'])
+    send_mail('Хорошее', 'Текст', 'blog@example.com', ['ok@example.com'])
+    jobs.run_pending()
+    assert SENT == ['Хорошее'], 'Сбой одного письма не должен рвать пачку.'
+    bad = OutgoingEmail.objects.get(status=OutgoingEmail.QUEUED)
+    assert bad.send_after > timezone.now()
+    assert Job.objects.filter(
+        status=Job.QUEUED, run_at__gte=bad.send_after).exists(), (
+        'Повторная отправка должна быть запланирована.'
+    )
+
+    OutgoingEmail.objects.update(send_after=timezone.now())
+    Job.objects.update(run_at=timezone.now())
+    jobs.run_pending()
+    bad.refresh_from_db()
+    assert bad.status == OutgoingEmail.DEAD and bad.attempts == 2
+
+
+@pytest.mark.django_db
+def test_batch_is_requeued_when_connection_fails(queued_mail):
+    for number in range(2):
+        send_mail(f'Письмо {number}', 'Текст', 'blog@example.com',
+                  ['reader@example.com'])
+    FlakyBackend.refuse = True
+    jobs.run_pending()
+    assert not OutgoingEmail.objects.exclude(
+        status=OutgoingEmail.QUEUED, attempts=1,
+        send_after__gt=timezone.now()).exists(), (
+        'Если соединение не открылось, письма пачки должны вернуться '
+        'в очередь с паузой.'
+    )
+    assert Job.objects.filter(status=Job.QUEUED).exists()
+
+    FlakyBackend.refuse = False
+    OutgoingEmail.objects.update(send_after=timezone.now())
+    Job.objects.update(run_at=timezone.now())
+    jobs.run_pending()
+    assert SENT == ['Письмо 0', 'Письмо 1']
+
+
+@pytest.mark.django_db
+def test_prune_removes_sent_and_dead_messages(queued_mail):
+    for status in (OutgoingEmail.SENT, OutgoingEmail.DEAD,
+                   OutgoingEmail.QUEUED):
+        send_mail(status, 'Текст', 'blog@example.com', ['bad@example.com'])
+    old = timezone.now() - timedelta(days=30)
+    for queued, status in zip(
+            OutgoingEmail.objects.order_by('pk'),
+            (OutgoingEmail.SENT, OutgoingEmail.DEAD)):
+        OutgoingEmail.objects.filter(pk=queued.pk).update(
+            status=status, sent_at=old, send_after=old)
+    assert mail.prune() == 2
+    assert list(OutgoingEmail.objects.values_list(
+        'status', flat=True)) == [OutgoingEmail.QUEUED], (
+        'Недоставленные письма со ссылками сброса пароля тоже должны '
+        'удаляться.'
+    )
+
+
+@pytest.mark.django_db
+def test_file_and_smtp_delivery(queued_mail, tmp_path):
+    smtpd = pytest.importorskip('smtpd')
+    asyncore = pytest.importorskip('asyncore')
+    received = []
+
+    class Server(smtpd.SMTPServer):
+        def process_message(self, peer, mailfrom, rcpttos, data, **kwargs):
+            received.append(rcpttos)
+
+    server = Server(('127.0.0.1', 0), None)
+    thread = threading.Thread(
+        target=asyncore.loop, kwargs={'timeout': 0.05, 'count': 100},
+        daemon=True)
+    thread.start()
+    try:
+        with override_settings(
+                EMAIL_DELIVERY_BACKEND=(
+                    'django.core.mail.backends.smtp.EmailBackend'),
+                EMAIL_HOST='127.0.0.1',
+                EMAIL_PORT=server.socket.getsockname()[1]):
+            send_mail('SMTP', 'Текст', 'blog@example.com', ['a@example.com'])
+            jobs.run_pending()
+        with override_settings(
+                EMAIL_DELIVERY_BACKEND=(
+                    'django.core.mail.backends.filebased.EmailBackend'),
+                EMAIL_FILE_PATH=tmp_path):
+            send_mail('Файл', 'Текст', 'blog@example.com', ['b@example.com'])
+            jobs.run_pending()
+    finally:
+        server.close()
+        thread.join()
+    assert received == [['a@example.com']]
+    files = list(tmp_path.iterdir())
+    assert len(files) == 1 and 'b@example.com' in files[0].read_text()
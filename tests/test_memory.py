@@ -0,0 +1,39 @@
+import tracemalloc
+
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from perf.memory import MemoryProfiler
+
+LEAK = []
+
+
+def leaking_view(request):
+    LEAK.append(bytearray(256 * 1024))
+    return HttpResponse('ok')
+
+
+def test_memory_is_attributed_to_view_and_line(tmp_path):
+    request = RequestFactory().get('/')
+    request.resolver_match = type('Match', (), {'view_name': 'test:leak'})
+    profiler = MemoryProfiler()
+    with override_settings(MEMORY_PROFILER_DIR=tmp_path,
+                           MEMORY_PROFILER_FRAMES=1,
+                           MEMORY_PROFILER_REPORT_INTERVAL=60):
+        profiler.start()
+        try:
+            with profiler.track(request):
+                leaking_view(request)
+            path = profiler.maybe_report(force=True)
+        finally:
+            tracemalloc.stop()
+            LEAK.clear()
+
+    stats = profiler.views['test:leak']
+    assert stats['requests'] == 1
+    assert stats['peak'] >= 256 * 1024, 'Пик должен учитывать выделение'
+    assert stats['retained'] >= 256 * 1024, (
+        'Утечка должна попасть в оставшуюся память')
+    assert any(line.startswith(__file__) for line in stats['lines']), (
+        'Выделение должно быть отнесено к строке представления')
+    assert 'test:leak' in path.read_text(encoding='utf-8')
@@ -0,0 +1,89 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from django.test import Client, override_settings
+
+from perf.metrics import CountedCache, cache_requests, http_requests, registry
+
+
+@pytest.mark.django_db
+def test_metrics_merge_worker_files(tmp_path, published_category):
+    with override_settings(METRICS_ENABLED=True, METRICS_DIR=tmp_path,
+                           METRICS_TOKEN='secret'):
+        client = Client()
+        client.get('/')
+        client.get(f'/category/{published_category.slug}/')
+        other_worker = {
+            http_requests.name: {
+                json.dumps(['blog:index', 'GET', '200']): 5,
+            },
+        }
+        (tmp_path / f'{os.getppid()}.json').write_text(
+            json.dumps(other_worker))
+        dead = subprocess.run([sys.executable, '-c', 'import os; '
+                               'print(os.getpid())'],
+                              capture_output=True, text=True).stdout.strip()
+        dead_file = tmp_path / f'{dead}.json'
+        dead_file.write_text(json.dumps(other_worker))
+        text = client.get('/perf/metrics/',
+                          HTTP_AUTHORIZATION='Bearer secret').content.decode()
+        index = registry.collect()[http_requests.name][
+            json.dumps(['blog:index', 'GET', '200'])]
+
+    requests = {
+        line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+        for line in text.splitlines()
+        if line.startswith('blogicum_http_requests_total{')
+    }
+    index_key = ('blogicum_http_requests_total{view="blog:index",'
+                 'method="GET",status="200"}')
+    assert 11 <= requests[index_key] < 16, (
+        'Убедитесь, что метрики всех процессов складываются, в том числе '
+        'завершившихся.'
+    )
+    assert not dead_file.exists(), (
+        'Файл завершившегося процесса должен удаляться.'
+    )
+    assert index >= requests[index_key] and index < 16, (
+        'Значения завершившегося процесса не должны учитываться дважды.'
+    )
+    for name in ('blogicum_http_request_duration_seconds_bucket',
+                 'blogicum_db_queries_total',
+                 'blogicum_template_render_seconds_count',
+                 'blogicum_cache_requests_total',
+                 'blogicum_active_users'):
+        assert name in text, name
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_requires_token_or_staff(tmp_path):
+    with override_settings(METRICS_DIR=tmp_path, METRICS_TOKEN='secret'):
+        client = Client(REMOTE_ADDR='127.0.0.1')
+        assert client.get('/perf/metrics/').status_code == 403, (
+            'Адрес из INTERNAL_IPS не должен давать доступ без явной '
+            'настройки.'
+        )
+        assert client.get(
+            '/perf/metrics/', HTTP_AUTHORIZATION='Bearer wrong',
+        ).status_code == 403
+        assert client.get(
+            '/perf/metrics/', HTTP_AUTHORIZATION='Bearer secret',
+        ).status_code == 200
+        with override_settings(METRICS_ALLOW_INTERNAL_IPS=True):
+            assert client.get('/perf/metrics/').status_code == 200
+
+
+def test_counted_cache_counts_hits_and_misses():
+    cache = CountedCache('counted', {'OPTIONS': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    cache.set('key', 'value')
+    assert cache.get('key') == 'value'
+    assert cache.get('missing', 'default') == 'default'
+    counts = registry._values[cache_requests.name]
+    assert counts[json.dumps(['LocMemCache', 'hit'])] == 1
+    assert counts[json.dumps(['LocMemCache', 'miss'])] == 1, (
+        'Убедитесь, что обёртка кэша считает попадания и промахи get().'
+    )
@@ -0,0 +1,174 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.db.transaction import TransactionManagementError
+from django.test import override_settings
+from django.utils import timezone
+
+from core import outbox
+from core.models import OutboxCheckpoint, OutboxEvent
+
+User = get_user_model()
+
+
+class RecordingConsumer(outbox.Consumer):
+    name = 'test'
+    topics = ('post', 'comment')
+    batch_size = 2
+    handled = []
+    fail = False
+
+    def handle(self, events):
+        if self.fail:
+            raise RuntimeError('сбой потребителя')
+        self.handled.extend((event.topic, event.action) for event in events)
+
+
+@pytest.fixture
+def consumer():
+    RecordingConsumer.handled = []
+    RecordingConsumer.fail = False
+    with override_settings(
+            OUTBOX_CONSUMERS=[f'{__name__}.RecordingConsumer']):
+        yield RecordingConsumer()
+
+
+@pytest.mark.django_db
+def test_mutations_are_recorded(mixer, user, published_category):
+    post = mixer.blend('blog.Post', author=user, category=published_category)
+    post_id = post.pk
+    post.delete()
+    events = list(OutboxEvent.objects.filter(topic='post').values_list(
+        'action', 'object_id', 'payload'))
+    assert events == [
+        ('save', post_id, {'author_id': user.pk,
+                           'category_id': published_category.pk}),
+        ('delete', post_id, {'author_id': user.pk,
+                             'category_id': published_category.pk}),
+    ]
+
+
+@pytest.mark.django_db
+def test_consumer_checkpoints_and_redelivery(consumer, mixer, user,
+                                             published_category):
+    post = mixer.blend('blog.Post', author=user, category=published_category)
+    mixer.blend('blog.Comment', post=post, author=user)
+    post.delete()
+
+    first = OutboxEvent.objects.filter(topic='post').earliest('pk').pk
+    consumer.fail = True
+    outbox.run([consumer], once=True, interval=0)
+    assert consumer.position() < first, (
+        'Позиция не должна сдвигаться, если обработка пачки упала.'
+    )
+
+    consumer.fail = False
+    outbox.run(outbox.get_consumers(), once=True, interval=0)
+    assert RecordingConsumer.handled == [
+        ('post', 'save'), ('comment', 'save'),
+        ('comment', 'delete'), ('post', 'delete'),
+    ], 'Потребитель должен получить события по порядку и без пропусков.'
+    assert consumer.position() == OutboxEvent.objects.filter(
+        topic__in=consumer.topics).latest('pk').pk
+
+
+@pytest.mark.django_db(transaction=True)
+def test_events_are_written_in_transaction_of_change(
+        mixer, published_category):
+    user = mixer.blend('auth.User')
+    with mixer.ctx(commit=False):
+        post = mixer.blend('blog.Post', author=user,
+                           category=published_category)
+    # сохранение поста само открывает транзакцию, как в shell и командах
+    post.save()
+    assert OutboxEvent.objects.filter(
+        topic='post', object_id=post.pk).exists()
+    assert OutboxEvent.objects.filter(
+        topic='user', object_id=user.pk).exists()
+    with pytest.raises(TransactionManagementError):
+        outbox.record('post', post)
+    with pytest.raises(TransactionManagementError):
+        # модель пользователя из django.contrib.auth не меняется
+        user.save()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_user_forms_and_commands_save_in_transaction(client, user):
+    with transaction.atomic():
+        user.set_password('Old-pass-word5')
+        user.save()
+    client.force_login(user)
+    requests = (
+        ('/auth/registration/', {
+            'username': 'newcomer', 'password1': 'Rt5-pass-word',
+            'password2': 'Rt5-pass-word'}),
+        ('/auth/password_change/', {
+            'old_password': 'Old-pass-word5',
+            'new_password1': 'Rt5-pass-word',
+            'new_password2': 'Rt5-pass-word'}),
+        ('/profile/edit/', {'first_name': 'Имя'}),
+    )
+    for url, data in requests:
+        events = OutboxEvent.objects.filter(topic='user').count()
+        client.post(url, data)
+        assert OutboxEvent.objects.filter(topic='user').count() > events, (
+            f'Убедитесь, что {url} сохраняет пользователя вместе '
+            'с событием.'
+        )
+    call_command('createsuperuser', '--noinput', username='admin',
+                 email='admin@example.com')
+    assert OutboxEvent.objects.filter(
+        topic='user', object_id=User.objects.get(username='admin').pk,
+    ).exists()
+
+
+@pytest.mark.django_db
+def test_consumer_waits_for_uncommitted_gap(consumer):
+    OutboxEvent.objects.all().delete()
+    for pk in (1, 2, 4):
+        OutboxEvent.objects.create(pk=pk, topic='post', object_id=pk,
+                                   action=OutboxEvent.SAVE)
+    outbox.run([consumer], once=True, interval=0)
+    assert consumer.position() == 2, (
+        'Потребитель не должен читать события за свежим пропуском в id: '
+        'транзакция с пропущенным id ещё может зафиксироваться.'
+    )
+
+    OutboxEvent.objects.create(pk=3, topic='comment', object_id=3,
+                               action=OutboxEvent.SAVE)
+    outbox.run([consumer], once=True, interval=0)
+    assert consumer.position() == 4
+    assert len(RecordingConsumer.handled) == 4
+
+    OutboxEvent.objects.create(pk=6, topic='post', object_id=6,
+                               action=OutboxEvent.SAVE)
+    OutboxEvent.objects.filter(pk=6).update(
+        created_at=timezone.now() - timedelta(hours=1))
+    outbox.run([consumer], once=True, interval=0)
+    assert consumer.position() == 6, (
+        'Давний пропуск в id считается откатом и перешагивается.'
+    )
+
+
+@pytest.mark.django_db
+def test_prune_keeps_unread_and_recent_events(consumer):
+    OutboxEvent.objects.all().delete()
+    for pk in (1, 2, 3):
+        OutboxEvent.objects.create(pk=pk, topic='post', object_id=pk,
+                                   action=OutboxEvent.SAVE)
+    OutboxEvent.objects.filter(pk__in=(1, 2)).update(
+        created_at=timezone.now() - timedelta(days=30))
+    consumer.position()
+    OutboxCheckpoint.objects.filter(consumer=consumer.name).update(
+        position=1)
+    assert outbox.prune() == 1
+    assert list(OutboxEvent.objects.values_list('pk', flat=True)) == [2, 3]
+
+    with override_settings(OUTBOX_CONSUMERS=[]):
+        assert outbox.prune() == 1, (
+            'Без потребителей prune() должен удалять старые события.'
+        )
+    assert list(OutboxEvent.objects.values_list('pk', flat=True)) == [3]
@@ -0,0 +1,78 @@
+import os
+import time
+from http import HTTPStatus
+
+import pytest
+from django.test import override_settings
+
+from perf import profiling
+
+
+@pytest.fixture(autouse=True)
+def profiler_enabled(settings):
+    settings.PROFILER_ENABLED = True
+
+
+@pytest.fixture
+def staff_client(user, user_client):
+    user.is_staff = True
+    user.save()
+    return user_client
+
+
+@pytest.mark.django_db
+def test_staff_gets_profile_report(
+        tmp_path, staff_client, post_with_published_location):
+    url = f'/posts/{post_with_published_location.id}/?_profile=1'
+    with override_settings(PROFILE_DIR=tmp_path):
+        response = staff_client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    content = response.content.decode()
+    assert 'cumulative' in content
+    assert 'FROM &quot;blog_comment&quot;' in content
+    assert 'includes/comments.html' in content, (
+        'Убедитесь, что в отчёте указан шаблон, из которого выполнен запрос.'
+    )
+    name = response['X-Profile-Report']
+    assert (tmp_path / f'{name}.prof').exists()
+    assert (tmp_path / f'{name}.html').exists()
+
+
+@pytest.mark.django_db
+def test_store_mode_keeps_response(tmp_path, staff_client):
+    with override_settings(PROFILE_DIR=tmp_path):
+        response = staff_client.get('/', HTTP_X_PROFILE='store')
+    assert 'Лента записей' in response.content.decode()
+    assert (tmp_path / f'{response["X-Profile-Report"]}.prof').exists()
+
+
+@pytest.mark.django_db
+def test_profile_ignored_for_regular_users(tmp_path, user_client):
+    with override_settings(PROFILE_DIR=tmp_path):
+        response = user_client.get('/?_profile=1')
+    assert not response.has_header('X-Profile-Report')
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('value', ['0', 'false', 'yes'])
+def test_unknown_profile_mode_ignored(tmp_path, staff_client, value):
+    with override_settings(PROFILE_DIR=tmp_path):
+        response = staff_client.get(f'/?_profile={value}')
+    assert not response.has_header('X-Profile-Report'), (
+        'Профилирование включают только значения 1, html и store.'
+    )
+    assert not list(tmp_path.iterdir())
+
+
+def test_prune_removes_old_reports(tmp_path):
+    old = tmp_path / 'old.prof'
+    fresh = tmp_path / 'fresh.html'
+    old.write_text('')
+    fresh.write_text('')
+    expired = time.time() - 2 * 60 * 60
+    os.utime(old, (expired, expired))
+    with override_settings(PROFILE_DIR=tmp_path):
+        assert profiling.prune(keep_seconds=60 * 60) == 1
+    assert not old.exists(), 'Старый отчёт должен быть удалён'
+    assert fresh.exists(), 'Свежий отчёт должен остаться'
@@ -0,0 +1,59 @@
+import pytest
+
+from perf.testing import assert_query_budget, assert_url_query_budget
+
+# сессия, пользователь и выборка страницы; число постов на странице
+# не должно влиять на количество запросов
+URL_BUDGETS = (
+    ('/', 4),
+    ('/category/{category}/', 4),
+    ('/profile/{username}/', 5),
+    ('/posts/{post}/', 4),
+    ('/posts/{post}/edit/', 6),
+    ('/posts/{post}/delete/', 5),
+    ('/posts/create/', 5),
+    ('/profile/edit/', 3),
+    ('/posts/{post}/edit_comment/{comment}/', 4),
+    ('/posts/{post}/delete_comment/{comment}/', 4),
+)
+
+
+@pytest.fixture
+def url_kwargs(mixer, user, published_category, post_with_published_location,
+               many_posts_with_published_locations):
+    comment = mixer.blend(
+        'blog.Comment', post=post_with_published_location, author=user)
+    return {
+        'category': published_category.slug,
+        'username': user.username,
+        'post': post_with_published_location.id,
+        'comment': comment.id,
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url, budget', URL_BUDGETS)
+def test_blog_url_query_budget(user_client, url_kwargs, url, budget):
+    url = url.format(**url_kwargs)
+    user_client.get(url)
+    response = assert_url_query_budget(user_client, url, budget)
+    assert response.status_code == 200, url
+
+
+@pytest.mark.django_db
+def test_add_comment_query_budget(user_client, post_with_published_location):
+    post_id = post_with_published_location.id
+    user_client.get(f'/posts/{post_id}/')
+    url = f'/posts/{post_id}/comment/'
+    response = assert_url_query_budget(
+        user_client, url, 4, method='post', data={'text': 'Комментарий'})
+    assert response.status_code == 302
+
+
+@pytest.mark.django_db
+def test_query_budget_detects_repeated_queries(
+        many_posts_with_published_locations):
+    with pytest.raises(AssertionError, match='N\\+1'):
+        with assert_query_budget(100):
+            for post in many_posts_with_published_locations:
+                post.comment_count
@@ -0,0 +1,77 @@
+import re
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from blog.models import Post
+from perf import datasets
+from perf.plans import check_plans
+
+FULL_SCAN = re.compile(r'\bSCAN blog_post\b(?! USING)')
+
+
+@pytest.mark.django_db
+def test_available_for_user_avoids_full_scan(user):
+    plan = Post.objects.available_for_user(user).explain()
+    assert not FULL_SCAN.search(plan), (
+        'Убедитесь, что выборка доступных пользователю постов не приводит '
+        f'к полному просмотру таблицы постов:\n{plan}'
+    )
+    assert 'USING INDEX post_pub_date_visibility_idx' in plan, plan
+    assert 'TEMP B-TREE' not in plan, (
+        'Убедитесь, что доступные пользователю посты не сортируются '
+        f'во временном B-дереве:\n{plan}'
+    )
+
+
+@pytest.mark.django_db
+def test_published_uses_partial_index():
+    plan = Post.objects.published().explain()
+    assert 'USING INDEX post_published_pub_date_idx' in plan, plan
+    assert 'TEMP B-TREE' not in plan, plan
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('is_author', (True, False))
+def test_get_visible_is_single_primary_key_lookup(
+        user, another_user, post_with_published_location, is_author):
+    viewer = user if is_author else another_user
+    post_id = post_with_published_location.id
+    with CaptureQueriesContext(connection) as queries:
+        post = Post.objects.with_cached_references().get_visible(
+            viewer, pk=post_id)
+    assert post.pk == post_id
+    post_queries = [
+        query['sql'] for query in queries.captured_queries
+        if 'FROM "blog_post"' in query['sql']
+    ]
+    assert len(post_queries) == 1
+    assert 'JOIN' not in post_queries[0]
+    plan = Post.objects.filter(pk=post_id).explain()
+    assert plan.split(' ', 3)[-1] == (
+        'SEARCH blog_post USING INTEGER PRIMARY KEY (rowid=?)'), plan
+
+
+@pytest.mark.django_db
+def test_get_visible_hides_unpublished_post(
+        user, another_user, unpublished_posts_with_published_locations):
+    post = unpublished_posts_with_published_locations[0]
+    assert Post.objects.get_visible(user, pk=post.pk) == post
+    for viewer in (another_user, AnonymousUser()):
+        with pytest.raises(Post.DoesNotExist):
+            Post.objects.get_visible(viewer, pk=post.pk)
+
+
+@pytest.mark.django_db
+def test_post_queryset_plans_on_seeded_database():
+    datasets.build(posts=2000, users=50)
+    failures = {
+        name: '\n'.join(plan)
+        for name, plan, problems in check_plans() if problems
+    }
+    assert not failures, (
+        'Убедитесь, что запросы блога используют индексы и не сортируют '
+        f'горячие таблицы во временном B-дереве:\n{failures}'
+    )
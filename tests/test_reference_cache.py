@@ -0,0 +1,45 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def _category_table_queries(queries):
+    return [
+        query['sql'] for query in queries.captured_queries
+        if query['sql'].startswith('SELECT')
+        and 'FROM "blog_category"' in query['sql']
+    ]
+
+
+@pytest.mark.django_db
+def test_category_page_skips_category_lookup(
+        client, published_category, many_posts_with_published_locations):
+    url = f'/category/{published_category.slug}/'
+    client.get(url)
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    assert not _category_table_queries(queries), (
+        'Убедитесь, что категория и связанные объекты карточек берутся '
+        'из кэша, а не запрашиваются из БД на каждом запросе.'
+    )
+
+
+@pytest.mark.django_db
+def test_unpublished_category_is_hidden_after_cache_warmup(
+        client, published_category, django_capture_on_commit_callbacks):
+    url = f'/category/{published_category.slug}/'
+    assert client.get(url).status_code == HTTPStatus.OK
+    published_category.is_published = False
+    with django_capture_on_commit_callbacks() as callbacks:
+        published_category.save()
+    assert client.get(url).status_code == HTTPStatus.OK, (
+        'Кэш категорий должен сбрасываться после фиксации транзакции.'
+    )
+    for callback in callbacks:
+        callback()
+    assert client.get(url).status_code == HTTPStatus.NOT_FOUND, (
+        'Убедитесь, что кэш категорий сбрасывается при сохранении категории.'
+    )
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+from django.urls import resolve
+
+from blog.models import Comment
+from perf.replay import make_record
+
+
+@pytest.fixture
+def request_log(tmp_path):
+    path = tmp_path / 'requests.jsonl'
+    with override_settings(REQUEST_LOG_PATH=str(path)):
+        yield path
+
+
+def _records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+@pytest.mark.django_db
+def test_log_keeps_routes_without_values(
+        request_log, user, post_with_published_location):
+    client = Client()
+    client.force_login(user)
+    client.get(f'/profile/{user.username}/?page=2')
+    client.post(f'/posts/{post_with_published_location.pk}/comment/',
+                {'text': 'Секретный текст'})
+
+    content = request_log.read_text()
+    for secret in (user.username, 'Секретный текст', 'page=2'):
+        assert secret not in content, (
+            'Журнал запросов не должен содержать значений из адреса, '
+            'строки запроса и формы.'
+        )
+    profile, comment = _records(request_log)
+    assert profile['route'] == '/profile/<str:username>/'
+    assert profile['query_keys'] == ['page']
+    assert comment['data_keys'] == ['text']
+
+
+def test_reset_token_is_not_logged():
+    request = RequestFactory().get('/auth/reset/MQ/set-password-secret/')
+    request.resolver_match = resolve(request.path)
+    request.user = AnonymousUser()
+    record = make_record(request, HttpResponse(), 0.01)
+    assert 'set-password-secret' not in json.dumps(record)
+    assert record['route'] == '/auth/reset/<uidb64>/<token>/'
+    assert set(record['params']) == {'uidb64', 'token'}
+
+
+# проигрывание идёт в других потоках со своими подключениями к БД
+@pytest.mark.django_db(transaction=True)
+def test_replay_repeats_only_safe_requests(
+        request_log, capsys, user_client, user,
+        post_with_published_location):
+    post = post_with_published_location
+    user_client.get(f'/posts/{post.pk}/')
+    user_client.get(f'/profile/{user.username}/')
+    user_client.post(f'/posts/{post.pk}/comment/', {'text': 'Комментарий'})
+    assert Comment.objects.count() == 1
+
+    call_command('replay_requests', str(request_log), '--concurrency', '1',
+                 '--repeat', '3')
+    summary = json.loads(capsys.readouterr().out)
+    assert summary['requests'] == 6
+    assert summary['statuses'] == {'200': 6}
+    assert summary['skipped'] == 1
+    assert Comment.objects.count() == 1, (
+        'Запросы, меняющие данные, не должны проигрываться.'
+    )
@@ -0,0 +1,53 @@
+import json
+import time
+
+from django.test import override_settings
+
+from perf.sampling import (
+    Sampler,
+    load_stacks,
+    to_speedscope,
+    to_svg,
+    window_dir,
+)
+
+
+def test_stacks_are_merged_across_workers(tmp_path):
+    with override_settings(SAMPLING_DIR=tmp_path, SAMPLING_WINDOW=60):
+        directory = window_dir(time.time())
+        directory.mkdir(parents=True)
+        (directory / '101.folded').write_text(
+            'blog:index\tmain;get;render 3\n'
+            'blog:post_detail\tmain;get 1\n')
+        (directory / '102.folded').write_text(
+            'blog:index\tmain;get;render 2\n')
+        stacks = load_stacks(time.time() - 60)
+        only_index = load_stacks(time.time() - 60, url_name='blog:index')
+
+    assert stacks['blog:index']['main;get;render'] == 5
+    assert set(only_index) == {'blog:index'}
+
+    speedscope = json.loads(to_speedscope(stacks))
+    names = [frame['name'] for frame in speedscope['shared']['frames']]
+    assert names == ['main', 'get', 'render']
+    assert sum(
+        sum(profile['weights']) for profile in speedscope['profiles']) == 6
+    assert to_svg(stacks).startswith('<svg')
+
+
+def test_flush_writes_samples_and_prunes_old_windows(tmp_path):
+    with override_settings(SAMPLING_DIR=tmp_path, SAMPLING_WINDOW=60,
+                           SAMPLING_RETENTION=3600):
+        old = window_dir(time.time() - 7200)
+        old.mkdir(parents=True)
+        (old / '101.folded').write_text('blog:index\tmain 1\n')
+        sampler = Sampler()
+        sampler.counts[('blog:index', 'main;get')] += 2
+        sampler.flush(force=True)
+        stacks = load_stacks(time.time() - 60)
+
+    assert stacks == {'blog:index': {'main;get': 2}}
+    assert not sampler.counts, 'После сброса счётчик должен быть пустым.'
+    assert not old.exists(), (
+        'Окна старше SAMPLING_RETENTION должны удаляться.'
+    )
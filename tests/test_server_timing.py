@@ -0,0 +1,28 @@
+import json
+
+import pytest
+from django.test import Client, override_settings
+
+from perf.metrics import phase_duration, registry
+
+
+@pytest.mark.django_db
+@override_settings(SERVER_TIMING=True)
+def test_server_timing_header(post_with_published_location):
+    response = Client().get(f'/posts/{post_with_published_location.id}/')
+    header = response['Server-Timing']
+    for phase in ('total', 'view', 'middleware', 'db', 'template', 'cache'):
+        assert f'{phase};dur=' in header, (
+            f'Убедитесь, что заголовок Server-Timing содержит фазу {phase}: '
+            f'{header}'
+        )
+    assert 'desc="includes/comments.html"' in header
+    observed = registry._values[phase_duration.name]
+    assert json.dumps(['blog:post_detail', 'db']) in observed, (
+        'Убедитесь, что время фаз попадает в метрики по имени URL.'
+    )
+
+
+@pytest.mark.django_db
+def test_server_timing_disabled_by_default(client):
+    assert not client.get('/').has_header('Server-Timing')
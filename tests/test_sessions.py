@@ -0,0 +1,62 @@
+import pytest
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.cache import FileCache
+from core.sessions import SessionStore
+
+
+@pytest.mark.django_db
+def test_unchanged_session_is_not_saved():
+    session = SessionStore()
+    session['theme'] = 'dark'
+    session.save()
+
+    loaded = SessionStore(session.session_key)
+    loaded['theme'] = 'dark'
+    with CaptureQueriesContext(connection) as queries:
+        loaded.save()
+    assert not queries.captured_queries, (
+        'Сессия без изменений данных не должна записываться в БД.'
+    )
+
+    loaded['theme'] = 'light'
+    loaded.save()
+    stored = Session.objects.get(session_key=session.session_key)
+    assert stored.get_decoded() == {'theme': 'light'}, (
+        'Изменённая сессия должна сохраняться в БД.'
+    )
+    assert SessionStore(session.session_key)['theme'] == 'light'
+
+
+@pytest.mark.django_db
+def test_flushed_session_is_saved_again():
+    session = SessionStore()
+    session['theme'] = 'dark'
+    session.save()
+    old_key = session.session_key
+    session.flush()
+    session['theme'] = 'dark'
+    session.save()
+    assert session.session_key != old_key
+    assert Session.objects.filter(session_key=session.session_key).exists()
+
+
+def test_file_cache_culls_every_n_writes(tmp_path):
+    cache = FileCache(tmp_path, {
+        'OPTIONS': {'MAX_ENTRIES': 2, 'CULL_FREQUENCY': 0, 'CULL_EVERY': 5},
+    })
+
+    def entries():
+        return len(list(tmp_path.glob('*.djcache')))
+
+    for number in range(4):
+        cache.set(f'key{number}', number)
+    assert entries() == 4, (
+        'Файловый кэш не должен проверять переполнение на каждой записи.'
+    )
+    cache.set('key4', 4)
+    assert entries() == 1, (
+        'Переполнение должно проверяться раз в CULL_EVERY записей.'
+    )
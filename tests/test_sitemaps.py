@@ -0,0 +1,103 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from blog.sitemaps import invalidate_sitemap
+
+
+@pytest.fixture(autouse=True)
+def sitemap_settings(tmp_path):
+    with override_settings(SITEMAP_DIR=tmp_path, SITEMAP_SHARD_SIZE=5):
+        invalidate_sitemap()
+        yield tmp_path
+
+
+def _content(response):
+    return b''.join(response.streaming_content).decode()
+
+
+@pytest.mark.django_db
+def test_sitemap_shards_cover_published_posts(
+        client, many_posts_with_published_locations, future_posts):
+    index = client.get('/sitemap.xml').content.decode()
+    shards = index.count('<sitemap>')
+    assert shards >= 2
+    urls = ''.join(
+        _content(client.get(f'/sitemap-{shard}.xml'))
+        for shard in range(shards))
+    for post in many_posts_with_published_locations:
+        assert f'/posts/{post.pk}/' in urls
+    for post in future_posts:
+        assert f'/posts/{post.pk}/' not in urls, (
+            'Убедитесь, что отложенные посты не попадают в карту сайта.'
+        )
+
+
+@pytest.mark.django_db
+def test_only_changed_shard_is_rebuilt(
+        client, sitemap_settings, django_capture_on_commit_callbacks,
+        many_posts_with_published_locations):
+    posts = many_posts_with_published_locations
+    shard = posts[0].pk // 5
+    other = posts[-1].pk // 5
+    assert shard != other
+    client.get(f'/sitemap-{shard}.xml')
+    client.get(f'/sitemap-{other}.xml')
+    before = {path.name for path in sitemap_settings.iterdir()}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        posts[0].is_published = False
+        posts[0].save()
+    content = _content(client.get(f'/sitemap-{shard}.xml'))
+    client.get(f'/sitemap-{other}.xml')
+    after = {path.name for path in sitemap_settings.iterdir()}
+
+    assert f'/posts/{posts[0].pk}/' not in content
+    assert len(before - after) == 1, (
+        'Убедитесь, что перестраивается только шард изменённого поста.'
+    )
+
+
+@pytest.mark.django_db
+@override_settings(ALLOWED_HOSTS=['*'])
+def test_hosts_keep_own_shard_files(
+        client, sitemap_settings, many_posts_with_published_locations):
+    shard = many_posts_with_published_locations[0].pk // 5
+    url = f'/sitemap-{shard}.xml'
+    first = _content(client.get(url, HTTP_HOST='first.example'))
+    second = _content(client.get(url, HTTP_HOST='second.example'))
+    assert 'http://first.example/' in first
+    assert 'http://second.example/' in second
+    assert len(list(sitemap_settings.iterdir())) == 2, (
+        'Убедитесь, что шарды разных хостов не удаляют файлы друг друга.'
+    )
+    with CaptureQueriesContext(connection) as queries:
+        again = _content(client.get(url, HTTP_HOST='first.example'))
+    assert again == first
+    assert not queries.captured_queries, (
+        'Число шардов и готовый шард должны браться из кэша.'
+    )
+
+
+@pytest.mark.django_db
+def test_new_shard_appears_in_index(
+        client, mixer, user, published_category,
+        django_capture_on_commit_callbacks,
+        many_posts_with_published_locations):
+    shards = client.get('/sitemap.xml').content.decode().count('<sitemap>')
+    with django_capture_on_commit_callbacks(execute=True):
+        mixer.blend('blog.Post', pk=shards * 5 + 7, author=user,
+                    category=published_category)
+    index = client.get('/sitemap.xml').content.decode()
+    assert index.count('<sitemap>') == shards + 2, (
+        'Кэш числа шардов должен сбрасываться, когда пост попадает '
+        'в новый шард.'
+    )
+
+
+@pytest.mark.django_db
+def test_missing_shard(client):
+    assert client.get('/sitemap-100.xml').status_code == HTTPStatus.NOT_FOUND
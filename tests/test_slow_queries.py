@@ -0,0 +1,64 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+
+from perf.slowlog import SlowQueryLog, load_records, summarize
+
+
+@pytest.mark.django_db
+def test_slow_and_sampled_queries_are_logged(tmp_path):
+    log = SlowQueryLog(tmp_path, threshold=0, sample_rate=0.5,
+                       max_bytes=1024 * 1024, backups=1)
+    with connection.execute_wrapper(log):
+        for number in range(3):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT %s', [number])
+    log.flush()
+    log.threshold = float('inf')
+    log.sample_rate = 1.0
+    with connection.execute_wrapper(log):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1 + 1')
+    log.close()
+
+    records = list(load_records(tmp_path))
+    assert len(records) == 4, 'Все запросы выше порога попадают в журнал'
+    assert len({record['fingerprint'] for record in records[:3]}) == 1, (
+        'Запросы, отличающиеся литералами, должны иметь один отпечаток')
+    assert records[-1]['sampled']
+
+    summary = {row['fingerprint']: row for row in summarize(records)}
+    row = summary[records[0]['fingerprint']]
+    assert row['count'] == 3 and row['slow'] == 3
+
+
+@pytest.mark.django_db
+def test_buffer_is_flushed_by_time(tmp_path):
+    log = SlowQueryLog(tmp_path, threshold=0, sample_rate=0.5,
+                       max_bytes=1024 * 1024, backups=1, flush_interval=0)
+    with connection.execute_wrapper(log):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    try:
+        assert len(list(load_records(tmp_path))) == 1, (
+            'Записи журнала должны попадать на диск по истечении '
+            'интервала, не дожидаясь заполнения буфера.'
+        )
+    finally:
+        log.close()
+
+
+def test_summary_command(tmp_path, capsys):
+    record = {
+        'time': 0, 'fingerprint': 'abc', 'shape': 'SELECT ?',
+        'duration_ms': 150.0, 'sampled': False, 'weight': 1, 'many': False,
+        'database': 'default', 'view': 'blog:index', 'stack': [],
+    }
+    (tmp_path / '1.log').write_text(json.dumps(record) + '\n')
+    with override_settings(SLOW_QUERY_LOG_DIR=tmp_path):
+        call_command('slow_queries', '--sort', 'p95')
+    output = capsys.readouterr().out
+    assert 'abc' in output and 'blog:index' in output
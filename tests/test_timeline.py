@@ -0,0 +1,190 @@
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from blog import timelines
+from blog.models import Follow, FollowerCount, TimelineEntry
+from core import jobs
+from perf.testing import assert_query_budget
+
+
+@pytest.fixture
+def publish(mixer, published_category, django_capture_on_commit_callbacks):
+    """Публикует посты автора и выполняет задачи рассылки."""
+    moment = timezone.now() - timedelta(days=1)
+
+    def publish(author, count=1):
+        nonlocal moment
+        posts = []
+        with django_capture_on_commit_callbacks(execute=True):
+            for _ in range(count):
+                moment += timedelta(minutes=1)
+                posts.append(mixer.blend(
+                    'blog.Post', author=author, category=published_category,
+                    is_published=True, pub_date=moment))
+        jobs.run_pending()
+        return posts
+
+    return publish
+
+
+@pytest.fixture
+def authors(mixer):
+    return mixer.cycle(3).blend('auth.User')
+
+
+def _read_all(user, limit):
+    posts, cursor, pages = [], None, 0
+    while True:
+        page, cursor = timelines.read(user, cursor, limit=limit)
+        posts.extend(page)
+        pages += 1
+        if cursor is None:
+            return posts, pages
+
+
+@pytest.mark.django_db
+def test_posts_are_fanned_out_to_followers(user, authors, publish):
+    author, other = authors[:2]
+    old = publish(author)
+    timelines.follow(user, author)
+    new = publish(author, 2)
+    publish(other)
+    posts, _ = timelines.read(user)
+    assert [post.pk for post in posts] == [
+        post.pk for post in reversed(old + new)], (
+        'Лента должна содержать посты автора, включая вышедшие до '
+        'подписки, и не содержать постов других авторов.'
+    )
+    assert TimelineEntry.objects.filter(user=user).count() == 3
+
+    timelines.unfollow(user, author)
+    assert timelines.read(user) == ([], None)
+
+
+@pytest.mark.django_db
+@override_settings(TIMELINE_FANOUT_LIMIT=2)
+def test_popular_authors_are_merged_on_read(
+        user, another_user, authors, publish):
+    popular, regular = authors[:2]
+    for follower in (user, another_user):
+        timelines.follow(follower, popular)
+    timelines.follow(user, regular)
+    expected = []
+    for _ in range(3):
+        expected += publish(popular) + publish(regular)
+
+    assert not TimelineEntry.objects.filter(author=popular).exists(), (
+        'Посты авторов с большим числом подписчиков не должны '
+        'рассылаться по лентам.'
+    )
+    posts, pages = _read_all(user, limit=4)
+    assert [post.pk for post in posts] == [
+        post.pk for post in reversed(expected)], (
+        'Убедитесь, что посты популярных авторов подмешиваются в ленту '
+        'по дате без пропусков и повторов между страницами.'
+    )
+    assert pages == 2
+
+
+@pytest.mark.django_db
+@override_settings(TIMELINE_FANOUT_LIMIT=2)
+def test_author_below_limit_is_refilled(user, another_user, authors, publish):
+    author = authors[0]
+    timelines.follow(user, author)
+    timelines.follow(another_user, author)
+    posts = publish(author, 2)
+    timelines.unfollow(another_user, author)
+    jobs.run_pending()
+    assert set(TimelineEntry.objects.filter(user=user).values_list(
+        'post_id', flat=True)) == {post.pk for post in posts}, (
+        'Когда автор опускается ниже порога, его недавние посты должны '
+        'вернуться в ленты подписчиков.'
+    )
+
+
+@pytest.mark.django_db
+def test_hidden_posts_are_skipped(user, authors, publish):
+    author = authors[0]
+    timelines.follow(user, author)
+    visible, hidden, scheduled = publish(author, 3)
+    hidden.is_published = False
+    hidden.save()
+    scheduled.pub_date = timezone.now() + timedelta(days=1)
+    scheduled.save()
+    posts, _ = timelines.read(user)
+    assert posts == [visible], (
+        'Снятые с публикации и отложенные посты не должны попадать в ленту.'
+    )
+
+
+@pytest.mark.django_db
+def test_prune_bounds_timelines(user, authors, publish):
+    author = authors[0]
+    timelines.follow(user, author)
+    posts = publish(author, 5)
+    assert timelines.prune(max_entries=2) == 3
+    assert list(TimelineEntry.objects.filter(user=user).order_by(
+        '-pub_date').values_list('post_id', flat=True)) == [
+        posts[4].pk, posts[3].pk]
+
+
+@pytest.mark.django_db
+def test_follower_count_follows_deletions(user, another_user, authors):
+    author, other = authors[:2]
+    for follower in (user, another_user):
+        timelines.follow(follower, author)
+    timelines.follow(user, other)
+    another_user.delete()
+    Follow.objects.filter(author=other).delete()
+    assert dict(FollowerCount.objects.filter(
+        author__in=(author, other)).values_list('author', 'followers')) == {
+        author.pk: 1, other.pk: 0}, (
+        'Число подписчиков должно уменьшаться и при удалении подписок '
+        'каскадом или запросом.'
+    )
+    author.delete()
+    assert not Follow.objects.exists()
+
+
+@pytest.mark.django_db
+def test_run_workers_prunes_timelines(user, authors, publish, settings):
+    settings.TIMELINE_MAX_ENTRIES = 2
+    timelines.follow(user, authors[0])
+    publish(authors[0], 3)
+    out = StringIO()
+    call_command('run_workers', '--prune', stdout=out)
+    assert 'blog.timelines.prune: удалено 1' in out.getvalue()
+    assert TimelineEntry.objects.filter(user=user).count() == 2
+
+
+@pytest.mark.django_db
+def test_timeline_views(user, user_client, authors, publish):
+    author = authors[0]
+    response = user_client.post(f'/profile/{author.username}/follow/')
+    assert response.status_code == HTTPStatus.FOUND
+    assert 'Отписаться' in user_client.get(
+        f'/profile/{author.username}/').content.decode()
+    posts = publish(author, 12)
+    for followed in authors[1:]:
+        timelines.follow(user, followed)
+        publish(followed)
+
+    with assert_query_budget(6):
+        response = user_client.get('/timeline/')
+    assert response.status_code == HTTPStatus.OK
+    assert posts[-1].title in response.content.decode()
+    next_url = f'?cursor={response.context["next_cursor"]}'
+    assert user_client.get(f'/timeline/{next_url}').status_code == (
+        HTTPStatus.OK)
+    assert user_client.get('/timeline/?cursor=xyz').status_code == (
+        HTTPStatus.NOT_FOUND)
+
+    user_client.post(f'/profile/{author.username}/unfollow/')
+    assert posts[-1].title not in user_client.get(
+        '/timeline/').content.decode()
@@ -0,0 +1,95 @@
+from http import HTTPStatus
+
+import pytest
+
+from core.auth import user_cache
+from core.cache import LocalCache
+
+
+@pytest.mark.django_db
+def test_cached_user_reflects_profile_edit(
+        user, user_client, django_capture_on_commit_callbacks):
+    user_client.get('/')
+    user.first_name = 'Изменённое'
+    with django_capture_on_commit_callbacks(execute=True):
+        user.save()
+    response = user_client.get(f'/profile/{user.username}/')
+    assert response.context['user'].first_name == 'Изменённое', (
+        'Убедитесь, что кэш пользователя сбрасывается при сохранении '
+        'пользователя.'
+    )
+
+
+@pytest.mark.django_db
+def test_password_change_invalidates_cached_session(
+        user, user_client, django_capture_on_commit_callbacks):
+    response = user_client.get('/')
+    assert response.context['user'] == user
+    user.set_password('new-secret-password')
+    with django_capture_on_commit_callbacks(execute=True):
+        user.save()
+    response = user_client.get('/')
+    assert response.status_code == HTTPStatus.OK
+    assert not response.context['user'].is_authenticated, (
+        'Убедитесь, что после смены пароля старая сессия перестаёт '
+        'действовать, даже если пользователь закэширован.'
+    )
+
+
+@pytest.mark.django_db
+def test_cached_user_is_not_shared_between_requests(user, user_client):
+    user_client.get('/')
+    _, cached = user_cache.get(str(user.pk))
+    response = user_client.get('/')
+    assert response.context['user'] is not cached
+
+
+@pytest.mark.django_db
+def test_cache_is_invalidated_after_commit_only(
+        user, user_client, django_capture_on_commit_callbacks):
+    key = str(user.pk)
+    user_client.get('/')
+    with django_capture_on_commit_callbacks() as callbacks:
+        user.first_name = 'Изменённое'
+        user.save()
+    assert user_cache.get(key) is not None, (
+        'Убедитесь, что кэш пользователя сбрасывается после фиксации '
+        'транзакции, а не до неё.'
+    )
+    assert callbacks
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        user.save(update_fields=['last_login'])
+    assert not callbacks, (
+        'Вход пользователя не должен сбрасывать кэш пользователей.'
+    )
+
+
+@pytest.mark.django_db
+def test_user_save_invalidates_only_that_user(
+        user, another_user, user_client, another_user_client,
+        django_capture_on_commit_callbacks):
+    user_client.get('/')
+    another_user_client.get('/')
+    with django_capture_on_commit_callbacks(execute=True):
+        user.save()
+    assert user_cache.get(str(user.pk)) is None
+    assert user_cache.get(str(another_user.pk)) is not None, (
+        'Убедитесь, что сохранение пользователя сбрасывает в кэше только '
+        'его самого.'
+    )
+
+
+def test_local_cache_delete_reaches_other_processes():
+    # два экземпляра с одним пространством имён — как два процесса
+    first = LocalCache('test', check_interval=0)
+    second = LocalCache('test', check_interval=0)
+    for cache in (first, second):
+        cache.set('a', 1)
+        cache.set('b', 2)
+    first.delete('a')
+    assert second.get('a') is None, (
+        'Убедитесь, что delete() сбрасывает ключ во всех процессах.'
+    )
+    assert second.get('b') == 2
+    assert second.get_or_set('a', lambda: 3) == 3